@@ -1,69 +1,111 @@
-
 '''This script is to separate all the conformers from a CREST conformers scan file
 This file is usually named crest_conformers.xyz and has all the conformers in it in
-a sequence. The script can be used simply with python3 crest_conf_separation.py file.xyz'''
+a sequence. The script can be used simply with python3 crest_conf_separation.py file.xyz
+
+The file is read one conformer block at a time, so even ensembles with tens of
+thousands of conformers need very little memory (blank lines are skipped and the
+file is split up to the first line that is not an atom count, or a conformer cut short). With --archive all conformers go
+into one xyz file with a byte-offset index (file.xyz.idx) instead of one file each:
+python3 crest_conf_separation.py crest_conformers.xyz --archive conformers_archive.xyz
+
+Conformers can be pre-screened on their CREST energy before anything is written, so
+that only the survivors become DFT jobs (numbers are kept, conformer07 stays conformer07, also in
+the archive where the name is stored in the comment line as name=conformer07). The energies come
+from the frame index (file.xyz.idx, built in one pass if missing) and only the kept conformers are
+then read, each with one seek:
+python3 crest_conf_separation.py crest_conformers.xyz --energy-window 3 --max-conformers 200 --min-population 0.5'''
 
+import os
 import sys
-import re
 import csv
+import argparse
+from itertools import islice
+
+# The shared modules live in the Shared_Modules folder of this repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Shared_Modules'))
+from compressed_io import open_text
+from xyz_index import ArchiveWriter, XYZFile, comment_energy, get_index
+from conformer_screen import add_screen_arguments, criteria_from_args, screen, report
 
 def read_xyz_file(file_path):
-    with open(file_path, 'r') as file:
-        data = file.readlines()
-    return data
+    """Yields the lines of the file one at a time"""
+    with open_text(file_path) as file:  # crest_conformers.xyz may also be compressed (.gz, .xz, .bz2, .zst)
+        yield from file
 
-def split_conformers(data):
-    conformers = []
-    i = 0
-    while i < len(data):
+def split_conformers(lines):
+    """Yields one conformer block (atom count line, comment line and atoms) at a time"""
+    lines = iter(lines)
+    line_number = 0
+    for first_line in lines:
+        line_number += 1
+        if not first_line.strip():
+            continue  # Blank lines between or after conformers
         try:
-            num_atoms = int(data[i].strip())
+            num_atoms = int(first_line.strip())
         except ValueError:
-            print(f"Invalid number of atoms at line {i+1}.")
+            print(f"Invalid number of atoms at line {line_number}.")
             break
-        conformer_data = data[i:i + num_atoms + 2]
-        conformers.append(conformer_data)
-        i += num_atoms + 2
-    return conformers
-
-def extract_energy_from_comment_line(line):
-    """Extracts first float found in the comment line (line 2 of xyz conformer)"""
-    matches = re.findall(r"[-+]?\d*\.\d+|\d+", line)
-    if matches:
-        return float(matches[0])
-    else:
-        return None
-
-def save_conformers_and_energies(conformers, energy_csv_filename):
-    energies = []
-    for index, conformer in enumerate(conformers):
-        filename = f'conformer{index + 1:02}.xyz'
-        with open(filename, 'w') as file:
-            file.writelines(conformer)
+        conformer_data = [first_line] + list(islice(lines, num_atoms + 1))
+        if len(conformer_data) < num_atoms + 2:
+            print(f"The conformer at line {line_number} is cut short.")
+            break
+        line_number += len(conformer_data) - 1
+        yield conformer_data
 
-        energy_line = conformer[1]  # Line 2 of each conformer block
-        energy = extract_energy_from_comment_line(energy_line)
-        energies.append((filename.replace('.xyz', ''), energy))  # <-- changed here
+def selected_conformers(input_file, index, selected):
+    """Yields (0-based number, conformer block) of the selected conformers only, each read with one seek"""
+    with XYZFile(input_file, index=index) as ensemble:
+        for number in selected:
+            yield number, [line + '\n' for line in ensemble.block(number).splitlines()]
 
-    # Write energies to CSV
+def save_conformers_and_energies(conformers, energy_csv_filename, archive=None):
+    """
+    Write each conformer to conformerNN.xyz (or all of them to one indexed archive) and their energies to a CSV.
+    conformers are (0-based conformer number, conformer block) pairs.
+    """
+    total = 0
+    archive_writer = ArchiveWriter(archive) if archive else None  # Saves archive.idx when closed
     with open(energy_csv_filename, 'w', newline='') as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(["Filename", "Energy (a.u.)"])
-        writer.writerows(energies)
+        for index, conformer in conformers:
+            name = f'conformer{index + 1:02}'
+            if archive_writer is None:
+                with open(name + '.xyz', 'w') as file:
+                    file.writelines(conformer)
+                energy = comment_energy(conformer[1])  # Line 2 of each conformer block
+            else:
+                # The name goes into the comment line, so the screened archive keeps the CREST numbers
+                energy = archive_writer.add(conformer, name)
+            writer.writerow((name, energy))
+            total += 1
+    if archive_writer is not None:
+        archive_writer.close()
 
-    print(f"All Done. Total conformers saved: {len(conformers)}")
+    print(f"All Done. Total conformers saved: {total}")
+    if archive:
+        print(f"Conformers saved in: {archive} (index: {archive}.idx, read frames with Shared_Modules/xyz_index.py)")
     print(f"Energies saved in: {energy_csv_filename}")
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python merged_conf_energy.py <crest_conformers.xyz>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Separate the conformers of a CREST ensemble (crest_conformers.xyz).")
+    parser.add_argument("input_file", help="crest_conformers.xyz (may be compressed)")
+    parser.add_argument("--archive", nargs="?", const="conformers_archive.xyz",
+                        help="write all conformers to one xyz file with a byte-offset index instead of one file each")
+    add_screen_arguments(parser)
+    args = parser.parse_args()
 
-    input_file = sys.argv[1]
-    data = read_xyz_file(input_file)
-    conformers = split_conformers(data)
-    save_conformers_and_energies(conformers, "conformer_energies.csv")
+    criteria = criteria_from_args(args)
+    if criteria.active():
+        # The energies come from the frame index (one pass over the comment lines, or the saved .idx file),
+        # then only the survivors are read, by seeking, and written
+        index = get_index(args.input_file)
+        result = screen(index.energies, criteria)
+        report(result, len(index))
+        conformers = selected_conformers(args.input_file, index, result.selected.tolist())
+    else:
+        conformers = enumerate(split_conformers(read_xyz_file(args.input_file)))
+    save_conformers_and_energies(conformers, "conformer_energies.csv", args.archive)
 
 if __name__ == "__main__":
     main()
-
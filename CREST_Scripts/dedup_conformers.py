@@ -0,0 +1,123 @@
+'''This script removes duplicate conformers, either right after crest_conf_separation.py
+or after the conformers have been optimized. Every pair of conformers within an
+energy window is superimposed (Kabsch RMSD, all pairs at once with NumPy) and a
+conformer closer than the RMSD threshold to a lower-energy one is a duplicate of it.
+Pairs that cannot be duplicates are skipped with a shape fingerprint index first, so
+ensembles of tens of thousands of conformers are handled in seconds.
+
+python3 dedup_conformers.py crest_conformers.xyz          (one ensemble or archive file)
+python3 dedup_conformers.py conformer*.xyz                (separated conformers)
+python3 dedup_conformers.py *.log --energy gibbs          (optimized Gaussian logs)
+
+The unique conformers are written to unique_conformers.xyz (with a byte-offset index)
+and every input conformer with its representative to duplicate_map.csv.'''
+
+import os
+import sys
+import csv
+import argparse
+
+import numpy as np
+
+# The shared modules live in the Shared_Modules folder of this repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Shared_Modules'))
+from compressed_io import base_name, expand_glob, strip_compression_extension
+from conformer_rmsd import deduplicate, RMSD_THRESHOLD, ENERGY_WINDOW
+from elements import ATOMIC_SYMBOLS
+from log_parser import HARTREE_TO_KCAL
+from reverse_reader import read_final
+from xyz_index import ArchiveWriter, XYZFile
+
+ENERGIES = {"scf": "scf_energy", "gibbs": "gibbs_energy"}
+LOG_EXTENSIONS = ('.log', '.out')
+
+def is_log(file):
+    return os.path.splitext(strip_compression_extension(file))[1].lower() in LOG_EXTENSIONS
+
+def read_xyz_inputs(files):
+    """Names, frames (comment, symbols, coordinates) and energies of the conformers in the xyz files"""
+    names, frames = [], []
+    for file in files:
+        with XYZFile(file) as ensemble:
+            conformers = ensemble[:]
+        if len(conformers) == 1:
+            names.append(base_name(file))
+        else:  # An ensemble: the name= tags of an archive, else the names crest_conf_separation.py gives the files
+            names += [f.name or f'conformer{index + 1:02}' for index, f in enumerate(conformers)]
+        frames += conformers
+    return names, [(f.comment, f.symbols, f.coords) for f in frames], np.array([f.energy for f in frames])
+
+def read_log_inputs(files, energy):
+    """Names, final geometries and energies of optimized Gaussian logs"""
+    names, frames, energies = [], [], []
+    for file in files:
+        result = read_final(file)
+        if not result.geometry:
+            print(f"No geometry found in {file}, skipped.")
+            continue
+        value = getattr(result, ENERGIES[energy])
+        geometry = np.array(result.geometry)
+        names.append(result.filename)
+        frames.append((f"{result.filename} {energy} energy = {value} au",
+                       [ATOMIC_SYMBOLS[int(z)] for z in geometry[:, 0]], geometry[:, 1:]))
+        energies.append(np.nan if value is None else value)
+    return names, frames, np.array(energies, dtype=float)
+
+def write_results(names, frames, energies, result, unique_file, map_file):
+    """The unique conformers to one indexed xyz file and the duplicate mapping to a CSV"""
+    with ArchiveWriter(unique_file) as archive:
+        for index in result.unique:
+            comment, symbols, coords = frames[index]
+            archive.add([f"{len(symbols)}\n", comment + "\n"] +
+                        [f"{s:<3}  {x: .8f}  {y: .8f}  {z: .8f}\n" for s, (x, y, z) in zip(symbols, coords)])
+
+    relative = (energies - np.nanmin(energies)) * HARTREE_TO_KCAL if not np.isnan(energies).all() else energies
+    with open(map_file, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Conformer", "Energy (a.u.)", "Relative energy (kcal/mol)", "Representative", "RMSD (A)"])
+        for index, name in enumerate(names):
+            writer.writerow((name, energies[index], round(relative[index], 4),
+                             names[result.representative[index]], round(result.rmsd[index], 4)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove duplicate conformers by Kabsch RMSD within an energy window.")
+    parser.add_argument("inputs", nargs="+", help="an ensemble xyz file, separated conformer xyz files, or Gaussian logs (glob patterns work too)")
+    parser.add_argument("--rmsd", type=float, default=RMSD_THRESHOLD,
+                        help=f"conformers closer than this (Angstrom) are duplicates (default: {RMSD_THRESHOLD})")
+    parser.add_argument("--energy-window", type=float, default=ENERGY_WINDOW,
+                        help=f"only compare conformers within this energy difference in kcal/mol (default: {ENERGY_WINDOW})")
+    parser.add_argument("--energy", choices=ENERGIES, default="scf", help="energy to use for Gaussian logs (default: scf)")
+    parser.add_argument("--exhaustive", action="store_true",
+                        help="compute the RMSD of every pair in the energy window (same result, slower for large ensembles)")
+    parser.add_argument("--heavy-atoms", action="store_true", help="leave the hydrogen atoms out of the RMSD")
+    parser.add_argument("--output", default="unique_conformers.xyz", help="xyz file for the unique conformers")
+    parser.add_argument("--map", default="duplicate_map.csv", help="CSV file mapping every conformer to its representative")
+    args = parser.parse_args()
+
+    files = [file for pattern in args.inputs for file in (expand_glob(pattern) or [pattern])]
+    if all(is_log(file) for file in files):
+        names, frames, energies = read_log_inputs(files, args.energy)
+    else:
+        names, frames, energies = read_xyz_inputs(files)
+    if not frames:
+        print("No conformers found.")
+        return
+
+    symbols = frames[0][1]
+    if any(frame[1] != symbols for frame in frames):
+        print("The conformers do not all have the same atoms in the same order, cannot compare them.")
+        return
+    coords = np.array([frame[2] for frame in frames])
+    if args.heavy_atoms:
+        coords = coords[:, [s.upper() != 'H' for s in symbols]]
+
+    result = deduplicate(coords, energies, args.rmsd, args.energy_window, exhaustive=args.exhaustive)
+    write_results(names, frames, energies, result, args.output, args.map)
+
+    print(f"{len(names)} conformers, {len(result.unique)} unique, {len(names) - len(result.unique)} duplicates "
+          f"({result.n_pairs} pairs compared)")
+    print(f"Unique conformers saved in: {args.output} (index: {args.output}.idx)")
+    print(f"Duplicate mapping saved in: {args.map}")
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,84 @@
-import glob, os, csv
+import os, sys, csv, argparse
 
-print("#=======================================================================================#")
-print("#---------------------------------------------------------------------------------------#")
-print("#              A Script to Extract SCF Energies, Elapsed Time, and Optical Rotation     #")
-print("#---------------------------------------------------------------------------------------#")
-print("#=======================================================================================#")
-print("\n")
+# The shared log parser lives in the Shared_Modules folder of this repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Shared_Modules'))
+from log_parser import parse_log
+from parse_cache import ParseCache
+from batch_driver import run_cached_batch
+from compressed_io import expand_glob
+from columnar_export import export_columns, FORMATS
 
 #---------- Start of Function ----------#
-def SCF_Energy_and_Time(input_file):
+# data: the bytes of the file when they have already been read (see --io-concurrency)
+def SCF_Energy_and_Time(input_file, data=None):
     SCF_Energy = "--NOT FOUND--"
     SCF_E_kJ = "--NOT FOUND--"
     elapsed_time_hours = "--NOT FOUND--"
     opt_rot = "--NOT FOUND--"
-    filename = os.path.splitext(os.path.basename(input_file))[0]
-
-    with open(input_file, 'r') as f:
-        input_lines = f.readlines()
-
-    for line in input_lines:
-        if "SCF Done:" in line:
-            complete_line = line.split()
-            SCF_Energy = complete_line[4]
-            SCF_E_kJ = float(SCF_Energy) * 2625.50
-        
-        if "Elapsed time:" in line:
-            parts = line.split()
-            days = int(parts[2])
-            hours = int(parts[4])
-            minutes = int(parts[6])
-            seconds = float(parts[8])
-            # Convert total time to hours
-            elapsed_time_hours = days * 24 + hours + minutes / 60 + seconds / 3600
-        
-        if "Molar Mass =" in line:
-            # Assuming the optical rotation value appears after 'Alpha' symbol
-            opt_rot = line.split("=")[-1].split("deg")[0].strip()
+    # Read the log once, keeping only the SCF, timing and optical rotation lines
+    result = parse_log(input_file, events=("scf", "elapsed", "optical_rotation"), data=data)
+    filename = result.filename
+
+    if result.scf_energy is not None:
+        SCF_Energy = result.scf_energy
+        SCF_E_kJ = SCF_Energy * 2625.50
+    if result.elapsed_hours is not None:
+        elapsed_time_hours = result.elapsed_hours
+    if result.optical_rotation is not None:
+        opt_rot = result.optical_rotation
 
     return [filename, SCF_Energy, SCF_E_kJ, elapsed_time_hours, opt_rot]
 
-# Define the list to hold all extracted data
-Final_Energies_List = [['File Name', 'SCF Energy (a.u)', 'SCF Energy (kJ/mol)', 'Elapsed Time (hours)', 'Optical Rotation (deg)']]
+def main():
+    print("#=======================================================================================#")
+    print("#---------------------------------------------------------------------------------------#")
+    print("#              A Script to Extract SCF Energies, Elapsed Time, and Optical Rotation     #")
+    print("#---------------------------------------------------------------------------------------#")
+    print("#=======================================================================================#")
+    print("\n")
+
+    parser = argparse.ArgumentParser(description="Extract SCF energies, elapsed time and optical rotation from all *.log files.")
+    parser.add_argument("--no-cache", action="store_true", help="parse every log again instead of using .parse_cache.sqlite")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes (0 = one per CPU core)")
+    parser.add_argument("--io-concurrency", type=int, default=0,
+                        help="keep N file reads in flight at once (for logs on a network filesystem such as Lustre/NFS)")
+    parser.add_argument("--columnar", nargs="?", const="auto", choices=("auto",) + FORMATS,
+                        help="also write the table as Parquet/Arrow (with pyarrow) or .npz, for fast reloading")
+    args = parser.parse_args()
+
+    # Define the list to hold all extracted data
+    Final_Energies_List = [['File Name', 'SCF Energy (a.u)', 'SCF Energy (kJ/mol)', 'Elapsed Time (hours)', 'Optical Rotation (deg)']]
+
+    # Process each log file in the directory (also *.log.gz, .xz, .bz2, .zst), unchanged logs are loaded from the parse cache
+    input_files = expand_glob('*.log')
+    with ParseCache(enabled=not args.no_cache) as cache:
+        results, failures = run_cached_batch(SCF_Energy_and_Time, input_files, "SCF_Energy_and_Time", cache,
+                                              args.jobs, args.io_concurrency)
+    for file, row in results:
+        Final_Energies_List.append(row)
+
+    # Display results
+    print("Here are the SCF Energies, Elapsed Times, and Optical Rotations for all Files\n")
+    for i in Final_Energies_List:
+        print("{:<10} {:<16} {:<20} {:<20} {:<20}".format(i[0], i[1], i[2], i[3], i[4]))
+    for file, error in failures:
+        print(f"Could not read {file}: {error}")
 
-# Process each log file in the directory
-input_files = '*.log'
-for file in glob.glob(input_files):
-    Final_Energies_List.append(SCF_Energy_and_Time(file))
+    # Write results to CSV
+    with open('SCF_Energies_Time_OptRot.csv', 'w', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerows(Final_Energies_List)
 
-# Display results
-print("Here are the SCF Energies, Elapsed Times, and Optical Rotations for all Files\n")
-for i in Final_Energies_List:
-    print("{:<10} {:<16} {:<20} {:<20} {:<20}".format(i[0], i[1], i[2], i[3], i[4]))
+    # Columnar copy of the same table, missing values become NaN
+    if args.columnar:
+        rows = Final_Energies_List[1:]
+        def column(i):
+            return [float('nan') if isinstance(row[i], str) else row[i] for row in rows]
+        out_file = export_columns('SCF_Energies_Time_OptRot',
+                                  {"file_name": [row[0] for row in rows], "scf_energy_au": column(1),
+                                   "scf_energy_kj": column(2), "elapsed_hours": column(3),
+                                   "optical_rotation_deg": column(4)}, fmt=args.columnar)
+        print(f"Columnar copy written to {out_file}")
 
-# Write results to CSV
-with open('SCF_Energies_Time_OptRot.csv', 'w', newline='', encoding='utf-8-sig') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerows(Final_Energies_List)
+if __name__ == "__main__":
+    main()
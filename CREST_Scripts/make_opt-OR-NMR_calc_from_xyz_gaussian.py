@@ -1,18 +1,47 @@
+import os
 import sys
-import re
+import argparse
+from collections import Counter
+from functools import partial
+
+# The shared modules live in the Shared_Modules folder of this repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Shared_Modules'))
+from batch_driver import run_batch
+from compressed_io import open_text, strip_compression_extension, expand_glob, base_name
+from input_templates import GaussianJob, GaussianStep, GenBasis, write_input
+from xyz_index import XYZFile, index_path, comment_energy, frame_name
+from conformer_screen import add_screen_arguments, criteria_from_args, screen, report
 
-print("#----------------------------------------------------------#")
-print("# Script to Create a Gaussian Input File from an XYZ File  #")
-print("#----------------------------------------------------------#")
+#####################################################################################################################
+### Below are the rout cards for optimization, optical rotation, and NMR. You can change them according to your needs
+Route_Card_Opt = '# opt=tight b3lyp/gen empiricaldispersion=gd3bj int=ultrafine scf=conver=9 pseudo=cards'
+Route_Card_OR = '# polar=optrot cphf=rdfreq b3lyp/gen empiricaldispersion=gd3bj int=ultrafine scf=conver=9 scrf=(solvent=chloroform) pseudo=cards geom=check guess=read'
+Route_Card_NMR = '# nmr=giao mpw1pw91/gen int=ultrafine scf=conver=9 pseudo=cards scrf=(solvent=chloroform) geom=check guess=read'
+
+Basis_Opt = GenBasis('6-31+G(d,p)')      # LanL2DZ (with its pseudopotential) is used for iodine
+Basis_NMR = GenBasis('6-311+G(2d,p)')
+
+Job = GaussianJob((
+    GaussianStep(Route_Card_Opt, "Optimization of the Molecule in Gas Phase", basis=Basis_Opt),
+    GaussianStep(Route_Card_OR, "Optical Rotation of the Optimized Molecule in Solvent", geometry=False,
+                 sections=("589nm",), basis=Basis_NMR),
+    GaussianStep(Route_Card_NMR, "NMR of the Optimized Molecule in Solvent", geometry=False, basis=Basis_NMR),
+), blank_lines_at_end=2)
+
+Iodine_radius = 'I 2.74'
+Solvation_gen = 'eps=13.7 epsinf=1.54 HBondAcidity=0.18 HBondBasicity=0.52 SurfaceTensionAtInterface=68.29 CarbonAromaticity=0.231 ElectronegativeHalogenicity=0.0'
+#####################################################################################################################
 
 class ExtractCoords:
     """Class for Extracting Coordinates from an XYZ File"""
     def __init__(self, file):
         self.file = file
 
-    def extractCoordinates(self):
-        with open(self.file, 'r') as xyz_file:
-            lines = xyz_file.readlines()
+    def extractCoordinates(self, lines=None):
+        """Geometry of the xyz file, or of the given lines of one xyz block (a frame of an ensemble)"""
+        if lines is None:
+            with open_text(self.file) as xyz_file:
+                lines = xyz_file.readlines()
 
         n_atoms = int(lines[0].strip())  # First line: number of atoms
         title = lines[1].strip()         # Second line: title or comment
@@ -41,102 +70,128 @@ class WriteOutputFile:
         self.charge = charge
         self.multiplicity = multiplicity
         self.geometry = geometry
-        base_filename = filename.split('\\').pop().split('/').pop().rsplit('.', 1)[0]
+        base_filename = strip_compression_extension(filename).split('\\').pop().split('/').pop().rsplit('.', 1)[0]
         self.output_filename = f"{prefix}{base_filename}{suffix}"
-    
-    def write_gaussian_file(self, geometry):
-        output_file = sys.stdout
-        sys.stdout = open(f"{self.output_filename}.com", "w")
-
-        print(f"%chk={self.output_filename}.chk")
-        print(Route_Card_Opt + '\n')
-        print("Optimization of the Molecule in Gas Phase\n")
-        print(self.charge, self.multiplicity)
-        for atom in geometry:
-            print(f" {atom[0]:<3}  {atom[1]: .8f}  {atom[2]: .8f}  {atom[3]: .8f}")
-        print(Gen_Basis_LAN_Opt)
-
-        print("--Link1--")
-        print(f"%chk={self.output_filename}.chk")
-        print(Route_Card_OR + '\n')
-        print("Optical Rotation of the Optimized Molecule in Solvent\n")
-        print(self.charge, self.multiplicity)
-        print("\n589nm")
-        print(Gen_Basis_LAN_NMR)
-
-        print("--Link1--")
-        print(f"%chk={self.output_filename}.chk")
-        print(Route_Card_NMR + '\n')
-        print("NMR of the Optimized Molecule in Solvent\n")
-        print(self.charge, self.multiplicity)
-        print(Gen_Basis_LAN_NMR)
-        print('\n')
-
-        sys.stdout.close()
-        sys.stdout = output_file
 
+    def write_gaussian_file(self, geometry):
+        # The job template is compiled once per set of elements and the file is written with one call
+        write_input(f"{self.output_filename}.com",
+                    Job.render(self.output_filename, geometry, self.charge, self.multiplicity))
+
+# ---------------- BATCH MODE ----------------
+
+_ensembles = {}  # Open ensemble files of this process, by file name
+
+def is_ensemble(xyz_file):
+    """True for an indexed archive or an xyz file with more than one structure in it"""
+    if os.path.exists(index_path(xyz_file)):
+        return True
+    with open_text(xyz_file) as f:
+        n_atoms = int(f.readline())
+        for _ in range(n_atoms + 1):
+            f.readline()
+        return any(line.strip() for line in f)
+
+def make_input(source, prefix="", suffix=""):
+    """
+    Write the .com file of one conformer: an xyz file, or (ensemble file, frame number, name prefix) of an
+    ensemble. A frame is named after the name= tag of its comment line (the original CREST number in a
+    screened archive), otherwise after its position, as crest_conf_separation.py names the files.
+    """
+    if isinstance(source, tuple):
+        xyz_file, frame, name_prefix = source
+        if xyz_file not in _ensembles:
+            _ensembles[xyz_file] = XYZFile(xyz_file)
+        lines = _ensembles[xyz_file].block(frame).splitlines()
+        name = name_prefix + (frame_name(lines[1]) or f'conformer{frame + 1:02}')
+    else:
+        lines, name = None, source
+    charge, multiplicity, geometry, unique_elements = ExtractCoords(source).extractCoordinates(lines)
+    write_output = WriteOutputFile(charge, multiplicity, geometry, name, prefix, suffix)
+    write_output.write_gaussian_file(geometry)
+    return write_output.output_filename
+
+def xyz_energy(xyz_file):
+    """Energy in the comment line of a single-structure xyz file (NaN if there is none)"""
+    with open_text(xyz_file) as f:
+        f.readline()
+        energy = comment_energy(f.readline())
+    return float('nan') if energy is None else energy
+
+def collect_sources(inputs, with_energies=False):
+    """
+    xyz files from the file names or glob patterns, and every frame of the ensemble files among them.
+    With with_energies, also the comment-line energy of every source (for the pre-screen).
+    """
+    sources, energies = [], []
+    matches = []
+    for pattern in inputs:
+        files = expand_glob(pattern)
+        if not files:
+            print(f"No xyz file matches {pattern}")
+        matches += files
+    for xyz_file in matches:
+        if is_ensemble(xyz_file):
+            # With several input files the frames of each ensemble get its name in front, so they cannot collide
+            name_prefix = f"{base_name(xyz_file)}_" if len(matches) > 1 else ""
+            with XYZFile(xyz_file) as ensemble:
+                sources += [(xyz_file, frame, name_prefix) for frame in range(len(ensemble))]
+                energies += ensemble.index.energies.tolist()
+        else:
+            sources.append(xyz_file)
+            if with_energies:
+                energies.append(xyz_energy(xyz_file))
+    return sources, energies
 
 ###############################################################################
-#                     Main Program Starts Here                                # 
+#                     Main Program Starts Here                                #
 ###############################################################################
-if len(sys.argv) < 2:
-    print("Usage: python script.py <xyz_file> [prefix] [suffix]")
-    sys.exit(1)
-
-### Here, if you give the prefix and suffix after filename, it will add them to filename, otherwise it will keep the original filename
-xyz_file = sys.argv[1]
-prefix_filename = sys.argv[2] if len(sys.argv) > 2 else ""
-suffix_filename = sys.argv[3] if len(sys.argv) > 3 else ""
-
-### Extract xyz coordinates from xyz file
-molecule = ExtractCoords(xyz_file)
-charge, multiplicity, geometry, unique_elements = molecule.extractCoordinates()
-
-#####################################################################################################################
-### Below are the rout cards for optimization, optical rotation, and NMR. You can change them according to your needs
-Route_Card_Opt = '# opt=tight b3lyp/gen empiricaldispersion=gd3bj int=ultrafine scf=conver=9 pseudo=cards'
-Route_Card_OR = '# polar=optrot cphf=rdfreq b3lyp/gen empiricaldispersion=gd3bj int=ultrafine scf=conver=9 scrf=(solvent=chloroform) pseudo=cards geom=check guess=read'
-Route_Card_NMR = '# nmr=giao mpw1pw91/gen int=ultrafine scf=conver=9 pseudo=cards scrf=(solvent=chloroform) geom=check guess=read'
-
-Gen_Basis_LAN_Opt = f"""
-{' '.join(element for element in unique_elements if element != 'I')} 0
-6-31+G(d,p)
-****
-"""
-if 'I' in unique_elements:
-    Gen_Basis_LAN_Opt += """\
-I 0
-LanL2DZ
-****
-
-I 0
-LanL2DZ
-"""
-
-Gen_Basis_LAN_NMR = f"""
-{' '.join(element for element in unique_elements if element != 'I')} 0
-6-311+G(2d,p)
-****
-"""
-if 'I' in unique_elements:
-    Gen_Basis_LAN_NMR += """\
-I 0
-LanL2DZ
-****
-
-I 0
-LanL2DZ
-"""
-
-Iodine_radius = 'I 2.74'
-Solvation_gen = 'eps=13.7 epsinf=1.54 HBondAcidity=0.18 HBondBasicity=0.52 SurfaceTensionAtInterface=68.29 CarbonAromaticity=0.231 ElectronegativeHalogenicity=0.0'
-#####################################################################################################################
-
-write_output = WriteOutputFile(charge, multiplicity, geometry, xyz_file, prefix_filename, suffix_filename)
-write_output.write_gaussian_file(geometry)
-
-print("#------------------------------------------------------------------------------#")
-print(f"# All Done Boss! The file {write_output.output_filename}.com has been written  ")
-print("#------------------------------------------------------------------------------#")
-
-### A script by Muhammad Ali Hashmi (14 August 2025)
\ No newline at end of file
+def main():
+    print("#----------------------------------------------------------#")
+    print("# Script to Create a Gaussian Input File from an XYZ File  #")
+    print("#----------------------------------------------------------#")
+
+    parser = argparse.ArgumentParser(description="Create Gaussian opt + optical rotation + NMR input files from xyz files.")
+    parser.add_argument("inputs", nargs="+",
+                        help="xyz files, glob patterns such as 'conformer*.xyz', or an ensemble/archive xyz file "
+                             "(one input per conformer); the old form 'file.xyz [prefix] [suffix]' still works")
+    parser.add_argument("--prefix", default="", help="added before every output file name")
+    parser.add_argument("--suffix", default="", help="added after every output file name")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes (0 = one per CPU core)")
+    add_screen_arguments(parser)
+    args = parser.parse_args()
+
+    ### Here, if you give the prefix and suffix after filename, it will add them to filename, otherwise it will keep the original filename
+    inputs = args.inputs
+    if 2 <= len(inputs) <= 3 and os.path.isfile(inputs[0]) and not any(expand_glob(arg) for arg in inputs[1:]):
+        args.prefix = inputs[1]
+        args.suffix = inputs[2] if len(inputs) > 2 else ""
+        inputs = inputs[:1]
+
+    criteria = criteria_from_args(args)
+    sources, energies = collect_sources(inputs, with_energies=criteria.active())
+    if criteria.active():
+        # Only the conformers passing the energy window / count / population cutoffs become jobs
+        result = screen(energies, criteria)
+        report(result, len(sources))
+        sources = [sources[index] for index in result.selected]
+    results, failures = run_batch(partial(make_input, prefix=args.prefix, suffix=args.suffix), sources, args.jobs)
+    for source, error in failures:
+        print(f"Could not write the input file for {source}: {error}")
+    written = Counter(name for _, name in results)
+    overwritten = sorted(name for name, count in written.items() if count > 1)
+    if overwritten:
+        print(f"Warning: several inputs gave the same file name, only the last one was kept: "
+              f"{', '.join(name + '.com' for name in overwritten)}")
+
+    print("#------------------------------------------------------------------------------#")
+    if len(results) == 1:
+        print(f"# All Done Boss! The file {results[0][1]}.com has been written  ")
+    else:
+        print(f"# All Done Boss! {len(results)} input files have been written  ")
+    print("#------------------------------------------------------------------------------#")
+
+if __name__ == "__main__":
+    main()
+
+### A script by Muhammad Ali Hashmi (14 August 2025)
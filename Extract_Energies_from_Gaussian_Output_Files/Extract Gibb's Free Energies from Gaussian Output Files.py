@@ -2,35 +2,53 @@
 # A Script to Extract Gibb's Free Energies from Gaussian Output Files #
 #---------------------------------------------------------------------#
 from pylab import *
+import os
 import glob
 import re
 import sys
+import argparse
 import fileinput
 
-print("A Script to Extract Gibb's Free Energies from Gaussian Output Files\n")
+# The shared batch driver lives in the Shared_Modules folder of this repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Shared_Modules'))
+from batch_driver import run_batch
+from compressed_io import expand_glob, open_text
 
-#Define the user input for input files (log files)
-input_files = input('Enter the names of input files or a range (e.g. *.log):  ')
+#Define a function which can find and copy the lines from a log file containing Gibb's Free Energies
+def gibbs_lines(files):
+    with open_text(files) as read_file:   #Reads the input file line by line (compressed files too)
+        return [line for line in read_file  #Keep the lines matching the stated line
+                if re.match("(.*)(S|s)um of electronic and thermal Free Energies(.*)", line)]
 
-#Define a variable to ask for the output filename and add .txt extension automatically
-output = open(input('Enter the name of output file to save the energies to:  ')+'.txt', 'w')
-
-#Define a function which can find and copy the lines from log files containing Gibb's Free Energies
-
-def gibbs_free_energies():
-    for files in glob.glob(input_files):   #It takes all the files from user input defined above the function.
-        read_file = open(files, "r")       #Reads the input files one by one
-        input = read_file.readlines()      #Reads the files line by line and stores into a variable "input"
+#Define a function which runs gibbs_lines on all the files (in parallel with jobs > 1) and writes the output
+def gibbs_free_energies(input_files, output, jobs=1):
+    #It takes all the files from user input, the results come back in the order of the file names
+    #Compressed versions of the files (e.g. *.log.gz) are matched as well
+    results, failures = run_batch(gibbs_lines, expand_glob(input_files), jobs)
+    for files, lines in results:
         output.write(files)                #Writes the name of the output file under processing
         output.write('\n')
-        for line in input:                 #A loop to go through the file and find the match of the stated line
-            if re.match("(.*)(S|s)um of electronic and thermal Free Energies(.*)", line):
-                output.write(line)         #Writes the line found into the ouput file defined by the user
-                output.write('\n')
-    read_file.close()
+        for line in lines:
+            output.write(line)             #Writes the line found into the ouput file defined by the user
+            output.write('\n')
+    for files, error in failures:
+        print("Could not read", files, ":", error)
     output.close()
 
-gibbs_free_energies()
+if __name__ == "__main__":
+    print("A Script to Extract Gibb's Free Energies from Gaussian Output Files\n")
+
+    parser = argparse.ArgumentParser(description="Extract Gibb's Free Energies from Gaussian output files.")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes (0 = one per CPU core)")
+    args = parser.parse_args()
+
+    #Define the user input for input files (log files)
+    input_files = input('Enter the names of input files or a range (e.g. *.log):  ')
+
+    #Define a variable to ask for the output filename and add .txt extension automatically
+    output = open(input('Enter the name of output file to save the energies to:  ')+'.txt', 'w')
+
+    gibbs_free_energies(input_files, output, args.jobs)
 
 #------------------------------------------#
 # Program by Muhammad Ali Hashmi   #
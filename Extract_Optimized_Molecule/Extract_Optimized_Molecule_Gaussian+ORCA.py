@@ -1,4 +1,14 @@
 import sys # Import sys to write to output files
+import os
+
+# The shared log parser lives in the Shared_Modules folder of this repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Shared_Modules'))
+from log_parser import parse_log, HARTREE_TO_KCAL
+from reverse_reader import find_last, lines_from
+from compressed_io import strip_compression_extension
+from program_detect import detect_program
+from trajectory import read_trajectory, write_xyz, save_npz, export_trajectory
+from input_templates import GaussianJob, GaussianStep, OrcaJob, write_input, xyz_text
 
 print("#----------------------------------------------------------------------------------------------#")
 print("#----------------------------------------------------------------------------------------------#")
@@ -49,38 +59,33 @@ class ExtractCoords(object):
     #----------------------------- Start of Function -----------------------------#
     def extractCoordinates(self, file):
         #print("\nExtracting the Molecule from the given output file")
-        f = open(file, 'r')
-        program = "N/A"
-        # Determine if we're dealing with Gaussian16 or ORCA
-        for line in f:
-            if line.find("Entering Gaussian System, Link 0=g16") != -1 or line.find("Copyright (c) 1988-2019, Gaussian, Inc.  All Rights Reserved.") != -1:
-                print("Reading Gaussian output file: ", file, '\n')
-                program = "g16"
-                break
-            elif line.find("* O   R   C   A *") != -1:
-                print("Reading ORCA output file: ", file, '\n')
-                program = "orca"
-                break
-        f.close()
+        # Determine if we're dealing with Gaussian (g09/g16) or ORCA from the header of the file
+        program = detect_program(file).program
+        if program == "gaussian":
+            print("Reading Gaussian output file: ", file, '\n')
+        elif program == "orca":
+            print("Reading ORCA output file: ", file, '\n')
 
         # GEOMETRY READING SECTION
         geom = []
-        # Read through Gaussian file, read "Standard orientation"
-        if program == "g16":
-            f = open(file, 'r')
-            for line in f:
-                if line.find("Standard orientation:") != -1:
-                    del geom[:] # Delete a previous orientation if any and store the current one
-                    for i in range(0, 4):
-                        readStructure = f.__next__() # Read the structure after 4th line from 'Standard Orientation'
-                    while True:
-                        readStructure = f.__next__()
-                        if readStructure.find("-----------") == -1: # Keep reading unless find ------
-                            readStructure = readStructure.split()
-                            geom.append(readStructure) # To append the current orientation to the list 'geom'
-                            #print(readStructure)
-                        else:
-                            break
+        # Read through Gaussian file, read the last "Standard orientation"
+        if program == "gaussian":
+            # Read backwards from the end of the file to the last orientation only
+            last = find_last(file, ["Standard orientation:"])["Standard orientation:"]
+            if last is not None:
+                f = lines_from(file, last[0])
+                f.__next__() # The 'Standard orientation' line itself
+                for i in range(0, 4):
+                    readStructure = f.__next__() # Read the structure after 4th line from 'Standard Orientation'
+                while True:
+                    readStructure = f.__next__()
+                    if readStructure.find("-----------") == -1: # Keep reading unless find ------
+                        readStructure = readStructure.split()
+                        geom.append(readStructure) # To append the current orientation to the list 'geom'
+                        #print(readStructure)
+                    else:
+                        break
+                f.close()
             # A Loop to delete the 1st and 3rd item of the list and convert 2nd item (Atomic Number) to Symbol
             for i in geom:
                 del i[0:3:2]
@@ -91,18 +96,20 @@ class ExtractCoords(object):
             return geom
         # Read through ORCA file and find the Cartesian coordinates
         elif program == "orca":
-            f = open(file, 'r')
-            for line in f:
-                if line.find("CARTESIAN COORDINATES (ANGSTROEM)") != -1:
-                    del geom[:]
+            # Read backwards from the end of the file to the last coordinate block only
+            last = find_last(file, ["CARTESIAN COORDINATES (ANGSTROEM)"])["CARTESIAN COORDINATES (ANGSTROEM)"]
+            if last is not None:
+                f = lines_from(file, last[0])
+                f.__next__() # The 'CARTESIAN COORDINATES (ANGSTROEM)' line itself
+                readStructure = f.__next__()
+                while True:
                     readStructure = f.__next__()
-                    while True:
-                        readStructure = f.__next__()
-                        if readStructure and readStructure.strip():
-                            readStructure = readStructure.split()
-                            geom.append(readStructure)
-                        else:
-                            break
+                    if readStructure and readStructure.strip():
+                        readStructure = readStructure.split()
+                        geom.append(readStructure)
+                    else:
+                        break
+                f.close()
             # A Loop to convert the coordinates to floating point numbers
             for i in geom:
                 i[1] = float(i[1])
@@ -110,23 +117,20 @@ class ExtractCoords(object):
                 i[3] = float(i[3])
             return geom
     #------------------------------ End of Function ------------------------------#
+    #------------------------------------------------------------------------------#
+    # Define a function to read every geometry of the optimization (trajectory)    #
+    #------------------------------------------------------------------------------#
+    #----------------------------- Start of Function -----------------------------#
+    # Returns a Trajectory: coords (n_frames, n_atoms, 3), atomic_numbers and energies as NumPy arrays
+    def extractTrajectory(self, file):
+        return read_trajectory(file)
+    #------------------------------ End of Function ------------------------------#
     # ------------------------------------------------------------------------------#
     # Define a function to read the input file & extract the SCF energy of molecule #
     # ------------------------------------------------------------------------------#
     # ----------------------------- Start of Function -----------------------------#
     def extractEnergies(self, file):
-        f = open(file, 'r')
-        program = "N/A"
-        # Determine if we're dealing with Gaussian16 or ORCA
-        for line in f:
-            if line.find("Entering Gaussian System, Link 0=g16") != -1 or line.find(
-                    "Copyright (c) 1988-2019, Gaussian, Inc.  All Rights Reserved.") != -1:
-                program = "g16"
-                break
-            elif line.find("* O   R   C   A *") != -1:
-                program = "orca"
-                break
-        f.close()
+        program = detect_program(file).program # Gaussian (g09/g16) or ORCA
         Charge = 0
         Multiplicity = 1
         SCF_Energy = "--SCF Energy NOT FOUND--"
@@ -137,32 +141,24 @@ class ExtractCoords(object):
         Gibbs_E_Kcal = "--Gibbs_E_Kcal NOT FOUND--"
         Zero_point_energy_Kcal = "--ZPE_Kcal NOT FOUND--"
         Enthalpy_of_Rxn_Kcal = "--Enthalpy_Kcal NOT FOUND--"
-        if program == "g16":
-            f = open(file, 'r')
-            input = f.readlines()
-            #filename = os.path.splitext(os.path.basename(input_file))[0]
-            for line in input:
-                if "Charge =" in line:
-                    complete_line = line.split()
-                    #print("I found the charge as ",int(complete_line[2]))
-                    Charge = int(complete_line[2])
-                    Multiplicity = int(complete_line[5])
-                if "SCF Done:" in line:
-                    complete_line = line.split()
-                    SCF_Energy = float(complete_line[4])
-                    SCF_E_Kcal = float(SCF_Energy) * 627.5095
-                if "Sum of electronic and zero-point Energies" in line:
-                    complete_line = line.split()
-                    Zero_point_energy = complete_line[6]
-                    Zero_point_energy_Kcal = float(Zero_point_energy) * 627.5095
-                if "Sum of electronic and thermal Free Energies" in line:
-                    gibbs_line = line.split()
-                    Gibbs_Energy = gibbs_line[7]
-                    Gibbs_E_Kcal = float(Gibbs_Energy) * 627.5095
-                if "Sum of electronic and thermal Enthalpies" in line:
-                    enthalpies_line = line.split()
-                    Rxn_Enthalpy = enthalpies_line[6]
-                    Enthalpy_of_Rxn_Kcal = float(Rxn_Enthalpy) * 627.5095
+        if program == "gaussian":
+            # Read the log once for charge/multiplicity, the last SCF energy and the thermochemistry
+            result = parse_log(file, events=("charge", "scf", "thermochemistry"))
+            if result.charge is not None:
+                Charge = result.charge
+                Multiplicity = result.multiplicity
+            if result.scf_energy is not None:
+                SCF_Energy = result.scf_energy
+                SCF_E_Kcal = SCF_Energy * HARTREE_TO_KCAL
+            if result.zero_point_energy is not None:
+                Zero_point_energy = result.zero_point_energy
+                Zero_point_energy_Kcal = Zero_point_energy * HARTREE_TO_KCAL
+            if result.gibbs_energy is not None:
+                Gibbs_Energy = result.gibbs_energy
+                Gibbs_E_Kcal = Gibbs_Energy * HARTREE_TO_KCAL
+            if result.enthalpy is not None:
+                Rxn_Enthalpy = result.enthalpy
+                Enthalpy_of_Rxn_Kcal = Rxn_Enthalpy * HARTREE_TO_KCAL
             return [Charge, Multiplicity, SCF_Energy, SCF_E_Kcal, Zero_point_energy, Zero_point_energy_Kcal, Gibbs_Energy,
                     Gibbs_E_Kcal, Rxn_Enthalpy, Enthalpy_of_Rxn_Kcal]
 #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% End of Class %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%#
@@ -176,66 +172,40 @@ class WriteOutputFile(object):
     def __init__(self, geometry, filename):
         self.geometry = geometry
         #self.filename = filename
-        self.filename = filename.split('\\').pop().split('/').pop().rsplit('.', 1)[0]
+        self.filename = strip_compression_extension(filename).split('\\').pop().split('/').pop().rsplit('.', 1)[0]
 
     #----------------------------------------------------#
     # To write the new coordinates into a Gaussian file  #
     #----------------------------------------------------#
     def GaussianFile(self, geometry):
-        output_file = sys.stdout
-        sys.stdout = open(self.filename+suffix_filename+'.com', 'w')
-        #print('%nprocshared=24') #shared processor line
-        #print('%mem=3000mb')#memory line
-        print('%chk='+self.filename+suffix_filename+'.chk') #Checkpoint File)
-        print(Route_Card_Gaussian+'\n') #Route card
-        print('Frequency of the Optimized Molecule\n') #Title Card
-        print(Charge, Multiplicity) #Charge and Multiplicity
-        #Below are the xyz coordinates
-        for i in geometry:
-            print(" {:<3}  {: .8f}  {: .8f}  {: .8f}".format(i[0], i[1], i[2], i[3]))
-        #print('\n'+Gen_Basis)  ## Uncomment this to print the basis set info at the end of file
-        #print('\n' + Solvation_gen)  ## Uncomment this to print the Generic Solvent at the end of file
-        print('\n')
-        sys.stdout.close()
-        sys.stdout = output_file
+        # %chk line, route card, title card, charge and multiplicity, then the xyz coordinates
+        job = GaussianJob((GaussianStep(Route_Card_Gaussian, 'Frequency of the Optimized Molecule',
+                                        #link0=('%nprocshared=24', '%mem=3000mb'),  ## Uncomment for the shared processor and memory lines
+                                        #sections=(Gen_Basis,),  ## Uncomment this to print the basis set info at the end of file
+                                        #solvent=Solvation_gen,  ## Uncomment this to print the Generic Solvent at the end of file
+                                        ),))
+        name = self.filename+suffix_filename
+        write_input(name+'.com', job.render(name, geometry, Charge, Multiplicity))
     #=====================================================#
     #------------------------------------------------------#
     # To write the new coordinates into an ORCA input file #
     #------------------------------------------------------#
     def OrcaFile(self, geometry):
-        output_file2 = sys.stdout
-        sys.stdout = open(self.filename+'R'+'.inp', 'w')
-        print('%MaxCore 3000') # Amount of memory per core
-        print('% pal nprocs 16') #Number of Processors
-        print('    end') #End of Block
-        print('#Single Point Energy of test molecule') #Title Card
-        print('! PBE0 D3 RIJCOSX def2-SVP def2-SVP/J Grid5 GridX7 VERYTIGHTSCF\n') #Route Card
-        #print('! moread')
-        #print('%moinp "old_test.gbw"\n')
-        print('*xyz 0 1') #Charge and Multiplicity
-        #Below are the xyz coordinates
-        for i in geometry:
-            print("{:<3}  {: .8f}  {: .8f}  {: .8f}".format(i[0], i[1], i[2], i[3]))
-        print('*')
-        sys.stdout.close()
-        sys.stdout = output_file2
+        job = OrcaJob('PBE0 D3 RIJCOSX def2-SVP def2-SVP/J Grid5 GridX7 VERYTIGHTSCF', # Route Card
+                      'Single Point Energy of test molecule', # Title Card
+                      maxcore=3000, nprocs=16, # Memory per core and number of processors
+                      #blocks=('! moread', '%moinp "old_test.gbw"\n'),
+                      )
+        write_input(self.filename+'R'+'.inp', job.render(geometry, 0, 1)) # Charge and Multiplicity
     #=====================================================#
 
     #-------------------------------------------------#
     # To write the new coordinates into an xyz file   #
     #-------------------------------------------------#
     def xyzFile(self, geometry):
-        # Find the total number of atoms in the molecule
-        n_atoms = len(geometry)
-        output_file3 = sys.stdout
-        sys.stdout = open(self.filename+'.xyz', 'w')
-        print(n_atoms)
-        print('Charge = ', Charge, 'Multiplicity =', Multiplicity, 'SCF Energy = ', SCF_energy, 'au')
-        #Below are the xyz coordinates
-        for i in geometry:
-            print("{:<3}  {: .8f}  {: .8f}  {: .8f}".format(i[0], i[1], i[2], i[3]))
-        sys.stdout.close()
-        sys.stdout = output_file3
+        # Atom count, comment line, then the xyz coordinates
+        comment = f'Charge =  {Charge} Multiplicity = {Multiplicity} SCF Energy =  {SCF_energy} au'
+        write_input(self.filename+'.xyz', xyz_text(geometry, comment))
     #=====================================================#
 #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% End of Class %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%#
 #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!#
@@ -254,6 +224,27 @@ output_file = sys.argv[1]
 #output_file = 'imidazolium.log'
 #output_file = 'sulphate.log'
 
+# Trajectory mode: write every geometry of the optimization, not only the last one
+# python3 Extract_Optimized_Molecule_Gaussian+ORCA.py file.log --trajectory       (multi-frame xyz file)
+# python3 Extract_Optimized_Molecule_Gaussian+ORCA.py file.log --trajectory npz   (NumPy .npz file)
+# python3 Extract_Optimized_Molecule_Gaussian+ORCA.py file.log --trajectory parquet (or arrow: columnar table, needs pyarrow)
+TRAJECTORY_FORMATS = ('xyz', 'npz', 'parquet', 'arrow')
+if '--trajectory' in sys.argv[2:]:
+    options = sys.argv[sys.argv.index('--trajectory') + 1:]
+    trajectory_format = options[0] if options else 'xyz'
+    if trajectory_format not in TRAJECTORY_FORMATS:
+        sys.exit(f"Unknown trajectory format '{trajectory_format}', use one of: {', '.join(TRAJECTORY_FORMATS)}")
+    trajectory = ExtractCoords(output_file).extractTrajectory(output_file)
+    trajectory_file = trajectory.filename + '_trajectory.' + trajectory_format
+    if trajectory_format == 'npz':
+        save_npz(trajectory, trajectory_file)
+    elif trajectory_format in ('parquet', 'arrow'):
+        trajectory_file = export_trajectory(trajectory, trajectory.filename + '_trajectory', trajectory_format)
+    else:
+        write_xyz(trajectory, trajectory_file)
+    print("Wrote", len(trajectory), "frames of", len(trajectory.atomic_numbers), "atoms to", trajectory_file)
+    sys.exit(0)
+
 # Molecule is a variable that runs the class ExtractCoords
 molecule = ExtractCoords(output_file)
 all_energies = molecule.extractEnergies(output_file) # This list contains all the energies extracted above
@@ -9,10 +9,15 @@ and display a nicely formatted table with convergence info.
 Author: Muhammad Ali Hashmi + ChatGPT
 """
 
+import os
 import sys
 import re
+import argparse
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
 
 try:
     from rich.console import Console
@@ -26,157 +31,142 @@ except Exception:
     )
     raise
 
+# The shared scanning modules live in the Shared_Modules folder of this repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Shared_Modules'))
+from mmap_scan import marker_text
+from compressed_io import open_text
+from program_detect import detect_program
+
 console = Console()
 
-# ---------------- HELPER FUNCTIONS ----------------
+# Markers and the number of lines after them that hold one convergence table
+GAUSSIAN_MARKERS = ([b"Converged?"], 6)
+ORCA_MARKERS = ([b"Geometry convergence"], 8)
 
-def detect_program(filepath: str) -> str:
-    """
-    Detect if the file is Gaussian or ORCA by scanning its contents.
-    """
-    markers = {
-        "gaussian": [
-            r"Entering Gaussian System, Link 0=g16",
-            r"Gaussian, Inc\.",
-            r"Copyright .* Gaussian, Inc\.",
-        ],
-        "orca": [
-            r"\* O\s+R\s+C\s+A \*",
-            r"ORCA",
-            r"Frank Neese",
-            r"Geometry convergence",
-        ],
-    }
-    with open(filepath, "r", errors="ignore") as f:
-        for _ in range(5000):  # Read first 5000 lines
-            line = f.readline()
-            if not line:
-                break
-            if any(re.search(pat, line) for pat in markers["gaussian"]):
-                return "gaussian"
-            if any(re.search(pat, line) for pat in markers["orca"]):
-                return "orca"
-    # Fallback detection based on whole text
-    text = Path(filepath).read_text(errors="ignore")
-    if re.search(r"Geometry convergence", text):
-        return "orca"
-    if re.search(r"Item\s+Value\s+Threshold\s+Converged\?", text):
-        return "gaussian"
-    return "unknown"
+# ---------------- HELPER FUNCTIONS ----------------
 
 def format_float(x: Optional[float], ndp: int = 6) -> str:
     """
     Format a float with fixed decimal places (no scientific notation).
     """
-    if x is None:
+    if x is None or np.isnan(x):
         return "-"
     return f"{x:.{ndp}f}"
 
-# ---------------- GAUSSIAN PARSER ----------------
+# ---------------- COLUMNAR RESULT ----------------
 
-def parse_gaussian(text: str) -> List[Dict[str, Any]]:
+@dataclass
+class ConvergenceSteps:
     """
-    Parse Gaussian16 'Item / Value / Threshold / Converged?' tables.
-    Returns list of steps, each containing values and convergence flags.
+    Convergence tables of an optimization as columns: one row per step, one column per criterion.
+    Missing values are NaN (the converged flag is then False).
     """
-    steps = []
-
-    # Find each "Item Value Threshold Converged?" header
-    header_pat = re.compile(r'Item\s+Value\s+Threshold\s+Converged\?', re.M)
-    headers = list(header_pat.finditer(text))
-
-    for i, m in enumerate(headers):
-        start = m.end()
-        end = headers[i+1].start() if i+1 < len(headers) else len(text)
-        block = text[start:end]
-
-        # Helper to parse a row from the block
-        def row(label: str) -> Optional[Tuple[float, float, bool]]:
-            r = re.search(rf'{label}\s+([-\d.]+)\s+([-\d.]+)\s+(YES|NO)', block)
-            if r:
-                return (float(r.group(1)), float(r.group(2)), r.group(3) == "YES")
-            return None
-
-        rows = {
-            "max_force": row(r"Maximum Force"),
-            "rms_force": row(r"RMS\s+Force"),
-            "max_disp":  row(r"Maximum Displacement"),
-            "rms_disp":  row(r"RMS\s+Displacement"),
-        }
-
-        # Parse Predicted change in Energy
-        energy_val: Optional[float] = None
-        er = re.search(r'Predicted change in Energy=([-\d.DEded+]+)', block)
-        if er:
-            sval = er.group(1).replace('D', 'E').replace('d', 'E')
-            try:
-                energy_val = float(sval)
-            except:
-                energy_val = None
-
-        steps.append({
-            "rows": rows,
-            "energy": {"val": energy_val},
-        })
-
-    return steps
+    criteria: Tuple[str, ...]     # Column names, e.g. ('max_force', 'rms_force', 'max_disp', 'rms_disp')
+    value: np.ndarray             # (n_steps, n_criteria)
+    threshold: np.ndarray         # (n_steps, n_criteria)
+    converged: np.ndarray         # (n_steps, n_criteria) bool
+    energy: np.ndarray            # (n_steps,) energy change
+    energy_threshold: np.ndarray  # (n_steps,) NaN when the file gives no threshold
+    energy_converged: np.ndarray  # (n_steps,) bool
+
+    def __len__(self) -> int:
+        return len(self.energy)
+
+def to_float(s: Optional[str]) -> float:
+    """Float of a Fortran-style number ('1.2D-05'), NaN if it is missing or cannot be read."""
+    if s is None:
+        return np.nan
+    try:
+        return float(s.replace('D', 'E').replace('d', 'E'))
+    except ValueError:
+        return np.nan
+
+def table_row(label: str, key: str) -> str:
+    """
+    Pattern of an optional '<label>  value  threshold  YES|NO' row of a convergence table.
+    Values are any token, so an unreadable one (Gaussian prints ******** on overflow) becomes NaN in
+    to_float instead of breaking the match of this row and of all rows after it.
+    """
+    return rf'(?:\s+{label}\s+(?P<{key}>\S+)\s+(?P<{key}_thr>\S+)\s+(?P<{key}_conv>YES|NO))?'
 
-# ---------------- ORCA PARSER ----------------
+def scan_convergence(text: str, pattern: "re.Pattern", criteria: Tuple[str, ...]) -> ConvergenceSteps:
+    """
+    One left-to-right pass of a compiled table pattern over the text: every match is one whole
+    convergence table (one optimization step) with its rows and energy change in named groups.
+    """
+    names = []
+    for key in criteria + ("energy",):
+        names += [key, f"{key}_thr", f"{key}_conv"]
+    groups = [pattern.groupindex.get(name) for name in names]
+    records = [[m.group(g) if g else None for g in groups] for m in pattern.finditer(text)]
+
+    n = len(records)
+    table = np.array(records, dtype=object).reshape(n, len(names))
+    numbers = np.array([to_float(s) for s in table[:, 0::3].ravel()] +
+                       [to_float(s) for s in table[:, 1::3].ravel()], dtype=float).reshape(2, n, len(criteria) + 1)
+    flags = table[:, 2::3] == "YES"
+    return ConvergenceSteps(criteria, numbers[0, :, :-1], numbers[1, :, :-1], flags[:, :-1],
+                            numbers[0, :, -1], numbers[1, :, -1], flags[:, -1])
+
+# ---------------- GAUSSIAN PARSER ----------------
 
-def parse_orca(text: str) -> List[Dict[str, Any]]:
+GAUSSIAN_CRITERIA = ("max_force", "rms_force", "max_disp", "rms_disp")
+GAUSSIAN_PATTERN = re.compile(
+    r'Item\s+Value\s+Threshold\s+Converged\?'
+    + table_row(r'Maximum Force', 'max_force')
+    + table_row(r'RMS\s+Force', 'rms_force')
+    + table_row(r'Maximum Displacement', 'max_disp')
+    + table_row(r'RMS\s+Displacement', 'rms_disp')
+    + r'(?:\s+Predicted change in Energy=(?P<energy>\S+))?')
+
+def parse_gaussian(text: Optional[str] = None, filepath: Optional[str] = None,
+                   use_mmap: bool = False) -> ConvergenceSteps:
     """
-    Parse ORCA 'Geometry convergence' tables.
-    Handles missing or shortened 'Energy change' lines.
+    Parse Gaussian 'Item / Value / Threshold / Converged?' tables and the predicted energy changes
+    in a single pass. With use_mmap=True only the tables are decoded from a memory-mapped filepath.
     """
-    steps = []
-    # Find all Geometry convergence blocks
-    cut_points = [m.start() for m in re.finditer(r'Geometry convergence', text)]
-    for i, s in enumerate(cut_points):
-        e = cut_points[i + 1] if i + 1 < len(cut_points) else len(text)
-        block = text[s:e]
-
-        def row3(label: str) -> Optional[Tuple[float, float, bool]]:
-            r = re.search(rf'{label}\s+([-\d.]+)\s+([-\d.]+)\s+(YES|NO)', block)
-            if r:
-                return (float(r.group(1)), float(r.group(2)), r.group(3) == "YES")
-            return None
-
-        rows = {
-            "rms_grad": row3(r"RMS gradient"),
-            "max_grad": row3(r"MAX gradient"),
-            "rms_step": row3(r"RMS step"),
-            "max_step": row3(r"MAX step"),
-        }
-
-        # Parse Energy change
-        energy_val: Optional[float] = None
-        energy_thr: Optional[float] = None
-        energy_conv: Optional[bool] = None
-
-        r_full = re.search(r'Energy change\s+([-\d.]+)\s+([-\d.]+)\s+(YES|NO)', block)
-        if r_full:
-            energy_val = float(r_full.group(1))
-            energy_thr = float(r_full.group(2))
-            energy_conv = (r_full.group(3) == "YES")
-        else:
-            r_short = re.search(r'Energy change\s+([-\d.]+)', block)
-            if r_short and r_short.group(1) != "...":
-                try:
-                    energy_val = float(r_short.group(1))
-                except:
-                    energy_val = None
+    if use_mmap:
+        text = marker_text(filepath, *GAUSSIAN_MARKERS)
+    return scan_convergence(text, GAUSSIAN_PATTERN, GAUSSIAN_CRITERIA)
 
-        if any(v is not None for v in rows.values()) or energy_val is not None:
-            steps.append({
-                "rows": rows,
-                "energy": {"val": energy_val, "thr": energy_thr, "conv": energy_conv},
-            })
+# ---------------- ORCA PARSER ----------------
 
-    return steps
+ORCA_CRITERIA = ("rms_grad", "max_grad", "rms_step", "max_step")
+ORCA_PATTERN = re.compile(
+    r'Geometry convergence[^\n]*\s+Item\s+value\s+Tolerance\s+Converged\s+-+'
+    r'(?:\s+Energy change\s+(?P<energy>\S+)(?:[ \t]+(?P<energy_thr>\S+)\s+(?P<energy_conv>YES|NO))?)?'
+    + table_row(r'RMS gradient', 'rms_grad')
+    + table_row(r'MAX gradient', 'max_grad')
+    + table_row(r'RMS step', 'rms_step')
+    + table_row(r'MAX step', 'max_step'))
+
+def parse_orca(text: Optional[str] = None, filepath: Optional[str] = None,
+               use_mmap: bool = False) -> ConvergenceSteps:
+    """
+    Parse ORCA 'Geometry convergence' tables in a single pass.
+    Handles missing (first step) or shortened 'Energy change' lines.
+    With use_mmap=True only the tables are decoded from a memory-mapped filepath.
+    """
+    if use_mmap:
+        text = marker_text(filepath, *ORCA_MARKERS)
+    steps = scan_convergence(text, ORCA_PATTERN, ORCA_CRITERIA)
+    # Drop tables in which nothing could be read
+    keep = ~np.isnan(steps.value).all(axis=1) | ~np.isnan(steps.energy)
+    return ConvergenceSteps(steps.criteria, steps.value[keep], steps.threshold[keep], steps.converged[keep],
+                            steps.energy[keep], steps.energy_threshold[keep], steps.energy_converged[keep])
 
 # ---------------- RENDER FUNCTIONS ----------------
 
-def render_gaussian(steps: List[Dict[str, Any]], filename: str) -> None:
+def criterion_cells(steps: ConvergenceSteps, step: int, i: int) -> Tuple[str, str]:
+    """The value cell (green when converged) and the YES/NO cell of one criterion of one step."""
+    val = steps.value[step, i]
+    if np.isnan(val):
+        return "-", "-"
+    s = format_float(val)
+    conv = steps.converged[step, i]
+    return (f"[green]{s}[/green]" if conv else s), ("YES" if conv else "NO")
+
+def render_gaussian(steps: ConvergenceSteps, filename: str) -> None:
     """
     Display Gaussian convergence table.
     Uses fixed ΔE threshold = 0.00004 for convergence.
@@ -199,40 +189,28 @@ def render_gaussian(steps: List[Dict[str, Any]], filename: str) -> None:
     table.add_column("Conv E", justify="center")
 
     e_thr = 0.00004  # Fixed threshold for Gaussian ΔE
+    de_conv = np.abs(steps.energy) <= e_thr
 
-    for idx, st in enumerate(steps, 1):
-        r = st["rows"]
-        e_val = st["energy"]["val"]
-
-        def val_cell(tup):
-            if not tup:
-                return "-"
-            val, thr, conv = tup
-            s = format_float(val)
-            return f"[green]{s}[/green]" if conv else s
+    for step in range(len(steps)):
+        cells = []
+        for i in range(len(steps.criteria)):
+            cells.extend(criterion_cells(steps, step, i))
 
         # Energy value cell
-        de_conv = None
-        if e_val is not None:
-            de_conv = abs(e_val) <= e_thr
-        de_cell = format_float(e_val)
-        if de_conv:
+        de_cell = format_float(steps.energy[step])
+        if de_conv[step]:
             de_cell = f"[green]{de_cell}[/green]"
+        if np.isnan(steps.energy[step]):
+            conv_cell = "-"
+        else:
+            conv_cell = "YES" if de_conv[step] else "NO"
 
-        table.add_row(
-            str(idx),
-            val_cell(r["max_force"]), "YES" if (r["max_force"] and r["max_force"][2]) else "NO" if r["max_force"] else "-",
-            val_cell(r["rms_force"]), "YES" if (r["rms_force"] and r["rms_force"][2]) else "NO" if r["rms_force"] else "-",
-            val_cell(r["max_disp"]),  "YES" if (r["max_disp"]  and r["max_disp"][2])  else "NO" if r["max_disp"]  else "-",
-            val_cell(r["rms_disp"]),  "YES" if (r["rms_disp"]  and r["rms_disp"][2])  else "NO" if r["rms_disp"]  else "-",
-            de_cell,
-            "YES" if (de_conv is True) else ("NO" if de_conv is False else "-"),
-        )
+        table.add_row(str(step + 1), *cells, de_cell, conv_cell)
 
     console.print(table)
     console.print(f"[dim]Note: ΔE threshold (Gaussian) fixed at {e_thr:.6f}[/dim]")
 
-def render_orca(steps: List[Dict[str, Any]], filename: str) -> None:
+def render_orca(steps: ConvergenceSteps, filename: str) -> None:
     """
     Display ORCA convergence table (thresholds read from file).
     """
@@ -252,61 +230,55 @@ def render_orca(steps: List[Dict[str, Any]], filename: str) -> None:
     table.add_column("Energy Change", justify="right")
     table.add_column("Conv E", justify="center")
 
-    for idx, st in enumerate(steps, 1):
-        r = st["rows"]
-        e = st["energy"]
-
-        def val_cell(tup):
-            if not tup:
-                return "-"
-            val, thr, conv = tup
-            s = format_float(val)
-            return f"[green]{s}[/green]" if conv else s
-
-        de_val = e.get("val") if e else None
-        de_conv = e.get("conv") if e else None
+    for step in range(len(steps)):
+        cells = []
+        for i in range(len(steps.criteria)):
+            cells.extend(criterion_cells(steps, step, i))
 
-        de_cell = format_float(de_val)
-        if de_conv:
-            de_cell = f"[green]{de_cell}[/green]"
+        # The energy is only judged when the file gives its threshold
+        de_cell = format_float(steps.energy[step])
+        if np.isnan(steps.energy_threshold[step]):
+            conv_cell = "-"
+        else:
+            de_conv = steps.energy_converged[step]
+            conv_cell = "YES" if de_conv else "NO"
+            if de_conv:
+                de_cell = f"[green]{de_cell}[/green]"
 
-        table.add_row(
-            str(idx),
-            val_cell(r["rms_grad"]), "YES" if (r["rms_grad"] and r["rms_grad"][2]) else "NO" if r["rms_grad"] else "-",
-            val_cell(r["max_grad"]), "YES" if (r["max_grad"] and r["max_grad"][2]) else "NO" if r["max_grad"] else "-",
-            val_cell(r["rms_step"]), "YES" if (r["rms_step"] and r["rms_step"][2]) else "NO" if r["rms_step"] else "-",
-            val_cell(r["max_step"]), "YES" if (r["max_step"] and r["max_step"][2]) else "NO" if r["max_step"] else "-",
-            de_cell,
-            "YES" if (de_conv is True) else ("NO" if de_conv is False else "-"),
-        )
+        table.add_row(str(step + 1), *cells, de_cell, conv_cell)
 
     console.print(table)
 
 # ---------------- MAIN ----------------
 
 def main():
-    if len(sys.argv) != 2:
-        console.print("[red]Usage:[/red] python3 orca_convergence_table.py <output.log|output.out>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Geometry optimization convergence table for Gaussian or ORCA output.")
+    parser.add_argument("filepath", help="output.log or output.out")
+    parser.add_argument("--mmap", action="store_true",
+                        help="memory-map the file and decode only the convergence tables (for very large files)")
+    args = parser.parse_args()
 
-    filepath = sys.argv[1]
+    filepath = args.filepath
     p = Path(filepath)
     if not p.exists():
         console.print(f"[red]File not found:[/red] {filepath}")
         sys.exit(1)
 
-    program = detect_program(filepath)
-    text = p.read_text(errors="ignore")
+    program = detect_program(filepath).program  # One read of the file header
+    text = None
+    if not args.mmap:
+        with open_text(filepath) as f:
+            text = f.read()
     fname_only = p.name
 
     if program == "gaussian":
-        steps = parse_gaussian(text)
+        steps = parse_gaussian(text, filepath, args.mmap)
         if not steps:
             console.print("[yellow]No Gaussian optimization steps detected.[/yellow]")
             sys.exit(0)
         render_gaussian(steps, fname_only)
     elif program == "orca":
-        steps = parse_orca(text)
+        steps = parse_orca(text, filepath, args.mmap)
         if not steps:
             console.print("[yellow]No ORCA optimization steps detected.[/yellow]")
             sys.exit(0)
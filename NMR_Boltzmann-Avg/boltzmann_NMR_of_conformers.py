@@ -1,49 +1,45 @@
 import os
+import sys
 import csv
-import time
 import math
+import time
+import argparse
 from collections import Counter
+from statistics import NormalDist
+
+import numpy as np
+
+# The shared log parser lives in the Shared_Modules folder of this repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Shared_Modules'))
+from log_parser import parse_log
+from reverse_reader import read_final
+from parse_cache import ParseCache
+from batch_driver import run_cached_batch
+from compressed_io import expand_glob
+from columnar_export import export_columns, FORMATS
+from boltzmann import boltzmann_factors, boltzmann_weights, boltzmann_average, stack_property, rt, monte_carlo, ERROR_MODELS
 
 # Constants
 T = 298.15
 R = 0.0083144626  # kJ/mol·K
 RT = R * T  # ≈ 2.47895702419
-
-# Header
-print("#====================== NMR Shielding Tensor Processing Script =========================#")
-print("#        Extracts energies/tensors, computes Boltzmann (consistent energy basis)        #")
-print("#========================================================================================#\n")
+KCAL_TO_KJ = 4.184
+MC_CONFIDENCE = 95.0  # Confidence interval (%) of the Monte Carlo averages
+MAX_EXPONENT = 700.0  # exp() of larger values overflows a float
 
 
 # Function to extract NMR data from Gaussian log file
-def NMR_shielding_tensors(input_file):
-    with open(input_file, 'r') as f:
-        lines = f.readlines()
-
-    filename = os.path.splitext(os.path.basename(input_file))[0]
-    atom_nos, symbols, tensors = [], [], []
-
-    scf_kj = None
-    gibbs_kj = None
-
-    # Read energies (reverse to get latest)
-    for line in reversed(lines):
-        if ("Sum of electronic and thermal Free Energies" in line) and (gibbs_kj is None):
-            parts = line.split()
-            gibbs_kj = float(parts[7]) * 2625.5  # Hartree -> kJ/mol
-        elif ("SCF Done" in line) and (scf_kj is None):
-            parts = line.split()
-            scf_kj = float(parts[4]) * 2625.5
-        if gibbs_kj is not None and scf_kj is not None:
-            break
-
-    # Read shielding tensors
-    for line in lines:
-        if "Isotropic =" in line:
-            parts = line.split()
-            atom_nos.append(int(parts[0]))
-            symbols.append(parts[1])
-            tensors.append(float(parts[4]))
+# data: the bytes of the file when they have already been read (see --io-concurrency)
+def NMR_shielding_tensors(input_file, data=None):
+    # The tensors need the whole file anyway, so one pass gives the energies (latest values) and the tensors
+    result = parse_log(input_file, events=("scf", "thermochemistry", "shielding"), data=data)
+
+    filename = result.filename
+    atom_nos, symbols, tensors = result.atom_nos, result.symbols, result.tensors
+
+    # Hartree -> kJ/mol
+    scf_kj = result.scf_energy * 2625.5 if result.scf_energy is not None else None
+    gibbs_kj = result.gibbs_energy * 2625.5 if result.gibbs_energy is not None else None
 
     return {
         "filename": filename,
@@ -57,162 +53,413 @@ def NMR_shielding_tensors(input_file):
     }
 
 
-# Extract data from all .log files
-conformer_data = []
-for file in os.listdir():
-    if file.endswith(".log") or file.endswith(".LOG"):
-        data = NMR_shielding_tensors(file)
+# Only the final energies, read from the end of the log (phase one of --population-threshold)
+def final_energies(input_file):
+    final = read_final(input_file, events=("scf", "thermochemistry"))
+    return {
+        "filename": final.filename,
+        "gibbs_kj": final.gibbs_energy * 2625.5 if final.gibbs_energy is not None else None,
+        "scf_kj": final.scf_energy * 2625.5 if final.scf_energy is not None else None,
+        "energy_kj": None,
+        # The tensors are only parsed in phase two, for the populated conformers
+        "atom_nos": [],
+        "symbols": [],
+        "tensors": []
+    }
+
+
+# Only the shielding tensors, in one streaming pass (phase two of --population-threshold, the energies are known already)
+def shielding_tensors(input_file, data=None):
+    result = parse_log(input_file, events=("shielding",), data=data)
+    return {"atom_nos": result.atom_nos, "symbols": result.symbols, "tensors": result.tensors}
+
+
+# Boltzmann populations (%) from the energies alone, with the same energy basis rule as boltzmann_analysis: one row per
+# temperature; with energy_shift (kJ/mol) each conformer is taken that much lower than all the others
+def energy_populations(conformer_data, temperatures=(T,), energy_shift=0.0):
+    use_gibbs = all(c["gibbs_kj"] is not None for c in conformer_data)
+    energies = [c["gibbs_kj"] if use_gibbs else c["scf_kj"] for c in conformer_data]
+    rt_values = rt(np.asarray(temperatures, dtype=float), R)
+    weights = boltzmann_weights(stack_property([e if e is not None else float('nan') for e in energies]), rt_values)
+    if energy_shift:
+        # w' = w g / (1 - w + w g) with g = exp(shift / RT): the factor of this conformer alone grows by g
+        gain = np.exp(np.minimum(energy_shift / rt_values, MAX_EXPONENT))[:, np.newaxis]
+        weights = weights * gain / (1.0 - weights + weights * gain)
+    return 100.0 * weights
+
+
+# Energy error (kJ/mol) of one conformer against the others at the Monte Carlo confidence limit
+def mc_energy_shift(sigma_kcal, model="normal"):
+    sigma = sigma_kcal * KCAL_TO_KJ
+    if model == "uniform":
+        return 2.0 * sigma  # Largest difference: this conformer -sigma, another one +sigma
+    # Difference of two independent normal errors, standard deviation sqrt(2) sigma
+    return NormalDist().inv_cdf(0.5 + MC_CONFIDENCE / 200.0) * math.sqrt(2.0) * sigma
+
+
+# Files of one ensemble (results of final_energies) whose highest population over the temperatures (and the energy
+# error energy_shift) is at least population_threshold %, the % left out at 298.15 K and the 298.15 K % of every file
+def populated_files(results, population_threshold, temperatures=(T,), energy_shift=0.0):
+    conformer_data = [data for _, data in results]
+    populations = energy_populations(conformer_data)[0]
+    highest = energy_populations(conformer_data, temperatures, energy_shift).max(axis=0)
+    populated = [file for (file, _), population in zip(results, highest.tolist()) if population >= population_threshold]
+    left_out = float(populations[highest < population_threshold].sum())
+    return populated, left_out, {file: population for (file, _), population in zip(results, populations.tolist())}
+
+
+# Two phases: the energies of every log from a tail read, then the tensors only of conformers above the threshold (%),
+# added to the energies of phase one so that no log is read from its end twice. A conformer is kept if it reaches the
+# threshold at any of the temperatures, with its energy lowered by energy_shift (the Monte Carlo error)
+def lazy_parse(files, population_threshold, cache, jobs=1, io_concurrency=0, temperatures=(T,), energy_shift=0.0):
+    results, failures = run_cached_batch(final_energies, files, "final_energies", cache, jobs)
+    populated, left_out, populations = populated_files(results, population_threshold, temperatures, energy_shift)
+    basis = f"highest population at {', '.join(f'{t:g}' for t in temperatures)} K"
+    if energy_shift:
+        basis += f", energies lowered by {energy_shift:.2f} kJ/mol for the Monte Carlo error"
+    print(f"Population threshold {population_threshold}% ({basis}): parsing the tensors of {len(populated)} of "
+          f"{len(results)} conformers ({left_out:.4f}% of the population at {T:g} K left out)")
+    if len(populated) < len(results):
+        print(f"ℹ️  The Boltzmann_% in the CSV of the conformers left out is their population among all conformers at {T:g} K.")
+
+    parsed, tensor_failures = run_cached_batch(shielding_tensors, populated, "shielding_tensors", cache,
+                                               jobs, io_concurrency)
+    parsed = dict(parsed)
+    failed = {file for file, _ in tensor_failures}
+    results = [(file, dict(data, **parsed.get(file, {"screened_percent": populations[file]})))
+               for file, data in results if file not in failed]
+    return results, failures + tensor_failures, set(files) - set(populated)
+
+
+# Extract data from all .log files, unchanged logs are loaded from the parse cache
+def extract_conformers(files, use_cache=True, jobs=1, io_concurrency=0, population_threshold=None, temperatures=(T,),
+                       energy_shift=0.0):
+    with ParseCache(enabled=use_cache) as cache:
+        if population_threshold is None:
+            results, failures = run_cached_batch(NMR_shielding_tensors, files, "NMR_shielding_tensors", cache,
+                                                 jobs, io_concurrency)
+            unpopulated = set()
+        else:
+            results, failures, unpopulated = lazy_parse(files, population_threshold, cache, jobs, io_concurrency,
+                                                        temperatures, energy_shift)
+
+    conformer_data = []
+    for file, data in results:
         conformer_data.append(data)
+        if file in unpopulated:
+            continue  # Below the population threshold: energies only, excluded from the averages (kept in CSV)
         if len(data["tensors"]) == 0:
             print(f"⚠️  {file}: No NMR shielding tensors found. It will be EXCLUDED from Boltzmann calculations (kept in CSV).")
         else:
             print(f"Processed tensors: {file}")
+    for file, error in failures:
+        print(f"⚠️  {file}: Could not be read ({error}). It will be skipped.")
+    return conformer_data
 
-if len(conformer_data) == 0:
-    print("❌ No .log files found in the current directory.")
-    raise SystemExit(1)
-
-# Decide energy basis: ONLY use Gibbs if EVERY conformer has it; otherwise use SCF for ALL
-all_have_gibbs = all(c["gibbs_kj"] is not None for c in conformer_data)
-energy_mode = "gibbs" if all_have_gibbs else "scf"
-
-if energy_mode == "gibbs":
-    print("\n✅ Using Gibbs Free Energies for ALL conformers (all files had Gibbs).")
-else:
-    print("\nℹ️  Not all conformers had Gibbs Free Energy; using SCF energies for ALL conformers to keep the basis consistent.")
-
-# Set the energy used according to chosen basis
-for c in conformer_data:
-    c["energy_kj"] = c["gibbs_kj"] if energy_mode == "gibbs" else c["scf_kj"]
-
-# Safety: ensure we have energies for sorting; if any file lacks even SCF, warn
-missing_energy = [c["filename"] for c in conformer_data if c["energy_kj"] is None]
-if missing_energy:
-    print("⚠️  These files had no usable energy (SCF/Gibbs not found) and will be placed last in the CSV:", ", ".join(missing_energy))
-
-# Sort by used energy, placing missing at end
-conformer_data.sort(key=lambda x: (x["energy_kj"] is None, x["energy_kj"] if x["energy_kj"] is not None else float('inf')))
-
-# Build list of "valid" conformers for Boltzmann: must have tensors and matching atom count
-nonempty = [c for c in conformer_data if len(c["tensors"]) > 0]
-
-if len(nonempty) == 0:
-    print("\n❗ No conformers with shielding tensors found. Will write energies only; no Boltzmann averages possible.")
-    num_atoms = 0
-    valid_conformers = []
-else:
-    # Choose the most common tensor length to avoid mismatches silently breaking averages
-    length_counts = Counter(len(c["tensors"]) for c in nonempty)
-    target_num_atoms, _ = max(length_counts.items(), key=lambda kv: kv[1])
-    # Anything not matching target count is excluded (warn)
-    valid_conformers = []
-    for c in nonempty:
-        if len(c["tensors"]) == target_num_atoms:
-            valid_conformers.append(c)
-        else:
-            print(f"⚠️  {c['filename']}: Tensor length {len(c['tensors'])} differs from majority ({target_num_atoms}). Excluding from Boltzmann calc (kept in CSV).")
-    num_atoms = target_num_atoms if valid_conformers else 0
-
-# Compute Boltzmann only over valid_conformers
-partition_function = 0.0
-min_energy = None
-if valid_conformers:
-    # Min energy among valid set (basis: selected energy_mode)
-    min_energy = min(c["energy_kj"] for c in valid_conformers if c["energy_kj"] is not None)
-
-    # Compute factors
-    for c in valid_conformers:
-        rel_E = c["energy_kj"] - min_energy
-        c["rel_energy"] = rel_E
-        c["boltzmann_factor"] = math.exp(-rel_E / RT)
-        partition_function += c["boltzmann_factor"]
-
-    # Compute percentages
-    for c in valid_conformers:
-        c["boltzmann_percent"] = 100.0 * c["boltzmann_factor"] / partition_function if partition_function > 0 else None
-
-    # Boltzmann-averaged shielding tensors
-    boltz_avg_tensors = [0.0 for _ in range(num_atoms)]
-    for c in valid_conformers:
-        weight = c["boltzmann_factor"] / partition_function if partition_function > 0 else 0.0
-        for i in range(num_atoms):
-            boltz_avg_tensors[i] += weight * c["tensors"][i]
-else:
-    boltz_avg_tensors = []
-
-# For conformers excluded from Boltzmann (no tensors or mismatched), still compute/display relative energy
-# relative to min_energy of valid set (if available)
-for c in conformer_data:
-    if min_energy is not None and c["energy_kj"] is not None:
-        c["rel_energy"] = c["energy_kj"] - min_energy
+
+# Choose the energy basis, keep the conformers usable for Boltzmann and compute the averages
+def boltzmann_analysis(conformer_data):
+    # Decide energy basis: ONLY use Gibbs if EVERY conformer has it; otherwise use SCF for ALL
+    all_have_gibbs = all(c["gibbs_kj"] is not None for c in conformer_data)
+    energy_mode = "gibbs" if all_have_gibbs else "scf"
+
+    if energy_mode == "gibbs":
+        print("\n✅ Using Gibbs Free Energies for ALL conformers (all files had Gibbs).")
     else:
-        c["rel_energy"] = None
+        print("\nℹ️  Not all conformers had Gibbs Free Energy; using SCF energies for ALL conformers to keep the basis consistent.")
+
+    # Set the energy used according to chosen basis
+    for c in conformer_data:
+        c["energy_kj"] = c["gibbs_kj"] if energy_mode == "gibbs" else c["scf_kj"]
+
+    # Safety: ensure we have energies for sorting; if any file lacks even SCF, warn
+    missing_energy = [c["filename"] for c in conformer_data if c["energy_kj"] is None]
+    if missing_energy:
+        print("⚠️  These files had no usable energy (SCF/Gibbs not found) and will be placed last in the CSV:", ", ".join(missing_energy))
 
-    # Fill Boltzmann fields only for the valid set
-    if c in valid_conformers:
-        # already set above
-        pass
+    # Sort by used energy, placing missing at end
+    conformer_data.sort(key=lambda x: (x["energy_kj"] is None, x["energy_kj"] if x["energy_kj"] is not None else float('inf')))
+
+    # Build list of "valid" conformers for Boltzmann: must have tensors and matching atom count
+    nonempty = [c for c in conformer_data if len(c["tensors"]) > 0]
+
+    if len(nonempty) == 0:
+        print("\n❗ No conformers with shielding tensors found. Will write energies only; no Boltzmann averages possible.")
+        num_atoms = 0
+        valid_conformers = []
+    else:
+        # Choose the most common tensor length to avoid mismatches silently breaking averages
+        length_counts = Counter(len(c["tensors"]) for c in nonempty)
+        target_num_atoms, _ = max(length_counts.items(), key=lambda kv: kv[1])
+        # Anything not matching target count is excluded (warn)
+        valid_conformers = []
+        for c in nonempty:
+            if len(c["tensors"]) == target_num_atoms:
+                valid_conformers.append(c)
+            else:
+                print(f"⚠️  {c['filename']}: Tensor length {len(c['tensors'])} differs from majority ({target_num_atoms}). Excluding from Boltzmann calc (kept in CSV).")
+        num_atoms = target_num_atoms if valid_conformers else 0
+
+    # Compute Boltzmann only over valid_conformers
+    min_energy = None
+    energies = tensors = stack_property([])
+    if valid_conformers:
+        # Energies of the valid set (basis: selected energy_mode), NaN where a file had none (weight 0)
+        energies = stack_property([c["energy_kj"] if c["energy_kj"] is not None else float('nan')
+                                   for c in valid_conformers])
+        known = [c["energy_kj"] for c in valid_conformers if c["energy_kj"] is not None]
+        min_energy = min(known) if known else None
+
+        # Factors and weights of all conformers at once (relative to the lowest energy, no underflow for large energy spans)
+        factors = boltzmann_factors(energies, RT)
+        weights = boltzmann_weights(energies, RT)
+        for c, factor, weight in zip(valid_conformers, factors.tolist(), weights.tolist()):
+            c["boltzmann_factor"] = factor
+            c["boltzmann_percent"] = 100.0 * weight if min_energy is not None else None
+
+        # Boltzmann-averaged shielding tensors: weights times the (conformers x atoms) tensor matrix
+        tensors = stack_property([c["tensors"] for c in valid_conformers])
+        boltz_avg_tensors = boltzmann_average(tensors, weights).tolist()
     else:
-        c["boltzmann_factor"] = None
-        c["boltzmann_percent"] = None
+        boltz_avg_tensors = []
+
+    # For conformers excluded from Boltzmann (no tensors or mismatched), still compute/display relative energy
+    # relative to min_energy of valid set (if available)
+    for c in conformer_data:
+        if min_energy is not None and c["energy_kj"] is not None:
+            c["rel_energy"] = c["energy_kj"] - min_energy
+        else:
+            c["rel_energy"] = None
+
+        # Fill Boltzmann fields only for the valid set
+        if c in valid_conformers:
+            # already set above
+            pass
+        else:
+            c["boltzmann_factor"] = None
+            # Conformers below --population-threshold keep their population from the energies of all conformers
+            c["boltzmann_percent"] = c.get("screened_percent")
+
+    return {
+        "energy_mode": energy_mode,
+        "valid_conformers": valid_conformers,
+        "num_atoms": num_atoms,
+        "boltz_avg_tensors": boltz_avg_tensors,
+        # Energies (kJ/mol, NaN if missing) and (conformers x atoms) tensor matrix of the valid set
+        "energies": energies,
+        "tensors": tensors
+    }
+
+
+# Populations and averaged tensors at every temperature from the one parse: one (temperatures x conformers) weight matrix
+def temperature_sweep(analysis, temperatures):
+    weights = boltzmann_weights(analysis["energies"], rt(temperatures, R))
+    return weights, boltzmann_average(analysis["tensors"], weights)
+
+
+# Long-format CSV of the temperature sweep: one row per temperature and conformer population or atom average
+def write_temperature_sweep(out_name, analysis, temperatures):
+    valid_conformers = analysis["valid_conformers"]
+    weights, averages = temperature_sweep(analysis, temperatures)
+    atom_numbers = valid_conformers[0]["atom_nos"]
+    atom_symbols = valid_conformers[0]["symbols"]
+
+    with open(out_name, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Temperature_K", "Quantity", "Conformer_or_Atom", "Atom_Symbol", "Value"])
+        for temperature, row_weights, row_averages in zip(temperatures, weights.tolist(), averages.tolist()):
+            writer.writerows([temperature, "Boltzmann_%", c["filename"], "", f"{100.0 * w:.4f}"]
+                             for c, w in zip(valid_conformers, row_weights))
+            writer.writerows([temperature, "Boltzmann_Averaged_Shielding_Tensor", n, s, round(x, 6)]
+                             for n, s, x in zip(atom_numbers, atom_symbols, row_averages))
 
-# Get atom numbers and symbols from first valid conformer (if any)
-atom_numbers = valid_conformers[0]["atom_nos"] if valid_conformers else []
-atom_symbols = valid_conformers[0]["symbols"] if valid_conformers else []
 
 # CSV Output
-out_name = 'NMR_Boltzmann_Averaged.csv'
-with open(out_name, 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
+def write_csv(out_name, conformer_data, analysis):
+    valid_conformers = analysis["valid_conformers"]
+    num_atoms = analysis["num_atoms"]
+    boltz_avg_tensors = analysis["boltz_avg_tensors"]
+
+    # Get atom numbers and symbols from first valid conformer (if any)
+    atom_numbers = valid_conformers[0]["atom_nos"] if valid_conformers else []
+    atom_symbols = valid_conformers[0]["symbols"] if valid_conformers else []
+
+    with open(out_name, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+
+        # Header
+        header = [
+            "Conformer",
+            "SCF_Energy_kJ/mol",
+            "Gibbs_Energy_kJ/mol",
+            "Used_Energy_kJ/mol",
+            "Relative_Energy_kJ/mol",
+            "Boltzmann_Factor",
+            "Boltzmann_%"
+        ]
+        header += [f"Atom_{i+1}" for i in range(num_atoms)]
+        writer.writerow(header)
+
+        # Data rows
+        for c in conformer_data:
+            row = [
+                c["filename"],
+                round(c["scf_kj"], 6) if c["scf_kj"] is not None else "",
+                round(c["gibbs_kj"], 6) if c["gibbs_kj"] is not None else "",
+                round(c["energy_kj"], 6) if c["energy_kj"] is not None else "",
+                round(c["rel_energy"], 6) if c["rel_energy"] is not None else "",
+                (f"{c['boltzmann_factor']:.6f}" if c["boltzmann_factor"] is not None else ""),
+                (f"{c['boltzmann_percent']:.4f}" if c["boltzmann_percent"] is not None else "")
+            ]
+            # Only print tensors if the row has the expected count
+            if num_atoms and len(c["tensors"]) == num_atoms:
+                row += [round(t, 6) for t in c["tensors"]]
+            writer.writerow(row)
+
+        # Extra spacing row
+        writer.writerow([])
+
+        # If we have valid conformers (and thus atom metadata), write the two helper rows and the average
+        if valid_conformers:
+            # Atom number row
+            atom_num_row = ["Atom_Numbers", "", "", "", "", "", ""] + atom_numbers
+            writer.writerow(atom_num_row)
+
+            # Atom symbol row
+            atom_sym_row = ["Atom_Symbols", "", "", "", "", "", ""] + atom_symbols
+            writer.writerow(atom_sym_row)
+
+            # Boltzmann average row
+            avg_row = ["Boltzmann_Averaged_Shielding_Tensors", "", "", "", "", "", ""]
+            avg_row += [round(x, 6) for x in boltz_avg_tensors]
+            writer.writerow(avg_row)
+        else:
+            writer.writerow(["(No valid NMR tensors found among conformers — averages not computed)"])
+
+
+# Columnar copy (Parquet/Arrow or .npz): one row per conformer, the tensors as a (conformers x atoms) matrix
+def write_columnar(out_base, conformer_data, analysis, fmt="auto"):
+    num_atoms = analysis["num_atoms"]
+    valid_conformers = analysis["valid_conformers"]
 
+    def column(key):
+        return [c[key] if c[key] is not None else float('nan') for c in conformer_data]
+
+    columns = {
+        "conformer": [c["filename"] for c in conformer_data],
+        "scf_energy_kj": column("scf_kj"),
+        "gibbs_energy_kj": column("gibbs_kj"),
+        "used_energy_kj": column("energy_kj"),
+        "relative_energy_kj": column("rel_energy"),
+        "boltzmann_factor": column("boltzmann_factor"),
+        "boltzmann_percent": column("boltzmann_percent"),
+    }
+    if num_atoms:
+        # Rows of conformers left out of the average (no or mismatched tensors) are NaN
+        columns["tensors"] = [c["tensors"] if len(c["tensors"]) == num_atoms else [float('nan')] * num_atoms
+                              for c in conformer_data]
+    metadata = {
+        "energy_mode": analysis["energy_mode"],
+        "temperature_K": T,
+        "atom_numbers": valid_conformers[0]["atom_nos"] if valid_conformers else [],
+        "atom_symbols": valid_conformers[0]["symbols"] if valid_conformers else [],
+        "boltzmann_averaged_tensors": list(analysis["boltz_avg_tensors"]),
+    }
+    return export_columns(out_base, columns, metadata, fmt)
+
+
+# Monte Carlo: spread of the averaged tensors and populations when the energies have an error of sigma kcal/mol
+def write_monte_carlo(out_name, analysis, samples, sigma_kcal, model="normal", seed=None):
+    valid_conformers = analysis["valid_conformers"]
+    result = monte_carlo(analysis["energies"], analysis["tensors"], RT, sigma_kcal * KCAL_TO_KJ, samples,
+                         model, MC_CONFIDENCE, seed)
+    ci = f"{MC_CONFIDENCE:g}"
+
+    with open(out_name, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Atom_Number", "Atom_Symbol", "Boltzmann_Averaged_Shielding_Tensor", "MC_Mean", "MC_Std",
+                         f"CI_{ci}%_Low", f"CI_{ci}%_High"])
+        writer.writerows([n, s, round(x, 6), round(m, 6), round(sd, 6), round(lo, 6), round(hi, 6)]
+                         for n, s, x, m, sd, lo, hi in zip(valid_conformers[0]["atom_nos"], valid_conformers[0]["symbols"],
+                                                           analysis["boltz_avg_tensors"], result.mean.tolist(),
+                                                           result.std.tolist(), result.lower.tolist(), result.upper.tolist()))
+        writer.writerow([])
+        writer.writerow(["Conformer", "Boltzmann_%", "MC_Population_Mean_%", "MC_Population_Std_%", "MC_Population_Variance_%^2"])
+        writer.writerows([c["filename"], f"{c['boltzmann_percent']:.4f}" if c["boltzmann_percent"] is not None else "",
+                          f"{100.0 * m:.4f}", f"{100.0 * sd:.4f}", f"{10000.0 * v:.6f}"]
+                         for c, m, sd, v in zip(valid_conformers, result.population_mean.tolist(),
+                                                result.population_std.tolist(), result.population_var.tolist()))
+    return result
+
+
+def main():
     # Header
-    header = [
-        "Conformer",
-        "SCF_Energy_kJ/mol",
-        "Gibbs_Energy_kJ/mol",
-        "Used_Energy_kJ/mol",
-        "Relative_Energy_kJ/mol",
-        "Boltzmann_Factor",
-        "Boltzmann_%"
-    ]
-    header += [f"Atom_{i+1}" for i in range(num_atoms)]
-    writer.writerow(header)
-
-    # Data rows
-    for c in conformer_data:
-        row = [
-            c["filename"],
-            round(c["scf_kj"], 6) if c["scf_kj"] is not None else "",
-            round(c["gibbs_kj"], 6) if c["gibbs_kj"] is not None else "",
-            round(c["energy_kj"], 6) if c["energy_kj"] is not None else "",
-            round(c["rel_energy"], 6) if c["rel_energy"] is not None else "",
-            (f"{c['boltzmann_factor']:.6f}" if c["boltzmann_factor"] is not None else ""),
-            (f"{c['boltzmann_percent']:.4f}" if c["boltzmann_percent"] is not None else "")
-        ]
-        # Only print tensors if the row has the expected count
-        if num_atoms and len(c["tensors"]) == num_atoms:
-            row += [round(t, 6) for t in c["tensors"]]
-        writer.writerow(row)
+    print("#====================== NMR Shielding Tensor Processing Script =========================#")
+    print("#        Extracts energies/tensors, computes Boltzmann (consistent energy basis)        #")
+    print("#========================================================================================#\n")
+
+    parser = argparse.ArgumentParser(description="Boltzmann-averaged NMR shielding tensors of all *.log files in the current directory.")
+    parser.add_argument("--no-cache", action="store_true", help="parse every log again instead of using .parse_cache.sqlite")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes (0 = one per CPU core)")
+    parser.add_argument("--io-concurrency", type=int, default=0,
+                        help="keep N file reads in flight at once (for logs on a network filesystem such as Lustre/NFS)")
+    parser.add_argument("--columnar", nargs="?", const="auto", choices=("auto",) + FORMATS,
+                        help="also write the results as Parquet/Arrow (with pyarrow) or .npz, for fast reloading")
+    parser.add_argument("--population-threshold", type=float, metavar="PERCENT",
+                        help="read only the energies of all logs first and parse the tensors only of conformers with "
+                             "at least this Boltzmann population in %% (e.g. 0.1); the others are left out of the averages")
+    parser.add_argument("--temperatures", type=float, nargs="+", metavar="T",
+                        help="also write the populations and averaged tensors at each of these temperatures (K) "
+                             "to NMR_Boltzmann_Temperature_Sweep.csv, e.g. --temperatures 195 233 273 298.15 330")
+    parser.add_argument("--mc-samples", type=int, metavar="N",
+                        help="Monte Carlo estimate of the uncertainty: recompute the averages for N sets of perturbed "
+                             "energies (e.g. 100000) and write NMR_Boltzmann_MonteCarlo.csv")
+    parser.add_argument("--mc-sigma", type=float, default=1.0,
+                        help="energy error of every conformer in kcal/mol for --mc-samples (default: 1.0)")
+    parser.add_argument("--mc-model", choices=ERROR_MODELS, default="normal",
+                        help="energy error model: normal (standard deviation sigma) or uniform (within +-sigma)")
+    parser.add_argument("--mc-seed", type=int, help="random seed, to get the same Monte Carlo samples again")
+    args = parser.parse_args()
+
+    # Extract data from all .log files (also compressed ones: .log.gz, .log.xz, .log.bz2, .log.zst)
+    files = sorted(set(expand_glob("*.log") + expand_glob("*.LOG")))
+    # With a population threshold, keep every conformer that reaches it at any requested temperature or within the
+    # Monte Carlo energy error, so the sweep and the Monte Carlo do not lose conformers that only matter there
+    temperatures = sorted({T, *(args.temperatures or [])})
+    energy_shift = mc_energy_shift(args.mc_sigma, args.mc_model) if args.mc_samples else 0.0
+    conformer_data = extract_conformers(files, use_cache=not args.no_cache, jobs=args.jobs,
+                                        io_concurrency=args.io_concurrency, population_threshold=args.population_threshold,
+                                        temperatures=temperatures, energy_shift=energy_shift)
+
+    if len(conformer_data) == 0:
+        print("❌ No .log files found in the current directory.")
+        raise SystemExit(1)
+
+    analysis = boltzmann_analysis(conformer_data)
+
+    out_name = 'NMR_Boltzmann_Averaged.csv'
+    write_csv(out_name, conformer_data, analysis)
+    if args.columnar:
+        print(f"Columnar copy written to {write_columnar('NMR_Boltzmann_Averaged', conformer_data, analysis, args.columnar)}")
+    if args.temperatures:
+        if analysis["valid_conformers"]:
+            write_temperature_sweep('NMR_Boltzmann_Temperature_Sweep.csv', analysis, args.temperatures)
+            print(f"Temperature sweep ({len(args.temperatures)} temperatures) written to NMR_Boltzmann_Temperature_Sweep.csv")
+        else:
+            print("❗ No valid NMR tensors, the temperature sweep was not written.")
+    if args.mc_samples:
+        if analysis["valid_conformers"]:
+            start = time.time()
+            write_monte_carlo('NMR_Boltzmann_MonteCarlo.csv', analysis, args.mc_samples, args.mc_sigma,
+                              args.mc_model, args.mc_seed)
+            print(f"Monte Carlo ({args.mc_samples} samples, {args.mc_model} error of {args.mc_sigma} kcal/mol) written to "
+                  f"NMR_Boltzmann_MonteCarlo.csv in {time.time() - start:.1f} s")
+        else:
+            print("❗ No valid NMR tensors, the Monte Carlo uncertainty was not computed.")
 
-    # Extra spacing row
-    writer.writerow([])
+    print(f"\n✅ All Done Boss!!! I Wrote: {out_name} file for your consideration.")
+    print("📅 Completed at :", time.strftime("Time: %X, Date: %d/%m/%Y"))
 
-    # If we have valid conformers (and thus atom metadata), write the two helper rows and the average
-    if valid_conformers:
-        # Atom number row
-        atom_num_row = ["Atom_Numbers", "", "", "", "", "", ""] + atom_numbers
-        writer.writerow(atom_num_row)
-
-        # Atom symbol row
-        atom_sym_row = ["Atom_Symbols", "", "", "", "", "", ""] + atom_symbols
-        writer.writerow(atom_sym_row)
-
-        # Boltzmann average row
-        avg_row = ["Boltzmann_Averaged_Shielding_Tensors", "", "", "", "", "", ""]
-        avg_row += [round(x, 6) for x in boltz_avg_tensors]
-        writer.writerow(avg_row)
-    else:
-        writer.writerow(["(No valid NMR tensors found among conformers — averages not computed)"])
 
-print(f"\n✅ All Done Boss!!! I Wrote: {out_name} file for your consideration.")
-print("📅 Completed at :", time.strftime("Time: %X, Date: %d/%m/%Y"))
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+'''This script runs boltzmann_NMR_of_conformers.py over a whole tree of compounds and isomers
+(e.g. all diastereomers of a set of natural products) in one go:
+
+    compound-01/isomer-A/*.log
+    compound-01/isomer-B/*.log
+    compound-02/...
+
+python3 nmr_pipeline.py screening_run --jobs 16
+
+The logs of all isomers are parsed together by one pool of worker processes, with one parse cache
+(.parse_cache.sqlite in the top folder, read and written by the main process only, so it is also safe
+on NFS/Lustre). Every isomer is then Boltzmann-averaged on its own and gets its NMR_Boltzmann_Averaged.csv
+(ready for nmr_scaling_dp4.py); all results are also collected in one indexed SQLite database and one
+long-format CSV in the top folder.'''
+
+import os
+import csv
+import glob
+import sqlite3
+import argparse
+from dataclasses import dataclass
+from typing import List
+
+# The functions of the single-directory script, which also puts Shared_Modules on the path
+from boltzmann_NMR_of_conformers import (NMR_shielding_tensors, final_energies, shielding_tensors, populated_files,
+                                         boltzmann_analysis, write_csv)
+from batch_driver import run_cached_batch
+from compressed_io import expand_glob
+from parse_cache import ParseCache, CACHE_FILE
+
+SCHEMA = """
+CREATE TABLE isomers (
+    id INTEGER PRIMARY KEY,
+    compound TEXT NOT NULL,
+    isomer TEXT NOT NULL,
+    path TEXT NOT NULL,
+    energy_mode TEXT,
+    conformers INTEGER NOT NULL,
+    averaged_conformers INTEGER NOT NULL,
+    UNIQUE (compound, isomer));
+CREATE TABLE conformers (
+    isomer_id INTEGER NOT NULL REFERENCES isomers (id),
+    conformer TEXT NOT NULL,
+    scf_energy_kj REAL,
+    gibbs_energy_kj REAL,
+    used_energy_kj REAL,
+    relative_energy_kj REAL,
+    boltzmann_factor REAL,
+    boltzmann_percent REAL);
+CREATE TABLE shieldings (
+    isomer_id INTEGER NOT NULL REFERENCES isomers (id),
+    atom_number INTEGER NOT NULL,
+    atom_symbol TEXT NOT NULL,
+    shielding REAL NOT NULL,
+    PRIMARY KEY (isomer_id, atom_number));
+CREATE INDEX conformers_by_isomer ON conformers (isomer_id);
+CREATE INDEX shieldings_by_atom ON shieldings (atom_number, atom_symbol);
+"""
+
+
+@dataclass
+class Isomer:
+    compound: str
+    isomer: str
+    path: str
+    files: List[str]
+
+
+# Every compound/isomer folder of the tree with log files in it (also compressed ones)
+def find_isomers(root):
+    isomers = []
+    for path in sorted(glob.glob(os.path.join(root, "*", "*", ""))):
+        path = os.path.normpath(path)
+        files = sorted(set(expand_glob(os.path.join(path, "*.log")) + expand_glob(os.path.join(path, "*.LOG"))))
+        if files:
+            compound, isomer = path.split(os.sep)[-2:]
+            isomers.append(Isomer(compound, isomer, path, files))
+    return isomers
+
+
+# Parsed data of every log of every isomer, in one batch; with a population threshold per isomer in two phases
+def parse_isomers(isomers, cache, jobs=1, io_concurrency=0, population_threshold=None):
+    files = [file for isomer in isomers for file in isomer.files]
+    if population_threshold is None:
+        results, failures = run_cached_batch(NMR_shielding_tensors, files, "NMR_shielding_tensors", cache,
+                                             jobs, io_concurrency)
+        return dict(results), failures
+
+    energies, failures = run_cached_batch(final_energies, files, "final_energies", cache, jobs)
+    energies = dict(energies)
+    populated = []
+    for isomer in isomers:
+        selected, left_out, populations = populated_files([(file, energies[file]) for file in isomer.files
+                                                           if file in energies], population_threshold)
+        populated += selected
+        for file in set(populations) - set(selected):
+            energies[file] = dict(energies[file], screened_percent=populations[file])
+        print(f"{isomer.compound}/{isomer.isomer}: tensors of {len(selected)} of {len(isomer.files)} conformers "
+              f"({left_out:.4f}% of the population left out)")
+    parsed, tensor_failures = run_cached_batch(shielding_tensors, populated, "shielding_tensors", cache,
+                                               jobs, io_concurrency)
+    parsed = dict(parsed)
+    failed = {file for file, _ in tensor_failures}
+    return ({file: dict(data, **parsed.get(file, {})) for file, data in energies.items() if file not in failed},
+            failures + tensor_failures)
+
+
+def write_database(db_name, analyses):
+    if os.path.exists(db_name):
+        os.remove(db_name)  # The database holds the results of this run only, like the CSV files
+    db = sqlite3.connect(db_name)
+    db.executescript(SCHEMA)
+    for isomer_id, (isomer, conformer_data, analysis) in enumerate(analyses, 1):
+        db.execute("INSERT INTO isomers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                   (isomer_id, isomer.compound, isomer.isomer, os.path.abspath(isomer.path), analysis["energy_mode"],
+                    len(conformer_data), len(analysis["valid_conformers"])))
+        db.executemany("INSERT INTO conformers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       [(isomer_id, c["filename"], c["scf_kj"], c["gibbs_kj"], c["energy_kj"], c["rel_energy"],
+                         c["boltzmann_factor"], c["boltzmann_percent"]) for c in conformer_data])
+        if analysis["valid_conformers"]:
+            first = analysis["valid_conformers"][0]
+            db.executemany("INSERT INTO shieldings VALUES (?, ?, ?, ?)",
+                           [(isomer_id, n, s, x) for n, s, x in zip(first["atom_nos"], first["symbols"],
+                                                                    analysis["boltz_avg_tensors"])])
+    db.commit()
+    db.close()
+
+
+def write_long_csv(out_name, analyses):
+    with open(out_name, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Compound", "Isomer", "Atom_Number", "Atom_Symbol", "Boltzmann_Averaged_Shielding_Tensor"])
+        for isomer, _, analysis in analyses:
+            if analysis["valid_conformers"]:
+                first = analysis["valid_conformers"][0]
+                writer.writerows([isomer.compound, isomer.isomer, n, s, round(x, 6)]
+                                 for n, s, x in zip(first["atom_nos"], first["symbols"], analysis["boltz_avg_tensors"]))
+
+
+def main():
+    print("#=================== NMR Boltzmann Pipeline for Compounds and their Isomers ===================#")
+    print("#        Parses every compound/isomer/*.log in parallel and Boltzmann-averages each isomer       #")
+    print("#===============================================================================================#\n")
+
+    parser = argparse.ArgumentParser(description="Boltzmann-averaged NMR shielding tensors of every compound/isomer folder of a tree.")
+    parser.add_argument("root", nargs="?", default=".", help="top folder with the compound/isomer/*.log tree (default: .)")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes (0 = one per CPU core)")
+    parser.add_argument("--io-concurrency", type=int, default=0,
+                        help="keep N file reads in flight at once (for logs on a network filesystem such as Lustre/NFS)")
+    parser.add_argument("--no-cache", action="store_true", help="parse every log again instead of using the parse cache")
+    parser.add_argument("--population-threshold", type=float, metavar="PERCENT",
+                        help="parse the tensors only of conformers with at least this Boltzmann population in %% (per isomer)")
+    parser.add_argument("--database", help="SQLite file with all results (default: NMR_Pipeline_Results.sqlite in root)")
+    parser.add_argument("--csv", help="long-format CSV of all averaged tensors (default: NMR_Pipeline_Shieldings.csv in root)")
+    args = parser.parse_args()
+    # The outputs go next to the parse cache, in the top folder of the tree
+    args.database = args.database or os.path.join(args.root, "NMR_Pipeline_Results.sqlite")
+    args.csv = args.csv or os.path.join(args.root, "NMR_Pipeline_Shieldings.csv")
+
+    isomers = find_isomers(args.root)
+    if not isomers:
+        print(f"❌ No compound/isomer/*.log folders found in {args.root}.")
+        raise SystemExit(1)
+    print(f"{len(isomers)} isomers of {len({i.compound for i in isomers})} compounds, "
+          f"{sum(len(i.files) for i in isomers)} log files.")
+
+    with ParseCache(os.path.join(args.root, CACHE_FILE), enabled=not args.no_cache) as cache:
+        parsed, failures = parse_isomers(isomers, cache, args.jobs, args.io_concurrency, args.population_threshold)
+    for file, error in failures:
+        print(f"⚠️  {file}: Could not be read ({error}). It will be skipped.")
+
+    analyses = []
+    for isomer in isomers:
+        print(f"\n---------- {isomer.compound}/{isomer.isomer} ----------")
+        conformer_data = [parsed[file] for file in isomer.files if file in parsed]
+        if not conformer_data:
+            print("⚠️  No readable log files, isomer skipped.")
+            continue
+        analysis = boltzmann_analysis(conformer_data)
+        write_csv(os.path.join(isomer.path, 'NMR_Boltzmann_Averaged.csv'), conformer_data, analysis)
+        analyses.append((isomer, conformer_data, analysis))
+
+    write_database(args.database, analyses)
+    write_long_csv(args.csv, analyses)
+    print(f"\n✅ All Done Boss!!! {len(analyses)} isomers done. I Wrote: {args.database}, {args.csv} "
+          f"and NMR_Boltzmann_Averaged.csv in every isomer folder.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import os
+import sys
+import csv
+import argparse
+
+import numpy as np
+
+# The shared modules live in the Shared_Modules folder of this repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Shared_Modules'))
+from compressed_io import expand_glob
+from nmr_scaling import read_experimental, compare, CHESHIRE_SCALING, DP4_PARAMETERS, MIN_CORRECTION_SHIFTS
+
+AVERAGED_CSV = 'NMR_Boltzmann_Averaged.csv'  # Written by boltzmann_NMR_of_conformers.py
+
+
+# Atom numbers, symbols and Boltzmann-averaged shieldings from the CSV of boltzmann_NMR_of_conformers.py
+def read_averaged_csv(path):
+    rows = {}
+    with open(path, newline='') as csvfile:
+        for row in csv.reader(csvfile):
+            if row and row[0] in ("Atom_Numbers", "Atom_Symbols", "Boltzmann_Averaged_Shielding_Tensors"):
+                rows[row[0]] = [value for value in row[7:] if value != ""]
+    if "Boltzmann_Averaged_Shielding_Tensors" not in rows:
+        raise ValueError(f"{path} has no Boltzmann averaged shielding tensors")
+    return ([int(n) for n in rows["Atom_Numbers"]], rows["Atom_Symbols"],
+            [float(x) for x in rows["Boltzmann_Averaged_Shielding_Tensors"]])
+
+
+# Candidate name: the folder of an NMR_Boltzmann_Averaged.csv (one folder per isomer), otherwise the file name
+def candidate_name(path):
+    if os.path.basename(path) == AVERAGED_CSV:
+        return os.path.basename(os.path.dirname(os.path.abspath(path)))
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+# CSV files from file names, folders (their NMR_Boltzmann_Averaged.csv) and glob patterns
+def candidate_files(inputs):
+    files = []
+    for pattern in inputs:
+        for path in expand_glob(pattern) or [pattern]:
+            files.append(os.path.join(path, AVERAGED_CSV) if os.path.isdir(path) else path)
+    return files
+
+
+# "C=-1.0533,186.5242" -> ("C", (-1.0533, 186.5242))
+def parse_scaling(text):
+    nucleus, _, values = text.partition("=")
+    slope, intercept = (float(value) for value in values.split(","))
+    return nucleus.strip(), (slope, intercept)
+
+
+def write_summary(out_name, names, result):
+    nuclei = list(result.nuclei)
+    with open(out_name, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        header = ["Candidate"]
+        for nucleus in nuclei:
+            header += [f"MAE_{nucleus}_ppm", f"CMAE_{nucleus}_ppm", f"DP4_{nucleus}_%"]
+        writer.writerow(header + ["DP4_%"])
+        for index, name in enumerate(names):
+            row = [name]
+            for nucleus in nuclei:
+                comparison = result.nuclei[nucleus]
+                row += [round(comparison.mae[index], 4), round(comparison.cmae[index], 4),
+                        round(comparison.dp4[index], 4)]
+            writer.writerow(row + [round(result.dp4[index], 4)])
+
+
+# Long format: one row per candidate and experimental shift
+def write_shifts(out_name, names, experimental, result):
+    with open(out_name, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Candidate", "Label", "Nucleus", "Atoms", "Experimental_ppm", "Shielding",
+                         "Scaled_ppm", "Corrected_ppm", "Scaled_Error_ppm"])
+        for nucleus, comparison in result.nuclei.items():
+            for index, name in enumerate(names):
+                for column, row in enumerate(comparison.rows):
+                    exp_shift = experimental.shifts[row]
+                    writer.writerow([name, experimental.labels[row], nucleus, " ".join(map(str, experimental.atoms[row])),
+                                     exp_shift, round(comparison.shieldings[index, column], 6),
+                                     round(comparison.scaled[index, column], 4),
+                                     round(comparison.corrected[index, column], 4),
+                                     round(comparison.scaled[index, column] - exp_shift, 4)])
+
+
+def main():
+    print("#=================== NMR Scaling and DP4 Comparison of Candidate Structures ===================#")
+    print("#   CHESHIRE scaled shifts, MAE, CMAE and DP4 probabilities of every candidate in one pass     #")
+    print("#===============================================================================================#\n")
+
+    parser = argparse.ArgumentParser(description="Compare Boltzmann-averaged shieldings of candidate structures with experimental shifts.")
+    parser.add_argument("experimental", help="CSV with the columns Label (optional), Shift (ppm) and Atoms "
+                                             "(atom numbers of the shift, e.g. '12 13 14' for a methyl group)")
+    parser.add_argument("candidates", nargs="+",
+                        help=f"{AVERAGED_CSV} files of the candidates, or their folders (glob patterns work too)")
+    parser.add_argument("--scaling", action="append", type=parse_scaling, default=[], metavar="NUCLEUS=SLOPE,INTERCEPT",
+                        help="CHESHIRE slope and intercept of a nucleus for your level of theory "
+                             f"(default: {', '.join(f'{n}={s},{i}' for n, (s, i) in CHESHIRE_SCALING.items())})")
+    parser.add_argument("--output", default="NMR_DP4_Comparison.csv", help="CSV with MAE, CMAE and DP4 per candidate")
+    parser.add_argument("--shifts", default="NMR_Scaled_Shifts.csv", help="CSV with the scaled shift of every candidate and atom")
+    args = parser.parse_args()
+
+    experimental = read_experimental(args.experimental)
+    files = candidate_files(args.candidates)
+    names, shieldings, atom_numbers, symbols = [], [], None, None
+    for path in files:
+        numbers, atom_symbols, tensors = read_averaged_csv(path)
+        if atom_numbers is None:
+            atom_numbers, symbols = numbers, atom_symbols
+        elif numbers != atom_numbers or atom_symbols != symbols:
+            print(f"❌ {path}: the atoms differ from {files[0]}; all candidates need the same atom numbering.")
+            raise SystemExit(1)
+        names.append(candidate_name(path))
+        shieldings.append(tensors)
+
+    scaling = dict(CHESHIRE_SCALING, **dict(args.scaling))
+    result = compare(np.array(shieldings), atom_numbers, symbols, experimental, scaling, DP4_PARAMETERS)
+
+    write_summary(args.output, names, result)
+    write_shifts(args.shifts, names, experimental, result)
+
+    nuclei = list(result.nuclei)
+    for nucleus in nuclei:
+        if np.isnan(result.nuclei[nucleus].cmae).all():
+            print(f"⚠️  {nucleus}: fewer than {MIN_CORRECTION_SHIFTS} experimental shifts (or all the same), "
+                  f"so no CMAE and no DP4 for this nucleus (only the MAE of the scaled shifts).")
+    print(f"{'Candidate':<24}" + "".join(f"{'MAE_' + n:>10}{'CMAE_' + n:>10}{'DP4_' + n + '%':>10}" for n in nuclei) + f"{'DP4%':>10}")
+    for index in np.argsort(-np.nan_to_num(result.dp4, nan=-1.0), kind='stable'):
+        print(f"{names[index]:<24}" + "".join(f"{result.nuclei[n].mae[index]:>10.3f}{result.nuclei[n].cmae[index]:>10.3f}"
+                                             f"{result.nuclei[n].dp4[index]:>10.2f}" for n in nuclei)
+              + f"{result.dp4[index]:>10.2f}")
+    print(f"\n✅ All Done Boss!!! I Wrote: {args.output} and {args.shifts} for your consideration.")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,13 @@
 import numpy
 import matplotlib.pyplot as plt
 import sys
+import os
+
+# The shared scanning modules live in the Shared_Modules folder of this repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Shared_Modules'))
+from mmap_scan import marker_lines
+from compressed_io import open_text, strip_compression_extension
+from program_detect import detect_program
 
 print("#---------------------------------------------------------------------------------------------------#")
 print("#---------------------------------------------------------------------------------------------------#")
@@ -46,21 +53,15 @@ class ExtractSCF(object):
     # Define a function to read the input file and extract the SCF Steps info etc. #
     #------------------------------------------------------------------------------#
     #----------------------------- Start of Function -----------------------------#
-    def extractSCF(self, file):
+    # With use_mmap=True the file is memory-mapped and only the lines around the markers are decoded
+    def extractSCF(self, file, use_mmap=False):
         #print("\nExtracting the Molecule from the given output file")
-        f = open(file, 'r')
-        program = "N/A"
-        # Determine if we're dealing with Gaussian09 or ORCA
-        for line in f:
-            if line.find("Entering Gaussian System, Link 0=g09") != -1 or line.find("Copyright (c) 1988,1990,1992,1993,1995,1998,2003,2009, Gaussian, Inc.") != -1:
-                print("Reading Gaussian output file: ", file, '\n')
-                program = "g09"
-                break
-            elif line.find("* O   R   C   A *") != -1:
-                print("Reading ORCA output file: ", file, '\n')
-                program = "orca"
-                break
-        f.close()
+        # Determine if we're dealing with Gaussian (g09/g16) or ORCA from the header of the file
+        program = detect_program(file).program
+        if program == "gaussian":
+            print("Reading Gaussian output file: ", file, '\n')
+        elif program == "orca":
+            print("Reading ORCA output file: ", file, '\n')
 
         #---------------------------------------------------------------#
         # Finding Energy Change and Single Point Energy in Output File  #
@@ -73,8 +74,12 @@ class ExtractSCF(object):
         # Read through the ORCA output file
         #---------------------------------------------------------------#
         if program == "orca":
-            f = open(file, 'r')
-            lines = f.readlines()
+            if use_mmap:
+                # Only the convergence tables (5 lines after the marker) and the final energies
+                lines = marker_lines(file, [b'Geometry convergence', b'FINAL SINGLE POINT ENERGY'], context_after=5)
+            else:
+                f = open_text(file)
+                lines = f.readlines()
             #---------------------------------------------------------------#
             # Finding Energy Change and Single Point Energy in Output File  #
             #---------------------------------------------------------------#
@@ -124,9 +129,13 @@ class ExtractSCF(object):
         #---------------------------------------------------------------#
         # Read through the Gaussian output file
         #---------------------------------------------------------------#
-        elif program == "g09":
-            f = open(file, 'r')
-            lines = f.readlines()
+        elif program == "gaussian":
+            if use_mmap:
+                # Only the SCF lines, the energy changes and the force table (2 lines after its header)
+                lines = marker_lines(file, [b'SCF Done', b'Predicted change in Energy', b'Threshold'], context_after=2)
+            else:
+                f = open_text(file)
+                lines = f.readlines()
             #---------------------------------------------------------------#
             # Finding Energy Change and Single Point Energy in Output File  #
             #---------------------------------------------------------------#
@@ -174,13 +183,14 @@ class ExtractSCF(object):
 #input_file = 'Test_Files/C80-C240_fullerene.out' # Specify the input file here
 #input_file = 'Test_Files/ev-2R3S-conf01.log' # Gaussian ouput file
 input_file = sys.argv[1] # Take the input file in first argument
+use_mmap = '--mmap' in sys.argv[2:] # Add --mmap after the file name to scan very large files through a memory map
 
 # Take the Filename out to use as Title of the Graph
-filename = input_file.split('\\').pop().split('/').pop().rsplit('.', 1)[0]
+filename = strip_compression_extension(input_file).split('\\').pop().split('/').pop().rsplit('.', 1)[0]
 
 # Run the class ExtractSCF in a variable molecule
 molecule = ExtractSCF(input_file)
-Single_Point_Energies, Energies, RMS_gradient, Max_gradient = molecule.extractSCF(input_file)
+Single_Point_Energies, Energies, RMS_gradient, Max_gradient = molecule.extractSCF(input_file, use_mmap)
 
 # Below is the variable to check the length of the lists and make a list for step numbers from 1 to len(list)
 Step_No_Energy_change = numpy.linspace(1, len(Energies), len(Energies))
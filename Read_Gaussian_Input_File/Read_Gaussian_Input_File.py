@@ -1,4 +1,9 @@
 import sys
+import os
+
+# The shared input file writers live in the Shared_Modules folder of this repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Shared_Modules'))
+from input_templates import GaussianJob, GaussianStep, OrcaJob, write_input, xyz_text
 
 print("#--------------------------------------------------------------------------------------------------#")
 print("#--------------------------------------------------------------------------------------------------#")
@@ -45,58 +50,31 @@ class WriteOutputFile(object):
     # To write the new coordinates into a Gaussian file  #
     #----------------------------------------------------#
     def GaussianFile(self, geometry):
-        output_file = sys.stdout
-        sys.stdout = open(self.filename+'R'+'.gjf', 'w')
-        #print('%nprocshared=24') #shared processor line
-        #print('%mem=3000mb')#memory line
-        #print('%chk=checkpoint_file.chk') #Checkpoint File)
-        print('#p opt pbe1pbe def2svp empiricaldispersion=gd3bj scf=xqc integral=(grid=ultrafine)\n') #Route card
-        print('Title Card Required\n') #Title Card
-        print('0 1') #Charge and Multiplicity
-        #Below are the xyz coordinates
-        for i in geometry:
-            print(" {:<3}  {: .8f}  {: .8f}  {: .8f}".format(i[0], i[1], i[2], i[3]))
-        print('\n')
-        sys.stdout.close()
-        sys.stdout = output_file
+        job = GaussianJob((GaussianStep('#p opt pbe1pbe def2svp empiricaldispersion=gd3bj scf=xqc integral=(grid=ultrafine)', #Route card
+                                        'Title Card Required', #Title Card
+                                        chk=False, #Set to True for a %chk line named after the file
+                                        #link0=('%nprocshared=24', '%mem=3000mb'), #shared processor and memory lines
+                                        ),))
+        write_input(self.filename+'R'+'.gjf', job.render(self.filename+'R', geometry, 0, 1)) #Charge and Multiplicity
     #=====================================================#
     #------------------------------------------------------#
     # To write the new coordinates into an ORCA input file #
     #------------------------------------------------------#
     def OrcaFile(self, geometry):
-        output_file2 = sys.stdout
-        sys.stdout = open(self.filename+'R'+'.inp', 'w')
-        print('%MaxCore 3000') # Amount of memory per core
-        print('% pal nprocs 16') #Number of Processors
-        print('    end') #End of Block
-        print('#Single Point Energy of test molecule') #Title Card
-        print('! PBE0 D3 RIJCOSX def2-SVP def2-SVP/J Grid5 GridX7 VERYTIGHTSCF\n') #Route Card
-        #print('! moread')
-        #print('%moinp "old_test.gbw"\n')
-        print('*xyz 0 1') #Charge and Multiplicity
-        #Below are the xyz coordinates
-        for i in geometry:
-            print("{:<3}  {: .8f}  {: .8f}  {: .8f}".format(i[0], i[1], i[2], i[3]))
-        print('*')
-        sys.stdout.close()
-        sys.stdout = output_file2
+        job = OrcaJob('PBE0 D3 RIJCOSX def2-SVP def2-SVP/J Grid5 GridX7 VERYTIGHTSCF', #Route Card
+                      'Single Point Energy of test molecule', #Title Card
+                      maxcore=3000, nprocs=16, #Memory per core and number of processors
+                      #blocks=('! moread', '%moinp "old_test.gbw"\n'),
+                      )
+        write_input(self.filename+'R'+'.inp', job.render(geometry, 0, 1)) #Charge and Multiplicity
     #=====================================================#
 
     #-------------------------------------------------#
     # To write the new coordinates into an xyz file   #
     #-------------------------------------------------#
     def xyzFile(self, geometry):
-        # Find the total number of atoms in the molecule
-        n_atoms = len(geometry)
-        output_file3 = sys.stdout
-        sys.stdout = open(self.filename+'.xyz', 'w')
-        print(n_atoms)
-        print('XYZ Coordinates of the given molecule')
-        #Below are the xyz coordinates
-        for i in geometry:
-            print("{:<3}  {: .8f}  {: .8f}  {: .8f}".format(i[0], i[1], i[2], i[3]))
-        sys.stdout.close()
-        sys.stdout = output_file3
+        # Atom count, comment line, then the xyz coordinates
+        write_input(self.filename+'.xyz', xyz_text(geometry, 'XYZ Coordinates of the given molecule'))
     #=====================================================#
 #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% End of Class %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%#
 #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!#
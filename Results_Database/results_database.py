@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+results_database.py
+
+Keep the results of a calculation campaign in one SQLite database
+(results.sqlite) instead of regenerating CSV files for every question.
+
+    python3 results_database.py ingest Comp-01/*.log Comp-02/*.log --jobs 0
+    python3 results_database.py ingest campaign_folder          (all *.log / *.out files below it)
+    python3 results_database.py lowest --energy gibbs
+    python3 results_database.py conformers Comp-01 --energy scf
+
+Only new or changed output files are parsed on every ingest; the compound
+of a file is the name of its folder unless --compound is given.
+
+Author: Muhammad Ali Hashmi
+"""
+
+import os
+import sys
+import argparse
+
+# The shared modules live in the Shared_Modules folder of this repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Shared_Modules'))
+from results_db import ResultsDB, DB_FILE
+from compressed_io import expand_glob
+
+OUTPUT_PATTERNS = ("*.log", "*.LOG", "*.out")
+ENERGIES = {"scf": "scf_energy", "zpe": "zero_point_energy", "enthalpy": "enthalpy", "gibbs": "gibbs_energy"}
+
+# ---------------- HELPER FUNCTIONS ----------------
+
+def collect_files(paths):
+    """Output files named on the command line: files, glob patterns, or folders searched recursively."""
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, _ in os.walk(path):
+                for pattern in OUTPUT_PATTERNS:
+                    files.update(expand_glob(os.path.join(folder, pattern)))
+        else:
+            files.update(expand_glob(path))
+    return sorted(files)
+
+# ---------------- COMMANDS ----------------
+
+def ingest(db, args):
+    files = collect_files(args.paths)
+    stored, skipped, removed, failures = db.ingest(files, args.compound, args.jobs)
+    print(f"{stored} output files stored, {skipped} unchanged files skipped, {removed} jobs of deleted files removed")
+    for file, error in failures:
+        print(f"Not stored {file}: {error}")
+
+def lowest(db, args):
+    rows = db.lowest_energies(ENERGIES[args.energy])
+    print("{:<25} {:<25} {:<20}".format("Compound", "Lowest conformer", f"{args.energy} energy (a.u)"))
+    for compound, conformer, energy in rows:
+        print("{:<25} {:<25} {:<20.8f}".format(compound, conformer, energy))
+
+def conformers(db, args):
+    rows = db.conformer_energies(args.compound, ENERGIES[args.energy])
+    if not rows:
+        print(f"No {args.energy} energies stored for {args.compound}")
+        return
+    print("{:<25} {:<20} {:<20}".format("Conformer", f"{args.energy} energy (a.u)", "Relative (kcal/mol)"))
+    for conformer, energy, relative in rows:
+        print("{:<25} {:<20.8f} {:<20.2f}".format(conformer, energy, relative))
+
+def main():
+    parser = argparse.ArgumentParser(description="Campaign results database of Gaussian/ORCA output files.")
+    parser.add_argument("--db", default=DB_FILE, help=f"database file (default: {DB_FILE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("ingest", help="store new or changed output files")
+    p.add_argument("paths", nargs="+", help="output files, glob patterns such as '*.log', or folders")
+    p.add_argument("--compound", help="compound name for all files (default: the name of each file's folder)")
+    p.add_argument("--jobs", type=int, default=1, help="number of worker processes (0 = one per CPU core)")
+    p.set_defaults(func=ingest)
+
+    p = commands.add_parser("lowest", help="lowest-energy conformer of every compound")
+    p.add_argument("--energy", choices=ENERGIES, default="gibbs")
+    p.set_defaults(func=lowest)
+
+    p = commands.add_parser("conformers", help="conformers of one compound, lowest energy first")
+    p.add_argument("compound")
+    p.add_argument("--energy", choices=ENERGIES, default="gibbs")
+    p.set_defaults(func=conformers)
+
+    args = parser.parse_args()
+    with ResultsDB(args.db) as db:
+        args.func(db, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+batch_driver.py
+
+A process-pool batch driver for directory-wide extraction.
+Per-file parsing functions are sent to a ProcessPoolExecutor in chunks and
+the results come back in the same order as the input files, so the CSV
+writers stay deterministic.  A file that fails is collected in a list of
+failures and reported by the caller; it never aborts the run.
+
+The parsing function must be defined at module level (it is pickled to the
+workers) and the calling script must keep its main program under
+`if __name__ == "__main__":`.
+
+Author: Muhammad Ali Hashmi
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+# (file, parsed value) in input order, and (file, error message) for the failed ones
+Results = List[Tuple[str, Any]]
+Failures = List[Tuple[str, str]]
+
+def resolve_jobs(jobs: int) -> int:
+    """Number of worker processes: 0 (or less) means one per CPU core."""
+    return jobs if jobs > 0 else (os.cpu_count() or 1)
+
+def _call(task: Tuple[Callable[[str], Any], str]) -> Tuple[str, bool, Any]:
+    """Run func(path) in a worker, turning an exception into an error message."""
+    func, path = task
+    try:
+        return path, True, func(path)
+    except Exception as error:
+        return path, False, f"{type(error).__name__}: {error}"
+
+def run_batch(func: Callable[[str], Any], files: Sequence[str], jobs: int = 1,
+              chunksize: Optional[int] = None) -> Tuple[Results, Failures]:
+    """
+    Apply func to every file with `jobs` worker processes (in this process when jobs is 1).
+    Returns the successful results in input order and the failures.
+    """
+    jobs = resolve_jobs(jobs)
+    tasks = [(func, path) for path in files]
+    if jobs == 1 or len(tasks) < 2:
+        return _split(map(_call, tasks))
+    if chunksize is None:
+        # A few chunks per worker keeps the load balanced without much pickling overhead
+        chunksize = max(1, len(tasks) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+        return _split(pool.map(_call, tasks, chunksize=chunksize))
+
+def run_cached_batch(func: Callable[..., Any], files: Sequence[str], namespace: str,
+                     cache, jobs: int = 1, io_concurrency: int = 0) -> Tuple[Results, Failures]:
+    """
+    Same as run_batch, but files found unchanged in a parse_cache.ParseCache are loaded
+    from it and only the others are parsed (and then stored in the cache).
+    With io_concurrency > 0 the files are read concurrently by async_reader and
+    func(path, data) parses each buffer in the `jobs` worker processes.
+    """
+    cached = {}
+    to_parse = []
+    for path in files:
+        value = cache.get(path, namespace)
+        if value is None:
+            to_parse.append(path)
+        else:
+            cached[path] = value
+    cache.hits += len(cached)
+    cache.misses += len(to_parse)
+    # The file state before parsing: a log that grows during the parse is parsed again next time
+    states = {path: cache.snapshot(path) for path in to_parse}
+    if io_concurrency > 0:
+        from async_reader import read_and_parse
+        parsed, failures = read_and_parse(func, to_parse, io_concurrency, jobs=jobs)
+    else:
+        parsed, failures = run_batch(func, to_parse, jobs)
+    for path, value in parsed:
+        if states[path] is not None:
+            cache.put(path, namespace, value, states[path])
+        cached[path] = value
+    return [(path, cached[path]) for path in files if path in cached], failures
+
+def _split(outcomes) -> Tuple[Results, Failures]:
+    results: Results = []
+    failures: Failures = []
+    for path, ok, value in outcomes:
+        if ok:
+            results.append((path, value))
+        else:
+            failures.append((path, value))
+    return results, failures
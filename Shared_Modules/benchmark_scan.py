@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+benchmark_scan.py
+
+Compare the classic readlines() scan used by the scripts with the
+memory-mapped byte scan of mmap_scan.py on a Gaussian or ORCA output file.
+To imitate a multi-GB output file, the input can be repeated N times into a
+temporary file with --inflate N.
+
+Usage: python3 benchmark_scan.py c60_fullerene.out [--inflate 200] [--repeat 3]
+
+Author: Muhammad Ali Hashmi
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mmap_scan import marker_lines
+
+MARKERS = ["SCF Done:", "FINAL SINGLE POINT ENERGY", "Geometry convergence"]
+
+def scan_readlines(filepath):
+    """The current path of the scripts: decode every line and test it for each marker."""
+    with open(filepath, 'r', errors='ignore') as f:
+        lines = f.readlines()
+    return [line for line in lines if any(m in line for m in MARKERS)]
+
+def scan_mmap(filepath):
+    """The memory-mapped path: bytes.find over the buffer, decode only the matches."""
+    return marker_lines(filepath, [m.encode() for m in MARKERS])
+
+def best_time(func, filepath, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(filepath)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark readlines() against the mmap scanner.")
+    parser.add_argument("filepath")
+    parser.add_argument("--inflate", type=int, default=1, help="repeat the file N times into a temporary file")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repeats, the best one is reported")
+    args = parser.parse_args()
+
+    filepath = args.filepath
+    tmp = None
+    if args.inflate > 1:
+        tmp = tempfile.NamedTemporaryFile(suffix=os.path.splitext(filepath)[1], delete=False)
+        with open(filepath, 'rb') as src:
+            for _ in range(args.inflate):
+                src.seek(0)
+                shutil.copyfileobj(src, tmp)
+        tmp.close()
+        filepath = tmp.name
+
+    try:
+        size_mb = os.path.getsize(filepath) / 1024**2
+        t_lines, r_lines = best_time(scan_readlines, filepath, args.repeat)
+        t_mmap, r_mmap = best_time(scan_mmap, filepath, args.repeat)
+        print(f"File size      : {size_mb:.1f} MB")
+        print(f"Marker lines   : {len(r_lines)} (readlines)  {len(r_mmap)} (mmap)  identical: {r_lines == r_mmap}")
+        print(f"readlines()    : {t_lines:.3f} s")
+        print(f"mmap + find    : {t_mmap:.3f} s")
+        print(f"Speed-up       : {t_lines / t_mmap:.1f}x")
+    finally:
+        if tmp is not None:
+            os.remove(tmp.name)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+boltzmann.py
+
+Boltzmann weights and Boltzmann-averaged properties of a conformer ensemble
+with NumPy, without a Python loop over conformers or atoms.
+
+The energies are taken relative to the lowest one before the exponential,
+
+    w_i = exp(-(E_i - E_min) / RT) / sum_j exp(-(E_j - E_min) / RT)
+
+so the largest factor is 1 and the partition function is never smaller than
+1, whatever the energy span of the ensemble (conformers far above the lowest
+one get weight 0 instead of turning the sum into 0/0).  Conformers without an
+energy (NaN) get weight 0.
+
+Any per-conformer property is averaged the same way: a vector (optical
+rotation, one value per conformer), a conformers x atoms matrix (shielding
+tensors) or a conformers x atoms x atoms array (coupling constants) is
+contracted with the weights over its first axis in one matrix product:
+
+    weights = boltzmann_weights(energies_kj, rt(298.15))
+    averaged_shieldings = boltzmann_average(stack_property(tensors_per_conformer), weights)
+
+Several temperatures are handled in the same pass: with an array of RT
+values the weights are a (temperatures x conformers) matrix, computed by
+broadcasting, and the averages get one row per temperature:
+
+    weights = boltzmann_weights(energies_kj, rt(np.array([195.0, 250.0, 298.15, 330.0])))
+    averaged_shieldings = boltzmann_average(tensor_matrix, weights)   # (4, n_atoms)
+
+monte_carlo() propagates an error of the energies (e.g. ~1 kcal/mol for
+DFT) into the averages: the energies are perturbed many times, in chunks of
+samples that are each one (samples x conformers) weight matrix and one
+matrix product, giving the spread and confidence interval of every averaged
+value and of every population:
+
+    result = monte_carlo(energies_kj, tensor_matrix, rt(), sigma=4.184, samples=100000, seed=1)
+    result.lower, result.upper, result.population_std
+
+Author: Muhammad Ali Hashmi
+"""
+
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Optional, Sequence
+
+import numpy as np
+
+GAS_CONSTANT_KJ = 0.0083144626     # kJ/(mol K)
+GAS_CONSTANT_KCAL = 0.0019872043   # kcal/(mol K)
+TEMPERATURE = 298.15               # K
+
+ERROR_MODELS = ("normal", "uniform")   # Energy error: normal with standard deviation sigma, or uniform in +-sigma
+MC_CHUNK = 4096                        # Monte Carlo samples per weight matrix
+MC_MAX_STORED = 2 ** 26                # Sampled values kept (float32) for percentile intervals, else normal intervals
+
+def rt(temperature=TEMPERATURE, gas_constant: float = GAS_CONSTANT_KJ):
+    """RT in the energy unit of the gas constant (kJ/mol by default); an array of temperatures gives an array."""
+    return gas_constant * np.asarray(temperature, dtype=float) if np.ndim(temperature) else gas_constant * temperature
+
+def relative_energies(energies) -> np.ndarray:
+    """Energies above the lowest one (of each row); NaN stays NaN (all NaN if no conformer has an energy)."""
+    energies = np.asarray(energies, dtype=float)
+    if np.isnan(energies).all():
+        return np.full(energies.shape, np.nan)
+    return energies - np.nanmin(energies, axis=-1, keepdims=True)
+
+def _exponents(energies, rt_value) -> np.ndarray:
+    """-(E - E_min) / RT, one row per RT value if rt_value is an array; -inf without an energy."""
+    rt_value = np.asarray(rt_value, dtype=float)
+    exponents = -relative_energies(energies) / (rt_value[:, np.newaxis] if rt_value.ndim else rt_value)
+    exponents[np.isnan(exponents)] = -np.inf
+    return exponents
+
+def boltzmann_factors(energies, rt_value) -> np.ndarray:
+    """exp(-(E - E_min) / RT) of every conformer (1 for the lowest), 0 without an energy."""
+    return np.exp(_exponents(energies, rt_value))
+
+def boltzmann_weights(energies, rt_value) -> np.ndarray:
+    """Normalized Boltzmann weights (each row summing to 1), 0 for conformers without an energy."""
+    # The largest factor of every row is 1, so the sum cannot underflow
+    factors = boltzmann_factors(energies, rt_value)
+    if not factors.any():
+        return factors
+    return factors / factors.sum(axis=-1, keepdims=True)
+
+def stack_property(values: Sequence) -> np.ndarray:
+    """One array of a property of all conformers, conformers along the first axis."""
+    return np.asarray(values, dtype=float)
+
+def boltzmann_average(values, weights) -> np.ndarray:
+    """
+    Weighted average over the conformers (first axis) of a property array, as one matrix product.
+    With a (temperatures x conformers) weight matrix the result has one row per temperature.
+    """
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    return np.tensordot(weights, values, axes=(-1, 0))
+
+# ---------------- MONTE CARLO ----------------
+
+@dataclass
+class MonteCarloResult:
+    """Spread of the Boltzmann averages and populations over the perturbed energies."""
+    mean: np.ndarray              # Mean of each averaged value over the samples
+    std: np.ndarray               # Standard deviation of each averaged value
+    lower: np.ndarray             # Confidence interval of each averaged value
+    upper: np.ndarray
+    population_mean: np.ndarray   # Mean weight (fraction) of each conformer
+    population_var: np.ndarray    # Variance of the weight of each conformer
+    samples: int
+    percentile_interval: bool     # False: the interval is mean +- z std (too many values to keep every sample)
+
+    @property
+    def population_std(self) -> np.ndarray:
+        return np.sqrt(self.population_var)
+
+def perturbations(rng: np.random.Generator, model: str, sigma: float, shape) -> np.ndarray:
+    if model == "normal":
+        return rng.normal(0.0, sigma, shape)
+    if model == "uniform":
+        return rng.uniform(-sigma, sigma, shape)
+    raise ValueError(f"Unknown error model '{model}', use one of {ERROR_MODELS}")
+
+def monte_carlo(energies, values, rt_value: float, sigma: float, samples: int, model: str = "normal",
+                confidence: float = 95.0, seed: Optional[int] = None, chunk: int = MC_CHUNK) -> MonteCarloResult:
+    """
+    Boltzmann averages of values (conformers along the first axis) for samples perturbed copies of the
+    energies (error model with sigma in the unit of the energies), chunk samples per weight matrix.
+    """
+    energies = np.asarray(energies, dtype=float)
+    values = np.asarray(values, dtype=float)
+    flat = values.reshape(len(values), -1)
+    rng = np.random.default_rng(seed)
+
+    # Sums of the deviations from the unperturbed average, so the variance does not lose precision
+    reference = boltzmann_average(flat, boltzmann_weights(energies, rt_value))
+    sums, squares = np.zeros(flat.shape[1]), np.zeros(flat.shape[1])
+    weight_sums, weight_squares = np.zeros(len(energies)), np.zeros(len(energies))
+    stored = np.empty((samples, flat.shape[1]), dtype=np.float32) if samples * flat.shape[1] <= MC_MAX_STORED else None
+
+    for start in range(0, samples, chunk):
+        size = min(chunk, samples - start)
+        weights = boltzmann_weights(energies + perturbations(rng, model, sigma, (size, len(energies))), rt_value)
+        deviations = weights @ flat - reference
+        sums += deviations.sum(axis=0)
+        squares += np.square(deviations).sum(axis=0)
+        weight_sums += weights.sum(axis=0)
+        weight_squares += np.square(weights).sum(axis=0)
+        if stored is not None:
+            stored[start:start + size] = deviations
+
+    shift = sums / samples
+    mean = reference + shift
+    std = np.sqrt(np.maximum(squares / samples - shift ** 2, 0.0))
+    tail = (100.0 - confidence) / 2
+    if stored is not None:
+        lower, upper = reference + np.percentile(stored, [tail, 100.0 - tail], axis=0)
+    else:
+        z = NormalDist().inv_cdf(1.0 - tail / 100.0)
+        lower, upper = mean - z * std, mean + z * std
+    population_mean = weight_sums / samples
+    population_var = np.maximum(weight_squares / samples - population_mean ** 2, 0.0)
+
+    shape = values.shape[1:]
+    return MonteCarloResult(mean.reshape(shape), std.reshape(shape), lower.reshape(shape), upper.reshape(shape),
+                            population_mean, population_var, samples, stored is not None)
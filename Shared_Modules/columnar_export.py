@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+columnar_export.py
+
+Binary, column-oriented copies of the tables the scripts write as CSV
+(energy tables, NMR shielding tensor matrices, geometry arrays), so that
+thousands of conformers x hundreds of atoms load back without parsing text.
+
+    parquet  compact, read by pandas/polars/R (needs the 'pyarrow' package)
+    arrow    Arrow IPC (Feather v2) file, loaded zero-copy from a memory map
+             (needs 'pyarrow')
+    npz      NumPy archive, always available (fallback when pyarrow is missing)
+
+All columns of a table have the same number of rows.  A column with more
+than one dimension (the tensors of each conformer, the coordinates of each
+frame) is stored as a fixed-size list per row and gets its shape back on
+loading.  Metadata that is not per row (atom numbers, symbols, ...) is kept
+as JSON inside the file.
+
+Author: Muhammad Ali Hashmi
+"""
+
+import json
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+FORMATS = ("parquet", "arrow", "npz")
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow", "npz": ".npz"}
+METADATA_KEY = "columnar_export"
+
+Columns = Dict[str, np.ndarray]
+
+def have_arrow() -> bool:
+    return pa is not None
+
+def resolve_format(fmt: Optional[str] = None) -> str:
+    """'auto' (or None) means Parquet when pyarrow is installed, otherwise .npz."""
+    if fmt in (None, "auto"):
+        return "parquet" if have_arrow() else "npz"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown columnar format '{fmt}', use one of {', '.join(FORMATS)}")
+    if fmt != "npz" and not have_arrow():
+        print(f"pyarrow is not installed, writing .npz instead of {fmt} "
+              "(install it with: python3 -m pip install --user pyarrow)")
+        return "npz"
+    return fmt
+
+# ---------------- WRITING ----------------
+
+def export_columns(out_base: str, columns: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None,
+                   fmt: Optional[str] = None) -> str:
+    """Write equal-length columns (and JSON metadata) to out_base + extension; returns the file name."""
+    fmt = resolve_format(fmt)
+    columns = {name: np.asarray(values) for name, values in columns.items()}
+    n_rows = {len(values) for values in columns.values()}
+    if len(n_rows) > 1:
+        raise ValueError(f"Columns have different lengths: {sorted(n_rows)}")
+    out_file = out_base + EXTENSIONS[fmt]
+    info = {"metadata": metadata or {},
+            "shapes": {name: values.shape[1:] for name, values in columns.items() if values.ndim > 1}}
+
+    if fmt == "npz":
+        np.savez(out_file, **{METADATA_KEY: np.array(json.dumps(info))}, **columns)
+        return out_file
+
+    arrays = {}
+    for name, values in columns.items():
+        if values.ndim > 1:
+            flat = values.reshape(len(values), -1)
+            arrays[name] = pa.FixedSizeListArray.from_arrays(pa.array(flat.ravel()), flat.shape[1])
+        else:
+            arrays[name] = pa.array(values)
+    table = pa.table(arrays).replace_schema_metadata({METADATA_KEY: json.dumps(info)})
+    if fmt == "parquet":
+        pq.write_table(table, out_file)
+    else:
+        with pa.OSFile(out_file, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return out_file
+
+# ---------------- READING ----------------
+
+def load_columns(path: str) -> Tuple[Columns, Dict[str, Any]]:
+    """
+    Columns (as NumPy arrays) and metadata of a file written by export_columns.
+    Arrow files are memory-mapped and their numeric columns are not copied.
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            info = json.loads(str(data[METADATA_KEY]))
+            columns = {name: data[name] for name in data.files if name != METADATA_KEY}
+        return columns, info["metadata"]
+
+    if pa is None:
+        raise ImportError("Reading Parquet/Arrow files requires the 'pyarrow' package.\n"
+                          "Install it (user-local is fine) with:\n"
+                          "  python3 -m pip install --user pyarrow")
+    if path.endswith(".arrow"):
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    else:
+        table = pq.read_table(path, memory_map=True)
+    info = json.loads(table.schema.metadata[METADATA_KEY.encode()])
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name).combine_chunks()
+        if name in info["shapes"]:
+            values = column.flatten().to_numpy(zero_copy_only=False)
+            columns[name] = values.reshape((len(column),) + tuple(info["shapes"][name]))
+        else:
+            columns[name] = column.to_numpy(zero_copy_only=False)
+    return columns, info["metadata"]
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+compressed_io.py
+
+Transparent reading of compressed output files (.gz, .xz, .bz2, .zst).
+The compression is recognised from the magic number at the start of the
+file, not from its name, and the data is decompressed as a stream, so no
+temporary files are written.  Uncompressed files are opened as usual.
+Reading .zst files needs the 'zstandard' package.
+
+Author: Muhammad Ali Hashmi
+"""
+
+import io
+import os
+import bz2
+import glob
+import gzip
+import lzma
+from typing import IO, List, Optional
+
+# Magic numbers at the start of each compressed format
+MAGIC_NUMBERS = [
+    (b"\x1f\x8b", "gzip"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"BZh", "bz2"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+]
+COMPRESSED_EXTENSIONS = (".gz", ".xz", ".bz2", ".zst")
+
+def compression_of(filepath: str) -> Optional[str]:
+    """Name of the compression format of a file ('gzip', 'xz', 'bz2', 'zstd') or None."""
+    with open(filepath, 'rb') as f:
+        head = f.read(6)
+    return _compression_of_bytes(head)
+
+def _compression_of_bytes(head: bytes) -> Optional[str]:
+    for magic, name in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return name
+    return None
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Reading .zst files requires the 'zstandard' package.\n"
+                          "Install it (user-local is fine) with:\n"
+                          "  python3 -m pip install --user zstandard")
+    return zstandard
+
+def open_binary(filepath: str) -> IO[bytes]:
+    """Open a file for reading bytes, decompressing it on the fly if needed."""
+    compression = compression_of(filepath)
+    if compression == "gzip":
+        return gzip.open(filepath, 'rb')
+    if compression == "xz":
+        return lzma.open(filepath, 'rb')
+    if compression == "bz2":
+        return bz2.open(filepath, 'rb')
+    if compression == "zstd":
+        return _zstandard().ZstdDecompressor().stream_reader(open(filepath, 'rb'), closefd=True)
+    return open(filepath, 'rb')
+
+def open_text(filepath: str, errors: str = 'ignore') -> IO[str]:
+    """Open a file for reading text, decompressing it on the fly if needed."""
+    if compression_of(filepath) is None:
+        return open(filepath, 'r', errors=errors)
+    return io.TextIOWrapper(open_binary(filepath), errors=errors)
+
+def decompress_bytes(data: bytes) -> bytes:
+    """Decompress the bytes of a whole file that were read as they are on disk."""
+    compression = _compression_of_bytes(data[:6])
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "xz":
+        return lzma.decompress(data)
+    if compression == "bz2":
+        return bz2.decompress(data)
+    if compression == "zstd":
+        with _zstandard().ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+            return reader.read()
+    return data
+
+def strip_compression_extension(filepath: str) -> str:
+    """conformer01.log.gz -> conformer01.log"""
+    root, ext = os.path.splitext(filepath)
+    return root if ext.lower() in COMPRESSED_EXTENSIONS else filepath
+
+def base_name(filepath: str) -> str:
+    """File name without folder, compression extension or extension: dir/conf01.log.xz -> conf01"""
+    return os.path.splitext(os.path.basename(strip_compression_extension(filepath)))[0]
+
+def expand_glob(pattern: str) -> List[str]:
+    """Sorted files matching a pattern such as '*.log', including their compressed versions (*.log.gz, ...)."""
+    files = set(glob.glob(pattern))
+    for ext in COMPRESSED_EXTENSIONS:
+        files.update(glob.glob(pattern + ext))
+    return sorted(files)
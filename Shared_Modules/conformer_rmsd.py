@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+conformer_rmsd.py
+
+Duplicate detection for conformer ensembles with batched NumPy Kabsch RMSD.
+Conformers are compared only with the conformers inside an energy window
+around them.  For every candidate pair the 3x3 covariance matrix of the two
+centred structures is built, all of them are stacked into one
+(n_pairs, 3, 3) array and decomposed with a single batched SVD; the RMSD
+after optimal rotation follows from the singular values (with the usual
+sign correction against reflections), so no rotation matrix is ever applied.
+
+Comparing all pairs in the window grows as N^2, so by default the pairs
+are first screened with two rotation-invariant fingerprints, each scaled so
+that the distance between the fingerprints of two conformers is never
+larger than their RMSD after any rotation:
+  - the three singular values of the centred coordinates (the square roots
+    of the principal moments of the unweighted gyration tensor; the bound is
+    Mirsky's inequality),
+  - the distance of every atom from the centroid (a rotation does not
+    change it).
+A KD-tree (or, without SciPy, a sort-and-sweep) over the leading principal
+components of the radial fingerprint plus the scaled energy finds the
+neighbours; only pairs that pass both bounds get the full RMSD, so the
+result is the same as comparing all pairs.
+
+Duplicates are assigned greedily in order of energy: walking up from the
+lowest energy, a conformer within the RMSD threshold of an already kept
+conformer is mapped to the lowest-energy such representative, otherwise it
+is kept.  Atoms are compared in file order (same molecule, same numbering).
+
+The claim that the fingerprint search gives the same result as comparing all
+pairs is checked on synthetic ensembles (with the KD-tree when SciPy is
+installed, and always with the sort-and-sweep):
+
+    python3 conformer_rmsd.py --check
+
+Author: Muhammad Ali Hashmi
+"""
+
+import argparse
+from dataclasses import dataclass
+from typing import Iterator, Tuple
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+from log_parser import HARTREE_TO_KCAL
+
+RMSD_THRESHOLD = 0.125     # Angstrom (the CREST default)
+ENERGY_WINDOW = 1.0        # kcal/mol
+PAIR_CHUNK = 20000         # Pairs per batched SVD (bounds the memory used)
+FINGERPRINT_SLACK = 1e-8   # Angstrom, keeps pairs right at the bound against rounding
+INDEX_DIMS = 4             # Principal axes of the radial fingerprints used for the neighbour search
+
+@dataclass
+class DedupResult:
+    """Outcome of deduplicate(), indexed like the input conformers."""
+    representative: np.ndarray   # Index of the conformer each one is a duplicate of (itself if kept)
+    rmsd: np.ndarray             # RMSD to that representative (0 for the kept ones)
+    n_pairs: int                 # Number of pairs whose RMSD was computed
+
+    @property
+    def unique(self) -> np.ndarray:
+        """Indices of the kept conformers, in input order."""
+        return np.flatnonzero(self.representative == np.arange(len(self.representative)))
+
+# ---------------- RMSD ----------------
+
+def center(coords: np.ndarray) -> np.ndarray:
+    """Move every structure of a (n_conformers, n_atoms, 3) array to its centroid."""
+    return coords - coords.mean(axis=1, keepdims=True)
+
+def kabsch_rmsd(P: np.ndarray, Q: np.ndarray) -> np.ndarray:
+    """
+    RMSD after optimal superposition of centred structure pairs P[k], Q[k], both (n_pairs, n_atoms, 3).
+    """
+    n_atoms = P.shape[1]
+    H = np.einsum('pai,paj->pij', P, Q)                       # (n_pairs, 3, 3) covariance matrices
+    U, S, Vt = np.linalg.svd(H)                                # One batched SVD
+    d = np.sign(np.linalg.det(U) * np.linalg.det(Vt))          # -1 where the best fit would be a reflection
+    S[:, 2] *= d
+    msd = (np.einsum('pai,pai->p', P, P) + np.einsum('pai,pai->p', Q, Q) - 2.0 * S.sum(axis=1)) / n_atoms
+    return np.sqrt(np.clip(msd, 0.0, None))
+
+def pair_rmsd(centered: np.ndarray, i: np.ndarray, j: np.ndarray, chunk: int = PAIR_CHUNK) -> np.ndarray:
+    """Kabsch RMSD of the pairs (i[k], j[k]) of centred conformers, computed in chunks."""
+    rmsd = np.empty(len(i))
+    for start in range(0, len(i), chunk):
+        stop = start + chunk
+        rmsd[start:stop] = kabsch_rmsd(centered[i[start:stop]], centered[j[start:stop]])
+    return rmsd
+
+# ---------------- CANDIDATE PAIRS ----------------
+
+def energy_window_pairs(energies: np.ndarray, window_kcal: float,
+                        chunk: int = PAIR_CHUNK) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Chunks of pairs (i, j) of positions in energy order (i < j) with E[j] - E[i] <= window.
+    energies must be sorted (Hartree).
+    """
+    n = len(energies)
+    upper = np.searchsorted(energies, energies + window_kcal / HARTREE_TO_KCAL, side='right')
+    counts = np.maximum(upper - np.arange(n) - 1, 0)
+    i_parts, j_parts, size = [], [], 0
+    for i in np.flatnonzero(counts):
+        i_parts.append(np.full(counts[i], i))
+        j_parts.append(np.arange(i + 1, upper[i]))
+        size += counts[i]
+        if size >= chunk:
+            yield np.concatenate(i_parts), np.concatenate(j_parts)
+            i_parts, j_parts, size = [], [], 0
+    if i_parts:
+        yield np.concatenate(i_parts), np.concatenate(j_parts)
+
+def fingerprints(centered: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rotation-invariant fingerprints of centred conformers, both scaled by 1/sqrt(n_atoms) so that
+    their Euclidean distance is a lower bound on the RMSD:
+      shape   (n_conformers, 3) singular values of the coordinates (Mirsky's inequality)
+      radial  (n_conformers, n_atoms) distance of every atom from the centroid (rotations keep it)
+    """
+    scale = 1.0 / np.sqrt(centered.shape[1])
+    shape = np.linalg.svd(centered, compute_uv=False) * scale
+    radial = np.sqrt(np.einsum('nai,nai->na', centered, centered)) * scale
+    return shape, radial
+
+def project(radial: np.ndarray, dims: int = INDEX_DIMS) -> np.ndarray:
+    """
+    Radial fingerprints projected on their first principal axes; a projection on orthonormal axes
+    never increases distances, so it is still a lower bound on the RMSD.
+    """
+    deviations = radial - radial.mean(axis=0)
+    _, _, axes = np.linalg.svd(deviations, full_matrices=False)
+    return deviations @ axes[:dims].T
+
+def _sweep_pairs(points: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pairs (a, b), a < b, whose points differ by at most radius along every axis, found by sorting
+    along the axis that leaves the fewest pairs and sweeping (used when SciPy is not installed).
+    """
+    n = len(points)
+    best = None
+    for axis in range(points.shape[1]):
+        values = points[:, axis]
+        order = np.argsort(values, kind='stable')
+        upper = np.searchsorted(values[order], values[order] + radius, side='right')
+        counts = upper - np.arange(n) - 1
+        if best is None or counts.sum() < best[2].sum():
+            best = (order, upper, counts)
+    order, upper, counts = best
+    a_parts, b_parts = [], []
+    for k in np.flatnonzero(counts):
+        others = order[k + 1:upper[k]]
+        near = np.all(np.abs(points[others] - points[order[k]]) <= radius, axis=1)
+        a_parts.append(np.full(near.sum(), order[k]))
+        b_parts.append(others[near])
+    if not a_parts:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    a, b = np.concatenate(a_parts), np.concatenate(b_parts)
+    return np.minimum(a, b), np.maximum(a, b)
+
+def fingerprint_pairs(centered: np.ndarray, energies: np.ndarray, window_kcal: float, rmsd_threshold: float,
+                      chunk: int = PAIR_CHUNK) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Chunks of the pairs (i, j) of positions in energy order (i < j) that energy_window_pairs would give
+    and whose fingerprints are close enough for their RMSD to be below rmsd_threshold.
+    energies must be sorted (Hartree, inf where unknown).
+    """
+    radius = rmsd_threshold + FINGERPRINT_SLACK
+    shape, radial = fingerprints(centered)
+    points = project(radial)
+    with_energy = 0 < window_kcal < np.inf
+    if with_energy:
+        # Energy as one more coordinate, scaled so that the window has the same size as the RMSD threshold
+        finite = np.isfinite(energies)
+        scaled = np.zeros(len(energies))
+        if finite.any():
+            scaled[finite] = (energies[finite] - energies[finite][0]) * HARTREE_TO_KCAL * radius / window_kcal
+            scaled[~finite] = scaled[finite].max() + 2 * radius  # Unknown energies only meet each other
+        points = np.column_stack([points, scaled])
+
+    if cKDTree is not None:
+        # Euclidean radius covering fingerprint distance < radius and energy difference <= radius
+        search_radius = radius * np.sqrt(2.0) if with_energy else radius
+        pairs = cKDTree(points).query_pairs(search_radius, output_type='ndarray')
+        i_all, j_all = pairs[:, 0], pairs[:, 1]
+    else:
+        i_all, j_all = _sweep_pairs(points, radius)
+
+    # Exact conditions, cheapest first: the energy window (as in energy_window_pairs), then both fingerprint bounds
+    for start in range(0, len(i_all), chunk):
+        i, j = i_all[start:start + chunk], j_all[start:start + chunk]
+        upper = energies[i] + window_kcal / HARTREE_TO_KCAL
+        keep = (energies[j] <= upper) | (np.isinf(energies[i]) & np.isinf(energies[j]))
+        i, j = i[keep], j[keep]
+        keep = ((shape[i] - shape[j]) ** 2).sum(axis=1) < radius ** 2
+        i, j = i[keep], j[keep]
+        keep = ((radial[i] - radial[j]) ** 2).sum(axis=1) < radius ** 2
+        if keep.any():
+            yield i[keep], j[keep]
+
+# ---------------- DEDUPLICATION ----------------
+
+def assign_duplicates(n: int, close_i: np.ndarray, close_j: np.ndarray, close_rmsd: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Greedy assignment over positions in energy order, given the close pairs (i < j).
+    Returns the representative position and RMSD of every position.
+    """
+    representative = np.arange(n)
+    rmsd = np.zeros(n)
+    order = np.lexsort((close_i, close_j))   # By j, then by the lowest-energy partner i
+    close_i, close_j, close_rmsd = close_i[order], close_j[order], close_rmsd[order]
+    kept = np.ones(n, dtype=bool)
+    for i, j, r in zip(close_i.tolist(), close_j.tolist(), close_rmsd.tolist()):
+        if kept[j] and kept[i]:
+            # The first kept partner of j is its lowest-energy representative
+            representative[j] = i
+            rmsd[j] = r
+            kept[j] = False
+    return representative, rmsd
+
+def deduplicate(coords: np.ndarray, energies: np.ndarray, rmsd_threshold: float = RMSD_THRESHOLD,
+                energy_window: float = ENERGY_WINDOW, chunk: int = PAIR_CHUNK,
+                exhaustive: bool = False) -> DedupResult:
+    """
+    Find duplicate conformers among coords (n_conformers, n_atoms, 3) with energies in Hartree.
+    Only pairs within energy_window (kcal/mol) are compared. Without energies (all NaN)
+    every pair is compared. Unless exhaustive is set, pairs whose shape fingerprints
+    already rule out a duplicate are skipped (the result does not change).
+    """
+    energies = np.asarray(energies, dtype=float)
+    n = len(energies)
+    if n < 2:
+        return DedupResult(np.arange(n), np.zeros(n), 0)  # Nothing to compare
+    if np.isnan(energies).all():
+        energies = np.zeros(len(energies))
+        energy_window = np.inf
+    order = np.argsort(np.where(np.isnan(energies), np.inf, energies), kind='stable')
+    sorted_energies = energies[order]
+    # Conformers without an energy are compared with each other only
+    sorted_energies = np.where(np.isnan(sorted_energies), np.inf, sorted_energies)
+    centered = center(np.asarray(coords, dtype=float)[order])
+
+    close_i, close_j, close_rmsd = [], [], []
+    n_pairs = 0
+    if exhaustive:
+        candidates = energy_window_pairs(sorted_energies, energy_window, chunk)
+    else:
+        candidates = fingerprint_pairs(centered, sorted_energies, energy_window, rmsd_threshold, chunk)
+    for i, j in candidates:
+        rmsd = pair_rmsd(centered, i, j, chunk)
+        close = rmsd < rmsd_threshold
+        close_i.append(i[close])
+        close_j.append(j[close])
+        close_rmsd.append(rmsd[close])
+        n_pairs += len(i)
+    if close_i:
+        position_rep, position_rmsd = assign_duplicates(n, np.concatenate(close_i), np.concatenate(close_j),
+                                                        np.concatenate(close_rmsd))
+    else:
+        position_rep, position_rmsd = np.arange(n), np.zeros(n)
+
+    # Back from energy-order positions to input indices
+    representative = np.empty(n, dtype=int)
+    rmsd = np.empty(n)
+    representative[order] = order[position_rep]
+    rmsd[order] = position_rmsd
+    return DedupResult(representative, rmsd, n_pairs)
+
+# ---------------- REGRESSION CHECK ----------------
+
+def synthetic_ensemble(n_conformers: int, n_atoms: int, n_families: int, rng: np.random.Generator,
+                       noise: float = 0.05) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Randomly rotated and perturbed copies of a few random structures, so that near-duplicates (RMSD
+    around the threshold) and distinct conformers are mixed; energies in Hartree within a few kcal/mol.
+    """
+    families = rng.normal(scale=2.0, size=(n_families, n_atoms, 3))
+    family = rng.integers(n_families, size=n_conformers)
+    q, r = np.linalg.qr(rng.normal(size=(n_conformers, 3, 3)))
+    rotations = q * np.sign(np.diagonal(r, axis1=1, axis2=2))[:, np.newaxis, :]
+    coords = np.einsum('nai,nji->naj', families[family] + rng.normal(scale=noise, size=(n_conformers, n_atoms, 3)),
+                       rotations) + rng.normal(scale=5.0, size=(n_conformers, 1, 3))
+    energies = (family * 0.5 + rng.uniform(0.0, 1.5, n_conformers)) / HARTREE_TO_KCAL - 500.0
+    return coords, energies
+
+def check_fingerprint_search(n_conformers: int = 1500, seed: int = 1) -> bool:
+    """
+    Compare deduplicate() with and without the fingerprint search (exhaustive=True) on synthetic ensembles:
+    with energies, without any energy and with some energies missing, for every neighbour search available.
+    """
+    global cKDTree
+    tree = cKDTree
+    searches = ([("KD-tree", tree)] if tree is not None else []) + [("sort-and-sweep", None)]
+    rng = np.random.default_rng(seed)
+    coords, energies = synthetic_ensemble(n_conformers, 12, 40, rng)
+    partial = energies.copy()
+    partial[rng.random(n_conformers) < 0.1] = np.nan
+    cases = [("energies", energies), ("no energies", np.full(n_conformers, np.nan)), ("some energies missing", partial)]
+    ok = True
+    try:
+        for search, cKDTree in searches:
+            for case, case_energies in cases:
+                expected = deduplicate(coords, case_energies, exhaustive=True)
+                result = deduplicate(coords, case_energies)
+                same = (np.array_equal(result.representative, expected.representative)
+                        and np.allclose(result.rmsd, expected.rmsd))
+                ok &= same
+                print(f"{search:>15}, {case:<22}: {len(expected.unique)} unique, {result.n_pairs} of "
+                      f"{expected.n_pairs} pairs compared, {'same as' if same else 'DIFFERENT FROM'} all pairs")
+        for n in (0, 1):
+            result = deduplicate(coords[:n], energies[:n])
+            same = np.array_equal(result.representative, np.arange(n))
+            ok &= same
+            print(f"{n} conformer(s): {'ok' if same else 'WRONG'}")
+    finally:
+        cKDTree = tree
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the fingerprint search finds the same duplicates as comparing all pairs.")
+    parser.add_argument("--check", action="store_true", help="run the check on synthetic ensembles")
+    parser.add_argument("--conformers", type=int, default=1500, help="conformers per synthetic ensemble")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if not args.check:
+        parser.print_help()
+        return
+    if not check_fingerprint_search(args.conformers, args.seed):
+        raise SystemExit("The fingerprint search differs from comparing all pairs.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+conformer_screen.py
+
+Pre-screen of a conformer ensemble before any DFT job is made from it.
+With the energy of every conformer (the CREST energy in the comment line of
+the xyz frames, in Hartree) only the conformers that pass all the given
+cutoffs are kept:
+
+    energy window     at most this many kcal/mol above the lowest conformer
+    max conformers    at most this many conformers, lowest energy first
+    min population    a Boltzmann population (in %) of at least this much at
+                      the chosen temperature, over the whole ensemble
+
+Conformers without an energy cannot be judged and are left out whenever a
+cutoff is set.  The scripts take the cutoffs as --energy-window,
+--max-conformers, --min-population and --temperature:
+
+    python3 crest_conf_separation.py crest_conformers.xyz --energy-window 3 --max-conformers 200
+
+Author: Muhammad Ali Hashmi
+"""
+
+import argparse
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from boltzmann import boltzmann_weights, rt, GAS_CONSTANT_KCAL, TEMPERATURE
+from log_parser import HARTREE_TO_KCAL
+
+@dataclass
+class ScreenCriteria:
+    """Cutoffs of the pre-screen; None switches a cutoff off."""
+    energy_window: Optional[float] = None    # kcal/mol above the minimum
+    max_conformers: Optional[int] = None
+    min_population: Optional[float] = None   # Boltzmann population in %
+    temperature: float = TEMPERATURE
+
+    def __post_init__(self):
+        # A negative max_conformers would slice off the highest conformers instead, a temperature <= 0 gives NaN/inf
+        if self.max_conformers is not None and self.max_conformers < 1:
+            raise ValueError(f"max_conformers must be at least 1, not {self.max_conformers}")
+        if not self.temperature > 0:
+            raise ValueError(f"temperature must be above 0 K, not {self.temperature}")
+        for name in ("energy_window", "min_population"):
+            if getattr(self, name) is not None and not getattr(self, name) >= 0:
+                raise ValueError(f"{name} must not be negative, not {getattr(self, name)}")
+
+    def active(self) -> bool:
+        return any(value is not None for value in (self.energy_window, self.max_conformers, self.min_population))
+
+@dataclass
+class ScreenResult:
+    """Outcome of screen(), arrays indexed like the input conformers."""
+    selected: np.ndarray      # Indices of the kept conformers, in input order
+    relative: np.ndarray      # Energy above the lowest conformer (kcal/mol), NaN without energy
+    populations: np.ndarray   # Boltzmann population (%) over the whole ensemble, 0 without energy
+
+def boltzmann_populations(energies: np.ndarray, temperature: float = TEMPERATURE) -> np.ndarray:
+    """Boltzmann populations (%) of energies in Hartree; conformers without an energy (NaN) get 0."""
+    energies = np.asarray(energies, dtype=float) * HARTREE_TO_KCAL
+    return 100.0 * boltzmann_weights(energies, rt(temperature, GAS_CONSTANT_KCAL))
+
+def screen(energies, criteria: ScreenCriteria) -> ScreenResult:
+    """Indices of the conformers (energies in Hartree) that pass every cutoff of criteria."""
+    energies = np.asarray(energies, dtype=float)
+    known = ~np.isnan(energies)
+    relative = np.full(len(energies), np.nan)
+    if known.any():
+        relative[known] = (energies[known] - energies[known].min()) * HARTREE_TO_KCAL
+    populations = boltzmann_populations(energies, criteria.temperature)
+    if not criteria.active():
+        return ScreenResult(np.arange(len(energies)), relative, populations)
+
+    keep = known.copy()
+    if criteria.energy_window is not None:
+        keep &= np.where(known, relative, np.inf) <= criteria.energy_window
+    if criteria.min_population is not None:
+        keep &= populations >= criteria.min_population
+    selected = np.flatnonzero(keep)
+    if criteria.max_conformers is not None and len(selected) > criteria.max_conformers:
+        lowest = np.argsort(energies[selected], kind='stable')[:criteria.max_conformers]
+        selected = np.sort(selected[lowest])
+    return ScreenResult(selected, relative, populations)
+
+# ---------------- COMMAND LINE OPTIONS ----------------
+
+def _at_least_one(text: str) -> int:
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}")
+    return value
+
+def _positive(text: str) -> float:
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"must be above 0, not {value}")
+    return value
+
+def _not_negative(text: str) -> float:
+    value = float(text)
+    if not value >= 0:
+        raise argparse.ArgumentTypeError(f"must not be negative, not {value}")
+    return value
+
+def add_screen_arguments(parser: argparse.ArgumentParser) -> None:
+    """The pre-screen options shared by the scripts that make jobs from an ensemble."""
+    group = parser.add_argument_group("pre-screen (keep only the conformers passing all given cutoffs)")
+    group.add_argument("--energy-window", type=_not_negative,
+                       help="keep conformers at most this many kcal/mol above the lowest")
+    group.add_argument("--max-conformers", type=_at_least_one, help="keep at most this many conformers, lowest energy first")
+    group.add_argument("--min-population", type=_not_negative,
+                       help="keep conformers with at least this Boltzmann population in %% (e.g. 1)")
+    group.add_argument("--temperature", type=_positive, default=TEMPERATURE,
+                       help=f"temperature for the Boltzmann populations in K (default: {TEMPERATURE})")
+
+def criteria_from_args(args: argparse.Namespace) -> ScreenCriteria:
+    return ScreenCriteria(args.energy_window, args.max_conformers, args.min_population, args.temperature)
+
+def report(result: ScreenResult, total: int) -> None:
+    kept = len(result.selected)
+    removed = total - kept
+    print(f"Pre-screen: {kept} of {total} conformers kept, {removed} removed"
+          + (f" ({100.0 * removed / total:.0f}%)" if total else ""))
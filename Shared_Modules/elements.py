@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+elements.py
+
+Atomic symbols and numbers shared by the scripts that read and write
+coordinates (H = 1 ... Og = 118).
+
+Author: Muhammad Ali Hashmi
+"""
+
+from typing import Dict, Tuple
+
+# Index = atomic number, so ATOMIC_SYMBOLS[6] == "C" (index 0 is a dummy atom)
+ATOMIC_SYMBOLS: Tuple[str, ...] = (
+    "X",
+    "H", "He",
+    "Li", "Be", "B", "C", "N", "O", "F", "Ne",
+    "Na", "Mg", "Al", "Si", "P", "S", "Cl", "Ar",
+    "K", "Ca", "Sc", "Ti", "V", "Cr", "Mn", "Fe", "Co", "Ni", "Cu", "Zn",
+    "Ga", "Ge", "As", "Se", "Br", "Kr",
+    "Rb", "Sr", "Y", "Zr", "Nb", "Mo", "Tc", "Ru", "Rh", "Pd", "Ag", "Cd",
+    "In", "Sn", "Sb", "Te", "I", "Xe",
+    "Cs", "Ba", "La", "Ce", "Pr", "Nd", "Pm", "Sm", "Eu", "Gd", "Tb", "Dy",
+    "Ho", "Er", "Tm", "Yb", "Lu", "Hf", "Ta", "W", "Re", "Os", "Ir", "Pt",
+    "Au", "Hg", "Tl", "Pb", "Bi", "Po", "At", "Rn",
+    "Fr", "Ra", "Ac", "Th", "Pa", "U", "Np", "Pu", "Am", "Cm", "Bk", "Cf",
+    "Es", "Fm", "Md", "No", "Lr", "Rf", "Db", "Sg", "Bh", "Hs", "Mt", "Ds",
+    "Rg", "Cn", "Nh", "Fl", "Mc", "Lv", "Ts", "Og",
+)
+
+SYMBOL_TO_NUMBER: Dict[str, int] = {symbol: number for number, symbol in enumerate(ATOMIC_SYMBOLS)}
+
+def atomic_number(symbol: str) -> int:
+    """Atomic number of a symbol as written in output files ('C', 'CL', 'cl', 'Fe1' ...)."""
+    symbol = symbol.rstrip("0123456789")
+    return SYMBOL_TO_NUMBER[symbol[:1].upper() + symbol[1:].lower()]
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+input_templates.py
+
+Input files for Gaussian (.com/.gjf, with any number of --Link1-- steps),
+ORCA (.inp, with the %MaxCore and %pal header) and plain xyz files, written
+by one engine instead of a print() per line with sys.stdout redirected.
+
+A job is described once (route card, title, link 0 lines, extra sections
+such as the optical rotation frequency, a gen basis and a generic solvent
+for every step) and compiled, for each set of elements, into a single
+format string with only the file name, charge/multiplicity and coordinates
+left open.  The coordinates of a molecule are formatted with one format
+call from a per-molecule template, and every file is written in one go:
+
+    job = GaussianJob((GaussianStep('# opt b3lyp/gen pseudo=cards', 'Optimization', basis=GenBasis('6-31+G(d,p)')),
+                       GaussianStep('# nmr=giao b3lyp/gen pseudo=cards geom=check guess=read', 'NMR',
+                                    geometry=False, basis=GenBasis('6-311+G(2d,p)'))))
+    write_input('conformer01.com', job.render('conformer01', geometry, charge=0, multiplicity=1))
+
+geometry is the list of [symbol, x, y, z] rows that the scripts of this
+repository use.
+
+Author: Muhammad Ali Hashmi
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import FrozenSet, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ---------------- COORDINATES ----------------
+
+@lru_cache(maxsize=64)
+def coordinate_template(symbols: Tuple[str, ...], indent: str = "") -> str:
+    """Format string for all atoms of a molecule, symbols filled in, coordinates as {: .8f} fields."""
+    return "".join(f"{indent}{symbol:<3}  {{: .8f}}  {{: .8f}}  {{: .8f}}\n" for symbol in symbols)
+
+def format_coordinates(symbols: Sequence[str], coords, indent: str = "") -> str:
+    """All atom lines of a molecule from its symbols and (n_atoms, 3) coordinates, in one format call."""
+    return coordinate_template(tuple(symbols), indent).format(*np.asarray(coords, dtype=float).ravel().tolist())
+
+def format_geometry(geometry, indent: str = "") -> str:
+    """All atom lines of a [symbol, x, y, z] geometry list."""
+    return format_coordinates([atom[0] for atom in geometry], [atom[1:4] for atom in geometry], indent)
+
+def xyz_text(geometry, comment: str) -> str:
+    """An xyz file: atom count, comment line and the atoms."""
+    return f"{len(geometry)}\n{comment}\n" + format_geometry(geometry)
+
+def write_input(path: str, text: str) -> None:
+    """Write a whole input file with one call."""
+    with open(path, 'w') as f:
+        f.write(text)
+
+def _escape(text: str) -> str:
+    """Literal text inside a format template."""
+    return text.replace('{', '{{').replace('}', '}}')
+
+# ---------------- GAUSSIAN ----------------
+
+@dataclass(frozen=True)
+class GenBasis:
+    """Gen basis: one basis set for all elements except the ECP elements (basis and pseudopotential)."""
+    basis: str
+    ecp_basis: str = "LanL2DZ"
+    ecp_elements: Tuple[str, ...] = ("I",)
+
+    def block(self, elements: FrozenSet[str]) -> str:
+        ecp = [element for element in sorted(elements) if element in self.ecp_elements]
+        lines = [f"{' '.join(element for element in sorted(elements) if element not in ecp)} 0", self.basis, "****"]
+        if ecp:
+            lines += [f"{' '.join(ecp)} 0", self.ecp_basis, "****", "", f"{' '.join(ecp)} 0", self.ecp_basis]
+        return "\n".join(lines)
+
+@dataclass(frozen=True)
+class GaussianStep:
+    """One job step of a Gaussian input file (the part between --Link1-- lines)."""
+    route: str
+    title: str
+    chk: bool = True                   # Write a %chk={name}.chk line
+    link0: Tuple[str, ...] = ()        # Further link 0 lines, e.g. ('%nprocshared=24', '%mem=3000mb')
+    geometry: bool = True              # False for geom=check steps (charge and multiplicity only)
+    sections: Tuple[str, ...] = ()     # Input sections after the molecule, e.g. ('589nm',) for optical rotation
+    basis: Optional[GenBasis] = None   # Gen basis section (route card with /gen)
+    solvent: Optional[str] = None      # Generic solvent parameters (scrf=(solvent=generic,read))
+
+    def template(self, elements: FrozenSet[str]) -> str:
+        lines = [_escape(line) for line in self.link0]
+        if self.chk:
+            lines.append("%chk={name}.chk")
+        head = "".join(line + "\n" for line in lines)
+        head += f"{_escape(self.route)}\n\n{_escape(self.title)}\n\n{{charge_multiplicity}}\n"
+        if self.geometry:
+            head += "{coordinates}"
+        sections = list(self.sections)
+        if self.basis is not None:
+            sections.append(self.basis.block(elements))
+        if self.solvent is not None:
+            sections.append(self.solvent)
+        return head + "".join(f"\n{_escape(section)}\n" for section in sections) + "\n"
+
+@dataclass(frozen=True)
+class GaussianJob:
+    """A Gaussian input file: one or more steps joined by --Link1--."""
+    steps: Tuple[GaussianStep, ...]
+    blank_lines_at_end: int = 1
+
+    def render(self, name: str, geometry, charge: int = 0, multiplicity: int = 1) -> str:
+        template = compile_gaussian(self, frozenset(atom[0] for atom in geometry))
+        return template.format(name=name, charge_multiplicity=f"{charge} {multiplicity}",
+                               coordinates=format_geometry(geometry, indent=" "))
+
+@lru_cache(maxsize=None)
+def compile_gaussian(job: GaussianJob, elements: FrozenSet[str]) -> str:
+    """The whole input file as one format string, built once per job and set of elements."""
+    return "--Link1--\n".join(step.template(elements) for step in job.steps) + "\n" * job.blank_lines_at_end
+
+# ---------------- ORCA ----------------
+
+@dataclass(frozen=True)
+class OrcaJob:
+    """An ORCA input file: %MaxCore and %pal header, title comment, '!' keyword line and the xyz block."""
+    keywords: str
+    title: str
+    maxcore: int = 3000      # Memory per core (MB)
+    nprocs: int = 16
+    blocks: Tuple[str, ...] = ()   # Further % blocks or ! lines written before the coordinates
+
+    def render(self, geometry, charge: int = 0, multiplicity: int = 1) -> str:
+        return compile_orca(self).format(charge=charge, multiplicity=multiplicity,
+                                         coordinates=format_geometry(geometry))
+
+@lru_cache(maxsize=None)
+def compile_orca(job: OrcaJob) -> str:
+    head = f"%MaxCore {job.maxcore}\n% pal nprocs {job.nprocs}\n    end\n#{job.title}\n! {job.keywords}\n\n"
+    blocks = "".join(block + "\n" for block in job.blocks)
+    return _escape(head + blocks) + "*xyz {charge} {multiplicity}\n{coordinates}*\n"
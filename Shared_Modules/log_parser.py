@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+log_parser.py
+
+A single-pass streaming parser for Gaussian output (.log) files.
+The log is read once as a line iterator and every line carrying a known marker
+is handed to the handler registered for it, so memory use stays constant no
+matter how big the file is.  Compressed logs (.gz, .xz, .bz2, .zst) are
+decompressed on the fly.  All extractor scripts in this repository use it.
+
+Author: Muhammad Ali Hashmi
+"""
+
+import io
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from compressed_io import base_name, decompress_bytes, open_text
+
+# Bump this whenever a handler changes, so cached results of older versions are discarded
+PARSER_VERSION = 2
+
+# Conversion factors used by the scripts
+HARTREE_TO_KJ = 2625.5
+HARTREE_TO_KCAL = 627.5095
+
+# ---------------- RESULT TYPE ----------------
+
+@dataclass
+class LogResult:
+    """Everything the extractors need from one Gaussian log file (energies in Hartree)."""
+    filename: str
+    charge: Optional[int] = None
+    multiplicity: Optional[int] = None
+    scf_energy: Optional[float] = None          # Last 'SCF Done:' energy
+    scf_count: int = 0                          # Number of 'SCF Done:' lines seen
+    zero_point_energy: Optional[float] = None   # Sum of electronic and zero-point Energies
+    enthalpy: Optional[float] = None            # Sum of electronic and thermal Enthalpies
+    gibbs_energy: Optional[float] = None        # Sum of electronic and thermal Free Energies
+    elapsed_hours: Optional[float] = None       # Last 'Elapsed time:' line, in hours
+    optical_rotation: Optional[float] = None    # [Alpha] value from the 'Molar Mass =' line (deg)
+    atom_nos: List[int] = field(default_factory=list)     # NMR shielding: atom numbers
+    symbols: List[str] = field(default_factory=list)      # NMR shielding: atom symbols
+    tensors: List[float] = field(default_factory=list)    # NMR shielding: isotropic values
+    geometry: List[Tuple[int, float, float, float]] = field(default_factory=list)  # Last Standard orientation
+
+# A handler gets the matching line, the line iterator (to read a following block) and the result
+Handler = Callable[[str, Iterator[str], LogResult], None]
+
+# ---------------- HANDLERS ----------------
+
+def _scf_done(line: str, lines: Iterator[str], result: LogResult) -> None:
+    result.scf_energy = float(line.split()[4])
+    result.scf_count += 1
+
+def _zero_point(line: str, lines: Iterator[str], result: LogResult) -> None:
+    result.zero_point_energy = float(line.split()[6])
+
+def _enthalpy(line: str, lines: Iterator[str], result: LogResult) -> None:
+    result.enthalpy = float(line.split()[6])
+
+def _gibbs(line: str, lines: Iterator[str], result: LogResult) -> None:
+    result.gibbs_energy = float(line.split()[7])
+
+def _charge_multiplicity(line: str, lines: Iterator[str], result: LogResult) -> None:
+    parts = line.split()
+    try:
+        result.charge = int(parts[2])
+        result.multiplicity = int(parts[5])
+    except (IndexError, ValueError):
+        pass  # Not the 'Charge = 0 Multiplicity = 1' line of the input section
+
+def _elapsed_time(line: str, lines: Iterator[str], result: LogResult) -> None:
+    parts = line.split()
+    days = int(parts[2])
+    hours = int(parts[4])
+    minutes = int(parts[6])
+    seconds = float(parts[8])
+    # Convert total time to hours
+    result.elapsed_hours = days * 24 + hours + minutes / 60 + seconds / 3600
+
+def _optical_rotation(line: str, lines: Iterator[str], result: LogResult) -> None:
+    # The optical rotation value appears after the '[Alpha]' symbol
+    try:
+        result.optical_rotation = float(line.split("=")[-1].split("deg")[0].strip())
+    except ValueError:
+        pass
+
+def _shielding_block(line: str, lines: Iterator[str], result: LogResult) -> None:
+    # A new GIAO block (restart, or opt + NMR in one log): keep only the tensors of the last one
+    result.atom_nos.clear()
+    result.symbols.clear()
+    result.tensors.clear()
+
+def _shielding(line: str, lines: Iterator[str], result: LogResult) -> None:
+    parts = line.split()
+    result.atom_nos.append(int(parts[0]))
+    result.symbols.append(parts[1])
+    result.tensors.append(float(parts[4]))
+
+def _standard_orientation(line: str, lines: Iterator[str], result: LogResult) -> None:
+    # The atoms start after the 4 header lines and end at the next dashed line
+    for _ in range(4):
+        next(lines)
+    geometry = []
+    for row in lines:
+        if "-----------" in row:
+            break
+        parts = row.split()
+        geometry.append((int(parts[1]), float(parts[3]), float(parts[4]), float(parts[5])))
+    result.geometry = geometry  # Keep only the latest orientation
+
+# Events the parser knows about, each one is a list of (marker, handler) pairs
+EVENTS: Dict[str, List[Tuple[str, Handler]]] = {
+    "scf": [("SCF Done:", _scf_done)],
+    "thermochemistry": [
+        ("Sum of electronic and zero-point Energies", _zero_point),
+        ("Sum of electronic and thermal Enthalpies", _enthalpy),
+        ("Sum of electronic and thermal Free Energies", _gibbs),
+    ],
+    "charge": [("Charge =", _charge_multiplicity)],
+    "elapsed": [("Elapsed time:", _elapsed_time)],
+    "optical_rotation": [("Molar Mass =", _optical_rotation)],
+    "shielding": [("SCF GIAO Magnetic shielding tensor", _shielding_block), ("Isotropic =", _shielding)],
+    "orientation": [("Standard orientation:", _standard_orientation)],
+}
+
+# ---------------- PARSER ----------------
+
+class GaussianLogParser(object):
+    """Reads a Gaussian log once and dispatches marker lines to the registered handlers"""
+    def __init__(self, events: Optional[Sequence[str]] = None):
+        self.handlers: List[Tuple[str, Handler]] = []
+        for name in (EVENTS if events is None else events):
+            for marker, handler in EVENTS[name]:
+                self.register(marker, handler)
+
+    def register(self, marker: str, handler: Handler) -> None:
+        """Call handler(line, lines, result) for every line containing marker."""
+        self.handlers.append((marker, handler))
+
+    def parse_lines(self, lines: Iterable[str], filename: str) -> LogResult:
+        """Parse an iterable of lines (an open file, a StringIO, ...)."""
+        result = LogResult(filename=filename)
+        handlers = self.handlers
+        it = iter(lines)
+        for line in it:
+            for marker, handler in handlers:
+                if marker in line:
+                    try:
+                        handler(line, it, result)
+                    except StopIteration:
+                        return result  # The file ended in the middle of a block
+                    break
+        return result
+
+    def parse(self, input_file: str) -> LogResult:
+        """Parse a log file from disk, one line at a time."""
+        with open_text(input_file) as f:
+            return self.parse_lines(f, base_name(input_file))
+
+def parse_log(input_file: str, events: Optional[Sequence[str]] = None,
+              data: Optional[bytes] = None) -> LogResult:
+    """
+    Parse one Gaussian log for the given events (all events when None).
+    If data (the bytes of the file, already read) is given the file is not opened.
+    """
+    parser = GaussianLogParser(events)
+    if data is None:
+        return parser.parse(input_file)
+    text = decompress_bytes(data).decode(errors='ignore')
+    return parser.parse_lines(io.StringIO(text), base_name(input_file))
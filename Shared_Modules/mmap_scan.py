@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+mmap_scan.py
+
+A memory-mapped, byte-level scanner for large Gaussian/ORCA output files.
+The file is mapped into memory and the markers (e.g. b"SCF Done:") are found
+with bytes.find over the mapped buffer, so only the matching lines (and a few
+lines after them) are ever decoded to str.  A compressed file cannot be
+mapped, so it is streamed instead and its lines are tested as bytes.
+
+Author: Muhammad Ali Hashmi
+"""
+
+import mmap
+from typing import List, Sequence, Tuple
+
+from compressed_io import compression_of, open_binary
+
+# ---------------- HELPER FUNCTIONS ----------------
+
+def _line_windows(buf, markers: Sequence[bytes], context_after: int) -> List[Tuple[int, int]]:
+    """
+    Byte ranges (start, end) covering every line that contains a marker
+    plus the context_after lines that follow it.
+    """
+    windows = []
+    size = len(buf)
+    for marker in markers:
+        pos = buf.find(marker)
+        while pos != -1:
+            start = buf.rfind(b"\n", 0, pos) + 1
+            ends = []  # End of the marker line, then of each context line
+            end = pos
+            for _ in range(context_after + 1):
+                nl = buf.find(b"\n", end)
+                end = size if nl == -1 else nl + 1
+                ends.append(end)
+                if end == size:
+                    break
+            windows.append((start, end))
+            # Carry on after the marker line (a marker may sit in the context of another one)
+            pos = buf.find(marker, ends[0]) if ends[0] < size else -1
+    return windows
+
+def _merge(windows: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sort the windows and merge the overlapping ones so no line is decoded twice."""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def _stream_marker_lines(filepath: str, markers: Sequence[bytes], context_after: int) -> List[str]:
+    """marker_lines for compressed files: stream the decompressed lines and test them as bytes."""
+    lines: List[str] = []
+    remaining = 0  # Context lines still to keep after the last marker line
+    with open_binary(filepath) as f:
+        for raw in f:
+            if any(marker in raw for marker in markers):
+                remaining = context_after + 1
+            if remaining:
+                lines.append(raw.decode(errors="ignore"))
+                remaining -= 1
+    return lines
+
+# ---------------- PUBLIC FUNCTIONS ----------------
+
+def marker_lines(filepath: str, markers: Sequence[bytes], context_after: int = 0) -> List[str]:
+    """
+    Return, in file order, the decoded lines containing any of the markers,
+    each followed by context_after lines of the file.
+    """
+    if compression_of(filepath) is not None:
+        return _stream_marker_lines(filepath, markers, context_after)
+    with open(filepath, "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return []  # An empty file cannot be mapped
+        with buf:
+            lines: List[str] = []
+            for start, end in _merge(_line_windows(buf, markers, context_after)):
+                lines.extend(buf[start:end].decode(errors="ignore").splitlines(keepends=True))
+            return lines
+
+def marker_text(filepath: str, markers: Sequence[bytes], context_after: int = 0) -> str:
+    """Same as marker_lines but joined into one string for the regex based parsers."""
+    return "".join(marker_lines(filepath, markers, context_after))
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+nmr_scaling.py
+
+Comparison of calculated NMR shieldings of candidate structures (e.g. the
+diastereomers of a compound) with experimental shifts, for all candidates
+at once:
+
+    scaled shifts   CHESHIRE linear scaling, delta = (intercept - sigma) / -slope
+    MAE             mean absolute error of the scaled shifts
+    CMAE            mean absolute error after the systematic error of each
+                    candidate is removed by a linear regression of the
+                    calculated on the experimental shifts
+    DP4             probability of each candidate (Smith and Goodman, JACS
+                    2010, 132, 12946) from the errors of the corrected shifts
+                    with a Student t distribution per nucleus
+
+The shieldings of the candidates are one (candidates x atoms) matrix and an
+experimental shift may belong to several equivalent atoms (a methyl group):
+the mapping is a (shifts x atoms) averaging matrix, so every step is a
+matrix operation over all candidates.
+
+    experimental = read_experimental('experimental_shifts.csv')
+    result = compare(shieldings, atom_numbers, symbols, experimental)
+    result.dp4            # probability (%) of every candidate, all nuclei together
+
+The Student t tail is taken from SciPy when it is installed, otherwise it is
+computed with NumPy from the regularized incomplete beta function.
+
+Author: Muhammad Ali Hashmi
+"""
+
+import csv
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from scipy.stats import t as student_t
+except ImportError:
+    student_t = None
+
+# CHESHIRE (cheshirenmr.info) slope and intercept for mPW1PW91/6-311+G(2d,p) with PCM chloroform on
+# B3LYP/6-31+G(d,p) geometries, the levels of the inputs written by CREST_Scripts
+CHESHIRE_SCALING: Dict[str, Tuple[float, float]] = {
+    "C": (-1.0533, 186.5242),
+    "H": (-1.0936, 31.8018),
+}
+# DP4 Student t parameters (sigma in ppm, degrees of freedom) of Smith and Goodman
+DP4_PARAMETERS: Dict[str, Tuple[float, float]] = {
+    "C": (2.306, 11.38),
+    "H": (0.185, 14.18),
+}
+
+# A linear correction (slope and intercept) fits two shifts exactly, which makes CMAE 0 and DP4 uniform
+MIN_CORRECTION_SHIFTS = 3
+BETACF_ITERATIONS = 300
+BETACF_EPS = 1e-15
+TINY = 1e-300
+
+# ---------------- STUDENT t ----------------
+
+def _betacf(a: float, b: float, x: np.ndarray) -> np.ndarray:
+    """Continued fraction of the incomplete beta function (modified Lentz), for an array of x."""
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = np.ones_like(x)
+    d = 1.0 - qab * x / qap
+    d = 1.0 / np.where(np.abs(d) < TINY, TINY, d)
+    h = d.copy()
+    for m in range(1, BETACF_ITERATIONS + 1):
+        m2 = 2 * m
+        for aa in (m * (b - m) * x / ((qam + m2) * (a + m2)),
+                   -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1.0 + aa * d
+            d = 1.0 / np.where(np.abs(d) < TINY, TINY, d)
+            c = 1.0 + aa / c
+            c = np.where(np.abs(c) < TINY, TINY, c)
+            delta = d * c
+            h *= delta
+        if np.all(np.abs(delta - 1.0) < BETACF_EPS):
+            break
+    return h
+
+def _log_t_tail_numpy(t: np.ndarray, nu: float) -> np.ndarray:
+    """ln P(T > t) for t >= 0: 0.5 I_x(nu/2, 1/2) with x = nu / (nu + t^2)."""
+    a, b = nu / 2.0, 0.5
+    x = nu / (nu + np.square(t))
+    with np.errstate(divide='ignore'):
+        log_front = (math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                     + a * np.log(x) + b * (np.log(np.square(t)) - np.log(nu + np.square(t))))
+    log_i = np.empty_like(x)
+    direct = x < (a + 1.0) / (a + b + 2.0)
+    log_i[direct] = log_front[direct] + np.log(_betacf(a, b, x[direct])) - math.log(a)
+    other = ~direct
+    log_i[other] = np.log1p(-np.exp(log_front[other]) * _betacf(b, a, 1.0 - x[other]) / b)
+    return math.log(0.5) + log_i
+
+def log_t_tail(t, nu: float) -> np.ndarray:
+    """Logarithm of the one-sided tail P(T > |t|) of the Student t distribution with nu degrees of freedom."""
+    t = np.abs(np.asarray(t, dtype=float))
+    if student_t is not None:
+        return student_t.logsf(t, nu)
+    return _log_t_tail_numpy(t.ravel(), nu).reshape(t.shape)
+
+# ---------------- EXPERIMENTAL DATA ----------------
+
+@dataclass
+class ExperimentalShifts:
+    """Experimental shifts (ppm) and the atom numbers (1-based, as in the Gaussian logs) each one belongs to."""
+    labels: List[str]
+    shifts: np.ndarray
+    atoms: List[List[int]]
+
+def read_experimental(path: str) -> ExperimentalShifts:
+    """
+    CSV with a Shift column (ppm), an Atoms column (atom numbers, several for equivalent atoms,
+    e.g. "12 13 14") and optionally a Label column.
+    """
+    labels, shifts, atoms = [], [], []
+    with open(path, newline='') as csvfile:
+        for number, row in enumerate(csv.DictReader(csvfile), 1):
+            row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+            if not row.get("shift"):
+                continue
+            labels.append(row.get("label") or f"shift_{number}")
+            shifts.append(float(row["shift"]))
+            atoms.append([int(atom) for atom in re.split(r"[\s;,]+", row.get("atoms", "")) if atom])
+            if not atoms[-1]:
+                raise ValueError(f"{path}: no atom numbers for the shift {labels[-1]}")
+    return ExperimentalShifts(labels, np.array(shifts, dtype=float), atoms)
+
+def mapping_matrix(atom_numbers: Sequence[int], atoms: List[List[int]]) -> np.ndarray:
+    """(shifts x atoms) matrix averaging the shieldings of the atoms of every experimental shift."""
+    column = {int(number): index for index, number in enumerate(atom_numbers)}
+    mapping = np.zeros((len(atoms), len(atom_numbers)))
+    for row, group in enumerate(atoms):
+        missing = [atom for atom in group if atom not in column]
+        if missing:
+            raise ValueError(f"Atom numbers {missing} are not in the calculated shieldings")
+        mapping[row, [column[atom] for atom in group]] = 1.0 / len(group)
+    return mapping
+
+# ---------------- COMPARISON ----------------
+
+def scale_shieldings(shieldings, slope: float, intercept: float) -> np.ndarray:
+    """CHESHIRE scaled shifts (ppm) from isotropic shieldings."""
+    return (intercept - np.asarray(shieldings, dtype=float)) / -slope
+
+def linear_correction(calculated: np.ndarray, experimental: np.ndarray) -> np.ndarray:
+    """
+    Shifts of every candidate (row) corrected by the regression calculated = m experimental + b
+    of that candidate: (calculated - b) / m.  Needs MIN_CORRECTION_SHIFTS experimental shifts,
+    not all the same; otherwise all NaN (no CMAE and no DP4 for that nucleus).
+    """
+    x = experimental - experimental.mean()
+    if len(x) < MIN_CORRECTION_SHIFTS or not x.any():
+        return np.full(calculated.shape, np.nan)
+    y = calculated - calculated.mean(axis=-1, keepdims=True)
+    slope = (y @ x / (x @ x))[..., np.newaxis]
+    intercept = calculated.mean(axis=-1, keepdims=True) - slope * experimental.mean()
+    return (calculated - intercept) / slope
+
+def normalized_percent(log_p: np.ndarray) -> np.ndarray:
+    """Probabilities (%) from unnormalized log probabilities, with log-sum-exp."""
+    shifted = log_p - np.max(log_p)
+    return 100.0 * np.exp(shifted) / np.exp(shifted).sum()
+
+@dataclass
+class NucleusComparison:
+    """Comparison of one nucleus, arrays with one row per candidate."""
+    rows: np.ndarray            # Indices of the experimental shifts of this nucleus
+    shieldings: np.ndarray      # (candidates x shifts) calculated shieldings, averaged over equivalent atoms
+    scaled: np.ndarray          # CHESHIRE scaled shifts
+    corrected: np.ndarray       # Linearly corrected shifts
+    mae: np.ndarray
+    cmae: np.ndarray
+    log_p: np.ndarray           # DP4 log probability (unnormalized); NaN without DP4 parameters
+    dp4: np.ndarray             # DP4 probability (%) from this nucleus alone
+
+@dataclass
+class ComparisonResult:
+    nuclei: Dict[str, NucleusComparison] = field(default_factory=dict)
+    dp4: np.ndarray = None      # DP4 probability (%) of every candidate over all nuclei with DP4 parameters
+
+def compare(shieldings, atom_numbers: Sequence[int], symbols: Sequence[str], experimental: ExperimentalShifts,
+            scaling: Dict[str, Tuple[float, float]] = CHESHIRE_SCALING,
+            dp4_parameters: Dict[str, Tuple[float, float]] = DP4_PARAMETERS) -> ComparisonResult:
+    """Scaled shifts, MAE, CMAE and DP4 of every candidate; shieldings is a (candidates x atoms) matrix."""
+    shieldings = np.atleast_2d(np.asarray(shieldings, dtype=float))
+    calculated = shieldings @ mapping_matrix(atom_numbers, experimental.atoms).T
+    symbol_of = dict(zip((int(number) for number in atom_numbers), symbols))
+    nuclei = []
+    for group in experimental.atoms:
+        group_symbols = {symbol_of[atom] for atom in group}
+        if len(group_symbols) > 1:
+            raise ValueError(f"Atoms {group} of one experimental shift are different elements")
+        nuclei.append(group_symbols.pop())
+    nuclei = np.array(nuclei)
+
+    result = ComparisonResult()
+    total = np.zeros(len(shieldings))
+    for nucleus in sorted(set(nuclei)):
+        if nucleus not in scaling:
+            raise ValueError(f"No scaling factors for {nucleus}, give them with --scaling {nucleus}=SLOPE,INTERCEPT")
+        rows = np.flatnonzero(nuclei == nucleus)
+        exp_shifts = experimental.shifts[rows]
+        scaled = scale_shieldings(calculated[:, rows], *scaling[nucleus])
+        corrected = linear_correction(scaled, exp_shifts)
+        log_p = np.full(len(shieldings), np.nan)
+        dp4 = np.full(len(shieldings), np.nan)
+        if nucleus in dp4_parameters and not np.isnan(corrected).any():
+            sigma, nu = dp4_parameters[nucleus]
+            log_p = log_t_tail((corrected - exp_shifts) / sigma, nu).sum(axis=-1)
+            dp4 = normalized_percent(log_p)
+            total += log_p
+        result.nuclei[nucleus] = NucleusComparison(rows, calculated[:, rows], scaled, corrected,
+                                                   np.abs(scaled - exp_shifts).mean(axis=-1),
+                                                   np.abs(corrected - exp_shifts).mean(axis=-1), log_p, dp4)
+    with_dp4 = any(not np.isnan(n.log_p).any() for n in result.nuclei.values())
+    result.dp4 = normalized_percent(total) if with_dp4 else np.full(len(shieldings), np.nan)
+    return result
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+parse_cache.py
+
+A persistent on-disk cache of parsed results, kept in a sidecar SQLite file
+(.parse_cache.sqlite) in the working directory.  Each entry is keyed on the
+file path and stores the file size, modification time and a hash of the
+first and last 64 KB of the file, so a rerun over a directory of 500
+conformer logs only parses the logs that changed.  The file state is taken
+before the file is parsed, so a log that a running job appends to during
+the parse is stored with its older state and parsed again next time.
+Entries written by an older parser version are ignored and replaced.
+
+Author: Muhammad Ali Hashmi
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+from typing import Any, Callable, Optional, Tuple
+
+from log_parser import PARSER_VERSION
+
+CACHE_FILE = ".parse_cache.sqlite"
+CACHE_FORMAT = 1           # Layout of the cache itself
+HASH_BYTES = 64 * 1024     # Bytes hashed at the head and at the tail of each file
+
+def file_fingerprint(filepath: str) -> str:
+    """blake2b hash of the first and last HASH_BYTES bytes of a file."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        h.update(f.read(HASH_BYTES))
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size > HASH_BYTES:
+            f.seek(max(HASH_BYTES, size - HASH_BYTES))
+            h.update(f.read())
+    return h.hexdigest()
+
+def file_state(filepath: str) -> Tuple[int, int, str]:
+    """(size, mtime_ns, fingerprint) of a file; take it before parsing the file."""
+    st = os.stat(filepath)
+    return st.st_size, st.st_mtime_ns, file_fingerprint(filepath)
+
+class ParseCache(object):
+    """SQLite cache of parsed results. With enabled=False every call simply parses the file."""
+    def __init__(self, cache_file: str = CACHE_FILE, enabled: bool = True,
+                 version: str = f"{CACHE_FORMAT}.{PARSER_VERSION}"):
+        self.enabled = enabled
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if enabled:
+            self.db = sqlite3.connect(cache_file, timeout=60)
+            self.db.execute("""CREATE TABLE IF NOT EXISTS entries (
+                                   path TEXT NOT NULL,
+                                   namespace TEXT NOT NULL,
+                                   size INTEGER NOT NULL,
+                                   mtime_ns INTEGER NOT NULL,
+                                   fingerprint TEXT NOT NULL,
+                                   version TEXT NOT NULL,
+                                   value TEXT NOT NULL,
+                                   PRIMARY KEY (path, namespace))""")
+
+    def get(self, filepath: str, namespace: str) -> Optional[Any]:
+        """The cached value for an unchanged file, or None."""
+        if not self.enabled:
+            return None
+        path = os.path.abspath(filepath)
+        row = self.db.execute("SELECT size, mtime_ns, fingerprint, version, value FROM entries "
+                              "WHERE path = ? AND namespace = ?", (path, namespace)).fetchone()
+        if row is None:
+            return None
+        size, mtime_ns, fingerprint, version, value = row
+        st = os.stat(path)
+        if (size, mtime_ns, version) != (st.st_size, st.st_mtime_ns, self.version):
+            return None
+        if fingerprint != file_fingerprint(path):
+            return None
+        return json.loads(value)
+
+    def snapshot(self, filepath: str) -> Optional[Tuple[int, int, str]]:
+        """file_state of a file about to be parsed, for put(); None when disabled or the file cannot be read."""
+        if not self.enabled:
+            return None
+        try:
+            return file_state(filepath)
+        except OSError:
+            return None
+
+    def put(self, filepath: str, namespace: str, value: Any, state: Tuple[int, int, str]) -> None:
+        """Store a JSON-serialisable value for a file, with the file_state taken before it was parsed."""
+        if not self.enabled:
+            return
+        size, mtime_ns, fingerprint = state
+        self.db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (os.path.abspath(filepath), namespace, size, mtime_ns, fingerprint,
+                         self.version, json.dumps(value)))
+
+    def cached(self, filepath: str, namespace: str, parse: Callable[[str], Any]) -> Any:
+        """Return the cached value for filepath, parsing (and storing) it only if needed."""
+        value = self.get(filepath, namespace)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        state = self.snapshot(filepath)
+        value = parse(filepath)
+        if state is not None:
+            self.put(filepath, namespace, value, state)
+        return value
+
+    def close(self) -> None:
+        """Write the new entries to disk."""
+        if self.db is not None:
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
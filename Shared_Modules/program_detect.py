@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+program_detect.py
+
+Detect which program wrote an output file from a fixed-size head buffer.
+The first HEAD_BYTES of the file are read once and a single compiled
+alternation pattern picks out the program banner, the version and the
+route card (Gaussian) or '!' keyword lines (ORCA) in one pass.
+
+Returns a ProgramInfo with program ('gaussian', 'orca' or 'unknown'),
+version ('g09', 'g16', 'ORCA 4', 'ORCA 5', ...) and job type
+('opt+freq', 'nmr', 'sp', ...) of the first job step.
+
+Author: Muhammad Ali Hashmi
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from compressed_io import open_binary
+
+HEAD_BYTES = 128 * 1024
+
+# One pattern for every header marker, each alternative has its own named group
+HEADER_PATTERN = re.compile(
+    rb"Entering Gaussian System, Link 0=(?P<g_link>g\d\d)"
+    rb"|This is part of the Gaussian\(R\) (?P<g_part>\d\d) program"
+    rb"|^ Gaussian (?P<g_banner>\d\d):"
+    rb"|^ (?P<route>#[^\n]*(?:\n [^-\n][^\n]*)*)"
+    rb"|(?P<orca>\* O\s+R\s+C\s+A \*)"
+    rb"|Program Version (?P<orca_version>\d+)\.\d"
+    rb"|^\|\s*\d+>\s*!(?P<keywords>[^\n]*)",
+    re.M)
+
+# Route/keyword words (before any '=' or '(') and the job type they stand for
+JOB_KEYWORDS = {
+    "opt": "opt", "optts": "opt", "tightopt": "opt", "verytightopt": "opt", "copt": "opt", "zopt": "opt",
+    "freq": "freq", "numfreq": "freq", "anfreq": "freq",
+    "nmr": "nmr",
+    "irc": "irc",
+    "scan": "scan",
+    "td": "td", "tddft": "td",
+}
+
+@dataclass
+class ProgramInfo:
+    """What wrote the output file and what kind of job it is."""
+    program: str                 # 'gaussian', 'orca' or 'unknown'
+    version: Optional[str]       # 'g09', 'g16', 'ORCA 5', ... or None
+    job_type: Optional[str]      # 'opt+freq', 'nmr', 'sp', ... or None
+
+def _job_type(keyword_lines: List[str]) -> Optional[str]:
+    """Turn route cards / '!' lines into a job type such as 'opt+freq' ('sp' when nothing else is asked for)."""
+    if not keyword_lines:
+        return None
+    jobs = []
+    for line in keyword_lines:
+        for word in line.lower().lstrip("#pnt ").split():
+            key = re.split(r"[=(]", word, 1)[0]
+            job = JOB_KEYWORDS.get(key)
+            if key == "polar" and "optrot" in word:
+                job = "optrot"
+            if job and job not in jobs:
+                jobs.append(job)
+    return "+".join(jobs) if jobs else "sp"
+
+def detect_program(filepath: str, head_bytes: int = HEAD_BYTES) -> ProgramInfo:
+    """Read the head of an output file once and tell which program, version and job type it is."""
+    with open_binary(filepath) as f:
+        head = f.read(head_bytes)
+
+    gaussian_version = None
+    orca = False
+    orca_version = None
+    keyword_lines = []
+    for m in HEADER_PATTERN.finditer(head):
+        group = m.lastgroup
+        value = m.group(group).decode(errors="ignore")
+        if group in ("g_link", "g_part", "g_banner") and gaussian_version is None:
+            gaussian_version = value if group == "g_link" else f"g{value}"
+        elif group == "route":
+            if not keyword_lines:  # Only the first job step (the first route card)
+                keyword_lines.append(value.replace("\n ", ""))
+        elif group == "orca":
+            orca = True
+        elif group == "orca_version" and orca_version is None:
+            orca_version = f"ORCA {value}"
+        elif group == "keywords":
+            keyword_lines.append(value)
+
+    if gaussian_version is not None:
+        return ProgramInfo("gaussian", gaussian_version, _job_type(keyword_lines))
+    if orca:
+        return ProgramInfo("orca", orca_version, _job_type(keyword_lines))
+    return ProgramInfo("unknown", None, None)
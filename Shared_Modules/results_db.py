@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+results_db.py
+
+A campaign results database in SQLite.  Output files are parsed with the
+same shared parsers the extractor scripts use and stored in indexed tables:
+
+    jobs       one row per output file (compound, conformer, program, charge, ...)
+    energies   SCF, ZPE-corrected, enthalpy and Gibbs energies, optical rotation
+    geometries last geometry, one row per atom
+    shielding  NMR isotropic shielding tensors, one row per atom
+
+Ingestion is incremental: a file whose size, modification time and
+head/tail hash (the same fingerprint as parse_cache) are unchanged is
+skipped, and a changed file replaces its old rows.  Every conformer of a
+compound is stored once: of several files of one conformer (conf01.log and
+conf01.log.gz) the most recently modified one is stored, and the jobs of
+files that no longer exist are removed on every ingest.  Queries such as the
+lowest-energy conformer of every compound are then index lookups instead
+of rescans of the output directories.
+
+Author: Muhammad Ali Hashmi
+"""
+
+import os
+import math
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from batch_driver import run_batch, Failures
+from compressed_io import base_name
+from log_parser import parse_log, PARSER_VERSION, HARTREE_TO_KCAL
+from parse_cache import file_fingerprint, file_state
+from program_detect import detect_program
+from trajectory import read_trajectory
+
+DB_FILE = "results.sqlite"
+SCHEMA_VERSION = 2
+
+# Energy columns that can be queried (all in Hartree)
+ENERGY_COLUMNS = ("scf_energy", "zero_point_energy", "enthalpy", "gibbs_energy")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    compound TEXT NOT NULL,
+    conformer TEXT NOT NULL,
+    program TEXT,
+    version TEXT,
+    job_type TEXT,
+    charge INTEGER,
+    multiplicity INTEGER,
+    elapsed_hours REAL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    parser_version INTEGER NOT NULL);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_conformer ON jobs (compound, conformer);
+
+CREATE TABLE IF NOT EXISTS energies (
+    job_id INTEGER PRIMARY KEY REFERENCES jobs (job_id) ON DELETE CASCADE,
+    compound TEXT NOT NULL,
+    scf_energy REAL,
+    scf_count INTEGER,
+    zero_point_energy REAL,
+    enthalpy REAL,
+    gibbs_energy REAL,
+    optical_rotation REAL);
+CREATE INDEX IF NOT EXISTS energies_scf ON energies (compound, scf_energy);
+CREATE INDEX IF NOT EXISTS energies_zpe ON energies (compound, zero_point_energy);
+CREATE INDEX IF NOT EXISTS energies_enthalpy ON energies (compound, enthalpy);
+CREATE INDEX IF NOT EXISTS energies_gibbs ON energies (compound, gibbs_energy);
+
+CREATE TABLE IF NOT EXISTS geometries (
+    job_id INTEGER NOT NULL REFERENCES jobs (job_id) ON DELETE CASCADE,
+    atom_index INTEGER NOT NULL,
+    atomic_number INTEGER NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    z REAL NOT NULL,
+    PRIMARY KEY (job_id, atom_index));
+
+CREATE TABLE IF NOT EXISTS shielding (
+    job_id INTEGER NOT NULL REFERENCES jobs (job_id) ON DELETE CASCADE,
+    atom_index INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    isotropic REAL NOT NULL,
+    PRIMARY KEY (job_id, atom_index));
+CREATE INDEX IF NOT EXISTS shielding_symbol ON shielding (symbol);
+"""
+
+# ---------------- EXTRACTION ----------------
+
+def extract_job(filepath: str) -> Dict[str, Any]:
+    """Everything stored for one output file, as plain values (runs in the worker processes)."""
+    info = detect_program(filepath)
+    if info.program == "unknown":
+        raise ValueError("neither a Gaussian nor an ORCA output file")
+    record: Dict[str, Any] = {"program": info.program, "version": info.version, "job_type": info.job_type}
+    if info.program == "orca":
+        # The ORCA energies and last geometry come from the trajectory reader
+        trajectory = read_trajectory(filepath)
+        energy = float(trajectory.energies[-1])
+        record.update(scf_energy=None if math.isnan(energy) else energy,
+                      scf_count=sum(not math.isnan(e) for e in trajectory.energies),
+                      geometry=[(int(z), *map(float, xyz))
+                                for z, xyz in zip(trajectory.atomic_numbers, trajectory.coords[-1])])
+        return record
+
+    # Gaussian: one pass over the log for every event the extractor scripts use
+    result = parse_log(filepath)
+    record.update(charge=result.charge, multiplicity=result.multiplicity, elapsed_hours=result.elapsed_hours,
+                  scf_energy=result.scf_energy, scf_count=result.scf_count,
+                  zero_point_energy=result.zero_point_energy, enthalpy=result.enthalpy,
+                  gibbs_energy=result.gibbs_energy, optical_rotation=result.optical_rotation,
+                  geometry=result.geometry,
+                  shielding=list(zip(result.atom_nos, result.symbols, result.tensors)))
+    return record
+
+def default_compound(filepath: str) -> str:
+    """Compound name of a conformer log: the name of the folder it is in (Comp-01/conf01.log -> Comp-01)."""
+    return os.path.basename(os.path.dirname(os.path.abspath(filepath)))
+
+# ---------------- DATABASE ----------------
+
+class ResultsDB(object):
+    """The SQLite results database of a calculation campaign."""
+    def __init__(self, db_file: str = DB_FILE):
+        self.db = sqlite3.connect(db_file, timeout=60)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        if 0 < self.db.execute("PRAGMA user_version").fetchone()[0] < 2:
+            # Version 1 could hold two files of one conformer (x.log and x.log.gz): keep the last one stored
+            self.db.execute("DELETE FROM jobs WHERE job_id NOT IN "
+                            "(SELECT MAX(job_id) FROM jobs GROUP BY compound, conformer)")
+            self.db.execute("DROP INDEX IF EXISTS jobs_compound")
+        self.db.executescript(SCHEMA)
+        self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def is_current(self, filepath: str) -> bool:
+        """True if the file is already stored and has not changed since."""
+        path = os.path.abspath(filepath)
+        row = self.db.execute("SELECT size, mtime_ns, fingerprint, parser_version FROM jobs WHERE path = ?",
+                              (path,)).fetchone()
+        if row is None:
+            return False
+        st = os.stat(path)
+        if tuple(row[:2]) != (st.st_size, st.st_mtime_ns) or row[3] != PARSER_VERSION:
+            return False
+        return row[2] == file_fingerprint(path)
+
+    def prune(self) -> int:
+        """Remove the jobs (and all their rows) whose output file no longer exists; returns how many."""
+        gone = [(job_id,) for job_id, path in self.db.execute("SELECT job_id, path FROM jobs").fetchall()
+                if not os.path.exists(path)]
+        self.db.executemany("DELETE FROM jobs WHERE job_id = ?", gone)
+        return len(gone)
+
+    def ingest(self, files: Sequence[str], compound: Optional[str] = None,
+               jobs: int = 1) -> Tuple[int, int, int, Failures]:
+        """
+        Remove the jobs of deleted files, then parse the new or changed files (with `jobs` worker processes)
+        and store them. Of several files of one conformer only the most recently modified one is stored.
+        Returns the number of files stored, the number skipped as unchanged, the number of jobs removed,
+        and the failures (including the files left out as another file of the same conformer).
+        """
+        removed = self.prune()
+        files, failures = _one_file_per_conformer(files, compound)
+        stale = [path for path in files if not self.is_current(path)]
+        # The file states before parsing: a log that grows during the parse is stored as changed and parsed again
+        states = {}
+        for path in stale:
+            try:
+                states[path] = file_state(path)
+            except OSError:
+                states[path] = None  # extract_job reports the error
+        results, parse_failures = run_batch(extract_job, stale, jobs)
+        failures += parse_failures
+        stored = 0
+        for path, record in results:
+            # A file that cannot be stored is rolled back and reported, the others are still stored
+            self.db.execute("SAVEPOINT store_file")
+            try:
+                self.store(path, compound or default_compound(path), record, states[path])
+                stored += 1
+            except sqlite3.Error as error:
+                self.db.execute("ROLLBACK TO store_file")
+                failures.append((path, f"{type(error).__name__}: {error}"))
+            self.db.execute("RELEASE store_file")
+        self.db.commit()
+        return stored, len(files) - len(stale), removed, failures
+
+    def store(self, filepath: str, compound: str, record: Dict[str, Any],
+              state: Optional[Tuple[int, int, str]] = None) -> None:
+        """
+        Insert one parsed file, replacing the rows of an older version of it or of another file
+        of the same conformer. state is the parse_cache.file_state of the file taken before it was
+        parsed (now when None).
+        """
+        path = os.path.abspath(filepath)
+        size, mtime_ns, fingerprint = state if state is not None else file_state(path)
+        # Cascades to the other tables
+        self.db.execute("DELETE FROM jobs WHERE path = ? OR (compound = ? AND conformer = ?)",
+                        (path, compound, base_name(path)))
+        cursor = self.db.execute(
+            "INSERT INTO jobs (path, compound, conformer, program, version, job_type, charge, multiplicity, "
+            "elapsed_hours, size, mtime_ns, fingerprint, parser_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, compound, base_name(path), record["program"], record["version"], record["job_type"],
+             record.get("charge"), record.get("multiplicity"), record.get("elapsed_hours"),
+             size, mtime_ns, fingerprint, PARSER_VERSION))
+        job_id = cursor.lastrowid
+        self.db.execute("INSERT INTO energies VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (job_id, compound, record.get("scf_energy"), record.get("scf_count"),
+                         record.get("zero_point_energy"), record.get("enthalpy"),
+                         record.get("gibbs_energy"), record.get("optical_rotation")))
+        self.db.executemany("INSERT INTO geometries VALUES (?, ?, ?, ?, ?, ?)",
+                            [(job_id, i, *atom) for i, atom in enumerate(record.get("geometry", []), 1)])
+        self.db.executemany("INSERT INTO shielding VALUES (?, ?, ?, ?)",
+                            [(job_id, atom_no, symbol, iso)
+                             for atom_no, symbol, iso in record.get("shielding", [])])
+
+    # ---------------- QUERIES ----------------
+
+    def lowest_energies(self, energy: str = "gibbs_energy") -> List[Tuple[str, str, float]]:
+        """(compound, conformer, energy in Hartree) of the lowest-energy conformer of every compound."""
+        column = _energy_column(energy)
+        # SQLite returns the other columns of the row that holds the MIN()
+        return self.db.execute(
+            f"SELECT e.compound, j.conformer, MIN(e.{column}) FROM energies e JOIN jobs j USING (job_id) "
+            f"WHERE e.{column} IS NOT NULL GROUP BY e.compound ORDER BY e.compound").fetchall()
+
+    def conformer_energies(self, compound: str, energy: str = "gibbs_energy") -> List[Tuple[str, float, float]]:
+        """(conformer, energy in Hartree, relative energy in kcal/mol) of one compound, lowest first."""
+        column = _energy_column(energy)
+        rows = self.db.execute(
+            f"SELECT j.conformer, e.{column} FROM energies e JOIN jobs j USING (job_id) "
+            f"WHERE e.compound = ? AND e.{column} IS NOT NULL ORDER BY e.{column}", (compound,)).fetchall()
+        if not rows:
+            return []
+        lowest = rows[0][1]
+        return [(conformer, value, (value - lowest) * HARTREE_TO_KCAL) for conformer, value in rows]
+
+    def geometry(self, compound: str, conformer: str) -> List[Tuple[int, float, float, float]]:
+        """Stored (atomic number, x, y, z) of one conformer."""
+        return self.db.execute(
+            "SELECT g.atomic_number, g.x, g.y, g.z FROM geometries g JOIN jobs j USING (job_id) "
+            "WHERE j.compound = ? AND j.conformer = ? ORDER BY g.atom_index", (compound, conformer)).fetchall()
+
+    def shielding_tensors(self, compound: str, conformer: str) -> List[Tuple[int, str, float]]:
+        """Stored (atom number, symbol, isotropic shielding) of one conformer."""
+        return self.db.execute(
+            "SELECT s.atom_index, s.symbol, s.isotropic FROM shielding s JOIN jobs j USING (job_id) "
+            "WHERE j.compound = ? AND j.conformer = ? ORDER BY s.atom_index", (compound, conformer)).fetchall()
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _one_file_per_conformer(files: Sequence[str], compound: Optional[str]) -> Tuple[List[str], Failures]:
+    """
+    The most recently modified file of every (compound, conformer), in input order, and the others
+    as failures (conf01.log and conf01.log.gz are the same conformer).
+    """
+    newest: Dict[Tuple[str, str], Tuple[int, str]] = {}
+    for path in files:
+        key = (compound or default_compound(path), base_name(path))
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime_ns = -1  # extract_job reports the error
+        if key not in newest or mtime_ns > newest[key][0]:
+            newest[key] = (mtime_ns, path)
+    kept, left_out = [], []
+    for path in files:
+        chosen = newest[(compound or default_compound(path), base_name(path))][1]
+        if path == chosen:
+            kept.append(path)
+        else:
+            left_out.append((path, f"same conformer as the newer {chosen}, which is stored instead"))
+    return kept, left_out
+
+def _energy_column(energy: str) -> str:
+    if energy not in ENERGY_COLUMNS:
+        raise ValueError(f"Unknown energy '{energy}', use one of {', '.join(ENERGY_COLUMNS)}")
+    return energy
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+reverse_reader.py
+
+A reader for "last occurrence" quantities.
+The output file is memory-mapped and the last occurrence of every requested
+marker is found with bytes.rfind from the end of the mapping, so only the
+lines after each hit are decoded.  On a finished optimization this means
+touching only the tail of the log (the last geometry, SCF energy and
+thermochemistry); a marker that is not in the file at all (no frequency
+step, no thermochemistry) costs one byte search in C, not a Python loop
+over every line.  Compressed logs cannot be mapped, so for them find_last
+falls back to one forward pass that remembers the last matches, and
+read_final parses them in one streaming pass.
+
+Author: Muhammad Ali Hashmi
+"""
+
+import mmap
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from compressed_io import base_name, compression_of, open_binary
+from log_parser import EVENTS, LogResult, parse_log
+
+# Events that accumulate over the whole file make no sense when read from the end
+TAIL_EVENTS = ("scf", "thermochemistry", "charge", "elapsed", "optical_rotation", "orientation")
+
+# ---------------- READERS ----------------
+
+def lines_from(filepath: str, offset: int) -> Iterator[str]:
+    """Yield the lines of the file going forward from a byte offset (of the decompressed data)."""
+    with open_binary(filepath) as f:
+        f.seek(offset)
+        for raw in f:
+            yield raw.decode(errors='ignore')
+
+def find_last(filepath: str, markers: Sequence[str]) -> Dict[str, Optional[Tuple[int, str]]]:
+    """
+    Return {marker: (offset, line)} for the last line containing each marker
+    (None if the marker is not in the file), with one rfind over the mapped file per marker.
+    """
+    found: Dict[str, Optional[Tuple[int, str]]] = {m: None for m in markers}
+    if compression_of(filepath) is not None:
+        return _find_last_forward(filepath, found)
+    with open(filepath, 'rb') as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # An empty file cannot be mapped
+            return found
+        with buf:
+            for marker in markers:
+                pos = buf.rfind(marker.encode())
+                if pos == -1:
+                    continue
+                start = buf.rfind(b"\n", 0, pos) + 1
+                end = buf.find(b"\n", pos)
+                line = buf[start:] if end == -1 else buf[start:end + 1]
+                found[marker] = (start, line.decode(errors='ignore').rstrip("\n") + "\n")
+    return found
+
+def _find_last_forward(filepath: str, found: Dict[str, Optional[Tuple[int, str]]]):
+    """find_last for compressed files: one forward pass over the decompressed lines."""
+    markers = [(m, m.encode()) for m in found]
+    offset = 0
+    with open_binary(filepath) as f:
+        for raw in f:
+            for marker, bmarker in markers:
+                if bmarker in raw:
+                    found[marker] = (offset, raw.decode(errors='ignore'))
+            offset += len(raw)
+    return found
+
+def read_final(filepath: str, events: Sequence[str] = ("scf", "thermochemistry", "orientation")) -> LogResult:
+    """
+    Read the last occurrence of each event from the end of a Gaussian log and
+    return it as a LogResult, using the same handlers as log_parser.
+    """
+    for name in events:
+        if name not in TAIL_EVENTS:
+            raise ValueError(f"Event '{name}' cannot be read from the end of the file")
+    if compression_of(filepath) is not None:
+        # No seeking back into a compressed stream: one streaming pass keeps the last match of each event
+        return parse_log(filepath, events=events)
+    handlers = {marker: handler for name in events for marker, handler in EVENTS[name]}
+    result = LogResult(filename=base_name(filepath))
+    for marker, hit in find_last(filepath, list(handlers)).items():
+        if hit is None:
+            continue
+        offset, line = hit
+        following = lines_from(filepath, offset)
+        next(following)  # The marker line itself
+        try:
+            handlers[marker](line, following, result)
+        except StopIteration:
+            pass  # The file ended in the middle of a block
+        finally:
+            following.close()
+    return result
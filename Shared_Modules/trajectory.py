@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+trajectory.py
+
+Every geometry of an optimization (not only the last one) as NumPy frames.
+Each 'Standard orientation:' block of a Gaussian log, or 'CARTESIAN
+COORDINATES (ANGSTROEM)' block of an ORCA output, is parsed straight into
+the next frame of a preallocated (n_frames, n_atoms, 3) float64 array,
+which doubles in size when it is full.  The SCF energy that follows a
+geometry is kept with its frame.
+
+A trajectory can be written as a multi-frame XYZ file (for animation in
+VMD, Jmol, Avogadro ...), saved as a compressed .npz file that loads back
+without reparsing the output file, or exported as a columnar table
+(Parquet/Arrow, see columnar_export.py) with one row per frame.
+
+Author: Muhammad Ali Hashmi
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from columnar_export import export_columns
+from compressed_io import open_text, base_name
+from elements import ATOMIC_SYMBOLS, atomic_number
+from input_templates import coordinate_template
+from program_detect import detect_program
+
+GAUSSIAN_MARKER = "Standard orientation:"
+ORCA_MARKER = "CARTESIAN COORDINATES (ANGSTROEM)"
+INITIAL_FRAMES = 64
+
+@dataclass
+class Trajectory:
+    """All geometries of one output file."""
+    filename: str
+    atomic_numbers: np.ndarray   # (n_atoms,) int
+    coords: np.ndarray           # (n_frames, n_atoms, 3) float64, in Angstrom
+    energies: np.ndarray         # (n_frames,) SCF energy in Hartree, NaN where none was found
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+class FrameBuffer(object):
+    """Frames copied into a preallocated array that doubles its capacity when full."""
+    def __init__(self, atomic_numbers: np.ndarray, capacity: int = INITIAL_FRAMES):
+        self.atomic_numbers = atomic_numbers
+        self.coords = np.empty((capacity, len(atomic_numbers), 3))
+        self.energies = np.full(capacity, np.nan)
+        self.n_frames = 0
+
+    def append(self, xyz: np.ndarray) -> None:
+        if len(xyz) != len(self.atomic_numbers):
+            raise ValueError(f"Frame {self.n_frames + 1} has {len(xyz)} atoms, expected {len(self.atomic_numbers)}")
+        if self.n_frames == len(self.coords):
+            self.coords = np.concatenate([self.coords, np.empty_like(self.coords)])
+            self.energies = np.concatenate([self.energies, np.full(len(self.energies), np.nan)])
+        self.coords[self.n_frames] = xyz
+        self.n_frames += 1
+
+    def set_energy(self, energy: float) -> None:
+        """Energy of the latest frame (the first one found after it)."""
+        if self.n_frames and np.isnan(self.energies[self.n_frames - 1]):
+            self.energies[self.n_frames - 1] = energy
+
+    def trajectory(self, filename: str) -> Trajectory:
+        n = self.n_frames
+        return Trajectory(filename, self.atomic_numbers, self.coords[:n].copy(), self.energies[:n].copy())
+
+# ---------------- READERS ----------------
+
+def _gaussian_frames(f):
+    """(atomic numbers, xyz) of each 'Standard orientation:' block, or the SCF energy (float) in between."""
+    for line in f:
+        if GAUSSIAN_MARKER in line:
+            for _ in range(4):  # Table header down to the dashes
+                next(f)
+            rows = []
+            for row in f:
+                if row.find("-----------") != -1:
+                    break
+                rows.append(row)
+            # Center number, atomic number, atomic type, x, y, z
+            block = np.fromstring("".join(rows), sep=" ").reshape(len(rows), 6)
+            yield block[:, 1].astype(int), block[:, 3:]
+        elif "SCF Done" in line:
+            yield float(line.split()[4])
+
+def _orca_frames(f):
+    """(atomic numbers, xyz) of each 'CARTESIAN COORDINATES (ANGSTROEM)' block, or the final energy in between."""
+    for line in f:
+        if ORCA_MARKER in line:
+            next(f)  # Dashes
+            rows = []
+            for row in f:
+                if not row.strip():
+                    break
+                rows.append(row.split())
+            yield (np.array([atomic_number(r[0]) for r in rows]),
+                   np.array([r[1:4] for r in rows], dtype=float))
+        elif line.startswith("FINAL SINGLE POINT ENERGY"):
+            yield float(line.split()[-1])
+
+def read_trajectory(filepath: str) -> Trajectory:
+    """Read every geometry of a Gaussian or ORCA output file (compressed files too)."""
+    program = detect_program(filepath).program
+    if program == "gaussian":
+        frames = _gaussian_frames
+    elif program == "orca":
+        frames = _orca_frames
+    else:
+        raise ValueError(f"{filepath} is neither a Gaussian nor an ORCA output file")
+
+    buffer = None
+    with open_text(filepath) as f:
+        for item in frames(f):
+            if isinstance(item, float):
+                if buffer is not None:
+                    buffer.set_energy(item)
+                continue
+            numbers, xyz = item
+            if buffer is None:
+                buffer = FrameBuffer(numbers)
+            buffer.append(xyz)
+    if buffer is None:
+        raise ValueError(f"No geometries found in {filepath}")
+    return buffer.trajectory(base_name(filepath))
+
+# ---------------- WRITERS ----------------
+
+def write_xyz(trajectory: Trajectory, out_file: str) -> None:
+    """Multi-frame XYZ file, one frame per geometry, with the energy in each comment line."""
+    # One format string per frame, built once from the atom symbols
+    frame_template = coordinate_template(tuple(ATOMIC_SYMBOLS[z] for z in trajectory.atomic_numbers))
+    n_atoms = len(trajectory.atomic_numbers)
+    with open(out_file, 'w') as f:
+        for i, (xyz, energy) in enumerate(zip(trajectory.coords, trajectory.energies), 1):
+            f.write(f"{n_atoms}\n{trajectory.filename} frame {i} SCF Energy = {energy} au\n")
+            f.write(frame_template.format(*xyz.ravel()))
+
+def save_npz(trajectory: Trajectory, out_file: str) -> None:
+    """Compressed NumPy archive with the coordinates, atomic numbers and energies."""
+    np.savez_compressed(out_file, filename=trajectory.filename, atomic_numbers=trajectory.atomic_numbers,
+                        coords=trajectory.coords, energies=trajectory.energies)
+
+def export_trajectory(trajectory: Trajectory, out_base: str, fmt: str = "auto") -> str:
+    """Columnar table with one row per frame (energy and coordinates); returns the file name."""
+    return export_columns(out_base, {"frame": np.arange(1, len(trajectory) + 1), "energy": trajectory.energies,
+                                     "coords": trajectory.coords},
+                          {"filename": trajectory.filename,
+                           "atomic_numbers": trajectory.atomic_numbers.tolist()}, fmt)
+
+def load_npz(npz_file: str) -> Trajectory:
+    """Load a trajectory saved by save_npz."""
+    with np.load(npz_file) as data:
+        return Trajectory(str(data["filename"]), data["atomic_numbers"], data["coords"], data["energies"])
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+xyz_index.py
+
+Random access to the frames of a multi-structure xyz file (a CREST
+ensemble, an optimization trajectory, a conformer archive).  One pass over
+the file records the byte offset, atom count and comment-line energy of
+every frame and saves them next to it (file.xyz.idx).  After that any frame,
+or slice of frames, is read with a single seek instead of splitting the
+whole ensemble:
+
+    with XYZFile('crest_conformers.xyz') as ensemble:
+        frame = ensemble[8430]          # conformer 8431 (frames count from 0)
+        best = ensemble[:10]            # the first ten conformers
+
+The index is rebuilt automatically when the xyz file has changed: its size,
+modification time or head/tail hash (the parse_cache fingerprint) differs,
+so a rerun that writes a file of the same size is not mistaken for the old one.
+Seeking is O(1) on uncompressed files; compressed files work too but are
+decompressed up to the requested frame.  A line that is not an atom count
+(trailing junk) or a frame cut short ends the index there, with a message,
+the same way crest_conf_separation.py stops splitting the file.
+
+    python3 xyz_index.py crest_conformers.xyz               (build the index)
+    python3 xyz_index.py crest_conformers.xyz --frame 8431  (print one frame)
+
+Author: Muhammad Ali Hashmi
+"""
+
+import os
+import re
+import argparse
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+from compressed_io import open_binary
+from input_templates import format_coordinates
+from parse_cache import file_fingerprint
+
+INDEX_VERSION = 2
+INDEX_EXTENSION = ".idx"
+ENERGY_PATTERN = re.compile(r"[-+]?\d*\.\d+|\d+")
+NAME_PATTERN = re.compile(r"\s*\bname=(\S+)")   # Original conformer name, added to the comment line in archives
+
+@dataclass
+class XYZIndex:
+    """Where every frame of an xyz file starts (0-based frame numbers)."""
+    offsets: np.ndarray    # (n_frames,) int64 byte offset of the atom count line
+    n_atoms: np.ndarray    # (n_frames,) int64
+    energies: np.ndarray   # (n_frames,) first number of the comment line, NaN if none
+    end: int               # Byte offset of the end of the last frame (of the decompressed data)
+    file_size: int         # Size of the file on disk when it was indexed
+    mtime_ns: int = 0      # Its modification time then
+    fingerprint: str = ""  # Its head/tail hash then (parse_cache.file_fingerprint)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+@dataclass
+class Frame:
+    """One structure of an xyz file."""
+    comment: str
+    symbols: List[str]
+    coords: np.ndarray     # (n_atoms, 3)
+    energy: float          # NaN if the comment line has no number
+
+    @property
+    def name(self) -> Optional[str]:
+        """The name=... tag of the comment line (archives written with names), or None."""
+        return frame_name(self.comment)
+
+    def text(self) -> str:
+        """The frame as an xyz block again."""
+        return f"{len(self.symbols)}\n{self.comment}\n" + format_coordinates(self.symbols, self.coords)
+
+def comment_energy(line: str) -> Optional[float]:
+    """First number in the comment line of an xyz frame (the energy in CREST files), or None."""
+    match = ENERGY_PATTERN.search(NAME_PATTERN.sub("", line))
+    return float(match.group(0)) if match else None
+
+def frame_name(line: str) -> Optional[str]:
+    """The name=... tag of a comment line, or None."""
+    match = NAME_PATTERN.search(line)
+    return match.group(1) if match else None
+
+def index_path(xyz_file: str) -> str:
+    return xyz_file + INDEX_EXTENSION
+
+# ---------------- BUILDING AND SAVING ----------------
+
+def build_index(xyz_file: str) -> XYZIndex:
+    """
+    One pass over the file, reading only the atom count and comment line of each frame in full.
+    The frames before an invalid atom count line or a truncated frame are indexed, the rest is ignored.
+    """
+    offsets, n_atoms, energies = [], [], []
+    offset = 0
+    with open_binary(xyz_file) as f:
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip():  # Blank lines between or after frames
+                offset += len(line)
+                continue
+            try:
+                n = int(line)
+            except ValueError:
+                print(f"{xyz_file}: invalid number of atoms at byte {offset} ({line[:40]!r}), "
+                      f"{len(offsets)} frames indexed up to there.")
+                break
+            comment = f.readline()
+            atoms = [f.readline() for _ in range(n)]
+            if not all(atoms):
+                print(f"{xyz_file}: the frame at byte {offset} is cut short, {len(offsets)} frames indexed up to there.")
+                break
+            frame_size = len(line) + len(comment) + sum(len(atom) for atom in atoms)
+            energy = comment_energy(comment.decode(errors='ignore'))
+            offsets.append(offset)
+            n_atoms.append(n)
+            energies.append(np.nan if energy is None else energy)
+            offset += frame_size
+    st = os.stat(xyz_file)
+    return XYZIndex(np.array(offsets, dtype=np.int64), np.array(n_atoms, dtype=np.int64),
+                    np.array(energies, dtype=float), offset, st.st_size, st.st_mtime_ns, file_fingerprint(xyz_file))
+
+def save_index(index: XYZIndex, out_file: str) -> None:
+    """Plain-text index: a header with the format version and the state of the file, then one line per frame."""
+    with open(out_file, 'w') as f:
+        f.write(f"# xyz_index {INDEX_VERSION} size={index.file_size} end={index.end} "
+                f"mtime_ns={index.mtime_ns} fingerprint={index.fingerprint}\n"
+                "# frame offset n_atoms energy\n")
+        for i, (offset, n, energy) in enumerate(zip(index.offsets, index.n_atoms, index.energies), 1):
+            f.write(f"{i} {offset} {n} {float(energy)!r}\n")
+
+def load_index(xyz_file: str) -> Optional[XYZIndex]:
+    """The saved index of an xyz file, or None if there is none or it is out of date."""
+    path = index_path(xyz_file)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        header = f.readline().split()
+    if header[:3] != ["#", "xyz_index", str(INDEX_VERSION)]:
+        return None
+    sizes = dict(field.split("=") for field in header[3:])
+    st = os.stat(xyz_file)
+    if (int(sizes["size"]), int(sizes["mtime_ns"])) != (st.st_size, st.st_mtime_ns):
+        return None
+    if sizes["fingerprint"] != file_fingerprint(xyz_file):
+        return None
+    table = np.loadtxt(path, comments="#", ndmin=2).reshape(-1, 4)
+    return XYZIndex(table[:, 1].astype(np.int64), table[:, 2].astype(np.int64), table[:, 3],
+                    int(sizes["end"]), int(sizes["size"]), int(sizes["mtime_ns"]), sizes["fingerprint"])
+
+def get_index(xyz_file: str, rebuild: bool = False) -> XYZIndex:
+    """Load the saved index, or build (and try to save) it when it is missing or out of date."""
+    index = None if rebuild else load_index(xyz_file)
+    if index is None:
+        index = build_index(xyz_file)
+        try:
+            save_index(index, index_path(xyz_file))
+        except OSError:
+            pass  # Read-only folder: the index is simply rebuilt next time
+    return index
+
+class ArchiveWriter(object):
+    """Writes frames into one xyz file and saves its index when closed."""
+    def __init__(self, archive: str):
+        self.archive = archive
+        self.file = open(archive, 'wb')
+        self.offsets, self.n_atoms, self.energies = [], [], []
+        self.offset = 0
+
+    def add(self, lines: Sequence[str], name: Optional[str] = None) -> Optional[float]:
+        """
+        Append one xyz block (atom count line, comment line, atoms); returns its comment-line energy.
+        A name (e.g. the CREST conformer number) is kept as a name=... tag at the end of the comment line.
+        """
+        if name is not None:
+            comment = NAME_PATTERN.sub("", lines[1].rstrip("\r\n"))
+            lines = [lines[0], f"{comment}  name={name}\n"] + list(lines[2:])
+        block = "".join(lines).encode()
+        energy = comment_energy(lines[1])
+        self.file.write(block)
+        self.offsets.append(self.offset)
+        self.n_atoms.append(len(lines) - 2)
+        self.energies.append(np.nan if energy is None else energy)
+        self.offset += len(block)
+        return energy
+
+    def close(self) -> None:
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        st = os.stat(self.archive)
+        save_index(XYZIndex(np.array(self.offsets, dtype=np.int64), np.array(self.n_atoms, dtype=np.int64),
+                            np.array(self.energies, dtype=float), self.offset, self.offset,
+                            st.st_mtime_ns, file_fingerprint(self.archive)),
+                   index_path(self.archive))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ---------------- RANDOM ACCESS ----------------
+
+def parse_frame(text: str) -> Frame:
+    lines = text.splitlines()
+    n = int(lines[0])
+    atoms = [line.split() for line in lines[2:2 + n]]
+    energy = comment_energy(lines[1])
+    return Frame(lines[1].rstrip(), [a[0] for a in atoms],
+                 np.array([a[1:4] for a in atoms], dtype=float).reshape(n, 3),
+                 np.nan if energy is None else energy)
+
+class XYZFile(object):
+    """An indexed multi-structure xyz file; ensemble[i] and ensemble[i:j] read frames by seeking."""
+    def __init__(self, xyz_file: str, rebuild: bool = False, index: Optional[XYZIndex] = None):
+        self.xyz_file = xyz_file
+        self.index = index if index is not None else get_index(xyz_file, rebuild)
+        self.file = open_binary(xyz_file)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _read(self, start: int, stop: int) -> bytes:
+        begin = self.index.offsets[start]
+        end = self.index.offsets[stop] if stop < len(self.index) else self.index.end
+        self.file.seek(begin)
+        return self.file.read(end - begin)
+
+    def block(self, start: int, stop: Optional[int] = None) -> str:
+        """Raw text of frames start..stop-1 (only frame start when stop is None), read in one go."""
+        return self._read(start, start + 1 if stop is None else stop).decode(errors='ignore')
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[Frame, List[Frame]]:
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if start >= stop:
+                return []
+            data = self._read(start, stop)
+            bounds = list(self.index.offsets[start:stop] - self.index.offsets[start]) + [len(data)]
+            return [parse_frame(data[a:b].decode(errors='ignore')) for a, b in zip(bounds[:-1], bounds[1:])]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(f"frame {item} out of range ({len(self)} frames)")
+        return parse_frame(self.block(item))
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ---------------- COMMAND LINE ----------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the frame index of a multi-structure xyz file or print frames from it.")
+    parser.add_argument("xyz_file")
+    parser.add_argument("--frame", type=int, nargs="+", help="print these frames (counting from 1)")
+    parser.add_argument("--rebuild", action="store_true", help="build the index again even if it is up to date")
+    args = parser.parse_args()
+
+    with XYZFile(args.xyz_file, args.rebuild) as ensemble:
+        if not args.frame:
+            print(f"{len(ensemble)} frames indexed in {index_path(args.xyz_file)}")
+        for number in args.frame or []:
+            print(ensemble[number - 1].text(), end="")
+
+if __name__ == "__main__":
+    main()